@@ -0,0 +1,134 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from AI_engine.pipeline import Mailbox
+
+# Frames come out mirrored and at the drawer's canvas size
+FRAME_WIDTH = 1280
+FRAME_HEIGHT = 720
+# Preallocated frames. A consumer's view stays intact for RING_SIZE - 1
+# newer frames (see is_current); at 30 fps that is ~100 ms.
+RING_SIZE = 4
+
+class WebcamStream:
+    """
+    Capture thread writing into a ring of preallocated buffers with
+    VideoCapture.read(image=...), flipping (and resizing, if the camera
+    ignores the requested size) in place. No per-frame allocation.
+    Every frame gets a sequence number and is published to self.frames
+    as {"t", "seq", "frame"}, frame being a read-only view into the ring.
+
+    The view is not pinned: once RING_SIZE - 1 newer frames have been
+    captured, the camera overwrites it, possibly while a consumer is still
+    reading it. Consumers check is_current(seq) after they are done with
+    the pixels and drop whatever they computed if it returns False; use
+    read() for a copy that outlives the ring.
+    """
+
+    def __init__(self, src=0, width=FRAME_WIDTH, height=FRAME_HEIGHT, ring_size=RING_SIZE):
+        self.stream = None
+        self.src = src
+        self.size = (width, height)
+        self.ring_size = ring_size
+        self.stopped = True
+        self.thread = None
+        self.lock = threading.Lock()
+        self.raw = None     # capture buffers, camera resolution
+        self.ring = None    # output buffers (same as raw when no resize is needed)
+        self.seq = 0        # sequence number of the newest frame, 0 = none yet
+        self.grabbed = False
+        # Newest frame for the pipeline
+        self.frames = Mailbox()
+
+    def start(self):
+        if not self.stopped:
+            return self
+
+        self.stream = cv2.VideoCapture(self.src)
+        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+
+        grabbed, first = self.stream.read()
+        if not grabbed:
+             print("Failed to open camera")
+             self.stream.release()
+             return self
+
+        # Ring buffers sized from the first frame (cameras may ignore the request)
+        if self.raw is None or self.raw[0].shape != first.shape:
+            self.raw = [np.empty_like(first) for _ in range(self.ring_size)]
+            if first.shape[1::-1] == self.size:
+                self.ring = self.raw
+            else:
+                self.ring = [np.empty((self.size[1], self.size[0], 3), np.uint8) for _ in range(self.ring_size)]
+        self._publish(first)
+
+        self.stopped = False
+        self.thread = threading.Thread(target=self.update, args=())
+        self.thread.start()
+        return self
+
+    def update(self):
+        while True:
+            if self.stopped:
+                return
+
+            slot = (self.seq + 1) % self.ring_size
+            grabbed, frame = self.stream.read(image=self.raw[slot])
+            if not grabbed:
+                with self.lock:
+                    self.grabbed = False
+                time.sleep(0.01) # camera hiccup / end of a video file
+                continue
+            self._publish(frame)
+
+    def _publish(self, frame):
+        seq = self.seq + 1
+        slot = seq % self.ring_size
+        out = self.ring[slot]
+        if frame is not self.raw[slot] and frame.shape == self.raw[slot].shape:
+            # read() allocated anyway (e.g. the first frame): keep using the ring
+            np.copyto(self.raw[slot], frame)
+            frame = self.raw[slot]
+        if out is not frame:
+            cv2.resize(frame, self.size, dst=out)
+        cv2.flip(out, 1, dst=out)
+
+        view = out.view()
+        view.flags.writeable = False
+        with self.lock:
+            self.seq = seq
+            self.grabbed = True
+        self.frames.put({"t": time.monotonic(), "seq": seq, "frame": view})
+
+    def is_current(self, seq):
+        """
+        True while frame seq's buffer has not been reused for a newer frame.
+        Checked after reading a view, it means the read saw one whole frame.
+        """
+        return seq > 0 and seq > self.seq - self.ring_size + 1
+
+    def read(self, image=None):
+        """
+        (grabbed, frame) of the newest frame, copied into image if given
+        (or a new array) so it outlives the ring.
+        """
+        with self.lock:
+            if self.seq == 0:
+                return False, None
+            frame = self.ring[self.seq % self.ring_size]
+            if image is None:
+                return self.grabbed, frame.copy()
+            np.copyto(image, frame)
+            return self.grabbed, image
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+        if self.stream:
+             self.stream.release()
@@ -1,8 +1,24 @@
 import cv2
 import mediapipe as mp
+import numpy as np
 import time
+
+# Fast mode (handDetect(fast=True)):
+# no hand -> search the whole frame downscaled to DETECT_WIDTH, every
+# SEARCH_EVERY frames (palm detection is most of the cost, whatever the size);
+# hand found -> next frames only look at a square ROI around the hands,
+# downscaled to at most ROI_SIZE. The ROI is kept while the hands stay well
+# inside it (stable coordinates for MediaPipe's own tracking).
+DETECT_WIDTH = 640
+SEARCH_EVERY = 2
+ROI_SIZE = 256
+ROI_MARGIN = 0.6        # of the hands' box size, added on each side
+ROI_MIN = 160           # px, smallest ROI side in frame coordinates
+ROI_KEEP = 0.15         # hands must stay this far (fraction of side) inside the ROI
+NUM_LANDMARKS = 21
+
 class handDetect():
-    def __init__(self,mode = False,max_num_hands = 2,model_complexity = 1,min_dect_confidence = 0.5,min_tracking_confidence = 0.5):
+    def __init__(self,mode = False,max_num_hands = 2,model_complexity = 1,min_dect_confidence = 0.5,min_tracking_confidence = 0.5,fast = False):
         self.mode = mode
         self.max_num_hands = max_num_hands
         self.model_complexity = model_complexity
@@ -12,8 +28,21 @@ class handDetect():
         self.hands = self.mpHands.Hands(self.mode,self.max_num_hands,self.model_complexity,self.min_dect_confidence, self.min_tracking_confidence)
         self.mpDraw = mp.solutions.drawing_utils
         self.tipIds = [4,8,12,16,20]
+        self.lmList = []
+
+        self.fast = fast
+        # Fast mode output: rows of [id, x, y] like lmList, one (21, 3) block
+        # per hand, rewritten in place every frame
+        self.landmarks = np.zeros((max_num_hands, NUM_LANDMARKS, 3), np.int32)
+        self.landmarks[:, :, 0] = np.arange(NUM_LANDMARKS)
+        self.numHands = 0
+        self.roi = None # (x0, y0, side) in frame coordinates, or None for a full search
+        self.searchSkip = 0
+        self._norm = np.zeros((NUM_LANDMARKS, 2), np.float32)
 
     def findHands(self,img,draw = True):
+        if self.fast:
+            return self._findHandsFast(img, draw)
         imgRGB = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
         self.results = self.hands.process(imgRGB)
         # print(results.multi_hand_landmarks)
@@ -24,7 +53,89 @@ class handDetect():
 
         return img
 
+    def _findHandsFast(self, img, draw):
+        h, w = img.shape[:2]
+        if self.roi is not None:
+            x0, y0, side = self.roi
+            crop = img[y0:y0 + side, x0:x0 + side]
+            scale = min(1.0, ROI_SIZE / side)
+            interpolation = cv2.INTER_LINEAR
+        else:
+            if self.searchSkip > 0:
+                # Nothing found last time; skip this frame's full search
+                self.searchSkip -= 1
+                self.numHands = 0
+                self.results = None
+                return img
+            self.searchSkip = SEARCH_EVERY - 1
+            x0, y0 = 0, 0
+            crop = img
+            scale = min(1.0, DETECT_WIDTH / w)
+            interpolation = cv2.INTER_NEAREST # palm detector input is 192x192 anyway
+        ch, cw = crop.shape[:2]
+        if scale < 1.0:
+            small = cv2.resize(crop, (int(cw * scale), int(ch * scale)), interpolation=interpolation)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=small) # fresh buffer, convert in place
+        else:
+            small = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        self.results = self.hands.process(small)
+
+        # Normalized ROI coordinates -> frame pixels, straight into self.landmarks
+        hands = self.results.multi_hand_landmarks or []
+        self.numHands = min(len(hands), len(self.landmarks))
+        norm = self._norm
+        for i in range(self.numHands):
+            for j, lm in enumerate(hands[i].landmark):
+                norm[j, 0] = lm.x
+                norm[j, 1] = lm.y
+            self.landmarks[i, :, 1] = norm[:, 0] * cw + x0
+            self.landmarks[i, :, 2] = norm[:, 1] * ch + y0
+        self.roi = self._nextRoi(h, w)
+
+        if draw:
+            for i in range(self.numHands):
+                points = self.landmarks[i, :, 1:]
+                for a, b in self.mpHands.HAND_CONNECTIONS:
+                    cv2.line(img, tuple(map(int, points[a])), tuple(map(int, points[b])), (255, 255, 255), 2)
+                for x, y in points:
+                    cv2.circle(img, (int(x), int(y)), 4, (0, 0, 255), cv2.FILLED)
+        return img
+
+    def _nextRoi(self, h, w):
+        if self.numHands == 0:
+            return None
+        points = self.landmarks[:self.numHands, :, 1:].reshape(-1, 2)
+        xmin, ymin = points.min(axis=0)
+        xmax, ymax = points.max(axis=0)
+        size = max(xmax - xmin, ymax - ymin)
+        side = int(min(max(size * (1 + 2 * ROI_MARGIN), ROI_MIN), h, w))
+
+        if self.roi is not None:
+            # Keep the current ROI while the hands stay well inside it
+            # and it is still about the right size
+            x0, y0, old = self.roi
+            keep = old * ROI_KEEP
+            if (0.75 * old <= side <= 1.33 * old and xmin >= x0 + keep and ymin >= y0 + keep
+                    and xmax <= x0 + old - keep and ymax <= y0 + old - keep):
+                return self.roi
+
+        cx, cy = (xmin + xmax) // 2, (ymin + ymax) // 2
+        x0 = int(min(max(cx - side // 2, 0), w - side))
+        y0 = int(min(max(cy - side // 2, 0), h - side))
+        return (x0, y0, side)
+
     def findPosition(self,img,handNo = 0, draw = True):
+        if self.fast:
+            # (21, 3) view of the preallocated array; empty if no such hand.
+            # Valid until the next findHands call.
+            if handNo >= self.numHands:
+                self.lmList = self.landmarks[0, :0]
+                return self.lmList
+            self.lmList = self.landmarks[handNo]
+            if draw:
+                for Id, cx, cy in self.lmList:
+                    cv2.circle(img,(int(cx),int(cy)),15,(0,255,0),cv2.FILLED)
+            return self.lmList
         self.lmList = []
         if self.results.multi_hand_landmarks:
             myHand = self.results.multi_hand_landmarks[handNo]
@@ -0,0 +1,244 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Recompose the whole frame once the dirty rects cover more than this share
+FULL_REDRAW_SHARE = 0.5
+# More dirty rects than this are merged into their bounding box
+MAX_RECTS = 32
+
+
+def _clip(rect, w, h):
+    x1, y1, x2, y2 = rect
+    x1, y1 = max(int(x1), 0), max(int(y1), 0)
+    x2, y2 = min(int(x2), w), min(int(y2), h)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return (x1, y1, x2, y2)
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _intersect(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return (x1, y1, x2, y2)
+
+
+def draw_strokes(canvas, strokes):
+    """
+    Draw stroke dicts ({x1, y1, x2, y2, color, thickness}) onto canvas in
+    order with as few cv2.polylines calls as possible: consecutive
+    segments sharing color and thickness form one call, and segments
+    continuing the previous one (x1, y1 == its x2, y2) join one polyline.
+    Same pixels as a cv2.line per segment; style runs keep their order so
+    overlapping colors (and the eraser) still land right.
+    Returns one (x1, y1, x2, y2) rect per run, padded for the thickness.
+    """
+    if not strokes:
+        return []
+    rows = np.array([(s["x1"], s["y1"], s["x2"], s["y2"], *s["color"], s["thickness"]) for s in strokes],
+                    np.int32)
+    seg, style = rows[:, :4], rows[:, 4:]
+
+    # Polyline starts: style changes or the pen jumped
+    new_run = np.flatnonzero((style[1:] != style[:-1]).any(axis=1)) + 1
+    jumps = np.flatnonzero((seg[1:, :2] != seg[:-1, 2:]).any(axis=1)) + 1
+    starts = np.union1d(np.concatenate(([0], new_run)), jumps)
+    # Points: each polyline's first x1, y1 followed by its segments' x2, y2
+    points = np.insert(seg[:, 2:], starts, seg[starts, :2], axis=0).reshape(-1, 1, 2)
+    lines = np.split(points, starts[1:] + np.arange(1, len(starts)))
+
+    rects = []
+    run_starts = np.concatenate(([0], new_run))
+    run_lines = np.searchsorted(starts, np.concatenate((run_starts, [len(seg)])))
+    for i, first in enumerate(run_starts):
+        b, g, r, thickness = (int(v) for v in style[first])
+        cv2.polylines(canvas, lines[run_lines[i]:run_lines[i + 1]], False, (b, g, r), thickness)
+        end = run_starts[i + 1] if i + 1 < len(run_starts) else len(seg)
+        xs, ys = seg[first:end, 0::2], seg[first:end, 1::2]
+        pad = thickness // 2 + 2
+        rects.append((int(xs.min()) - pad, int(ys.min()) - pad, int(xs.max()) + pad + 1, int(ys.max()) + pad + 1))
+    return rects
+
+
+class Layer():
+    __slots__ = ('name', 'rect', 'key', 'draw', 'opaque',
+                 'pixels', 'drawn')    # rendered rect and its mask, cached per key
+
+    def __init__(self, name, rect, key, draw, opaque):
+        self.name = name
+        self.rect = rect
+        self.key = key
+        self.draw = draw
+        self.opaque = opaque
+        self.pixels = None
+        self.drawn = None
+
+
+class Compositor():
+    """
+    Persistent display frame = canvas + overlay layers + transient items.
+
+    Only dirty regions are recomposed: canvas areas marked by whoever
+    draws on it (mark / mark_line / mark_all), layers whose key changed,
+    and last frame's transient items (cursor). Layers (header, PiP,
+    labels) are rendered once into an overlay buffer plus mask and only
+    re-rendered when their key changes. draw callbacks take the frame
+    and use frame coordinates, like drawing on the display directly.
+    """
+
+    def __init__(self, canvas, lock=None):
+        self.canvas = canvas
+        self.h, self.w = canvas.shape[:2]
+        self.display = canvas.copy()
+        self.overlay = np.zeros_like(canvas)
+        self.mask = np.zeros((self.h, self.w), np.uint8) # 1 where a layer is drawn
+        self._scratch = (np.empty_like(canvas), np.empty_like(canvas))
+        self.layers = {}        # name -> Layer, in stacking order
+        # Held while reading the canvas (pass the lock its writers use)
+        self.lock = lock if lock is not None else threading.Lock()
+        self.dirty_lock = threading.Lock()
+        self.dirty = []
+        self.full = True
+        self.transient = []     # rects drawn over the frame last time
+        # Stats
+        self.frames = 0
+        self.pixels = 0         # canvas pixels recomposed
+
+    # -- canvas changes (any thread) --
+
+    def mark(self, x1, y1, x2, y2):
+        rect = _clip((x1, y1, x2, y2), self.w, self.h)
+        if rect is None:
+            return
+        with self.dirty_lock:
+            self.dirty.append(rect)
+            if len(self.dirty) > MAX_RECTS:
+                merged = self.dirty[0]
+                for r in self.dirty[1:]:
+                    merged = _union(merged, r)
+                self.dirty = [merged]
+
+    def mark_line(self, p1, p2, thickness):
+        pad = thickness // 2 + 2
+        self.mark(min(p1[0], p2[0]) - pad, min(p1[1], p2[1]) - pad,
+                  max(p1[0], p2[0]) + pad + 1, max(p1[1], p2[1]) + pad + 1)
+
+    def mark_all(self):
+        with self.dirty_lock:
+            self.full = True
+
+    # -- overlay layers (render thread) --
+
+    def layer(self, name, rect, key, draw, opaque=False):
+        """
+        Add or update a layer covering rect. draw(frame) is only called
+        again when key (or rect) changes. opaque layers fill their rect.
+        """
+        rect = _clip(rect, self.w, self.h)
+        old = self.layers.get(name)
+        if old is not None and old.key == key and old.rect == rect:
+            return
+        if old is None:
+            if rect is None:
+                return
+            self.layers[name] = Layer(name, rect, key, draw, opaque)
+            self._rerender(rect)
+            return
+        changed = old.rect if rect is None else (rect if old.rect is None else _union(old.rect, rect))
+        old.rect, old.key, old.draw, old.opaque = rect, key, draw, opaque
+        old.pixels = old.drawn = None
+        if changed is not None:
+            self._rerender(changed)
+
+    def remove_layer(self, name):
+        old = self.layers.pop(name, None)
+        if old is not None and old.rect is not None:
+            self._rerender(old.rect)
+
+    def _rerender(self, region):
+        x1, y1, x2, y2 = region
+        self.overlay[y1:y2, x1:x2] = 0
+        self.mask[y1:y2, x1:x2] = 0
+        for layer in self.layers.values():
+            if layer.rect is not None:
+                self._render(layer, region)
+        self.mark(x1, y1, x2, y2)
+
+    def _render(self, layer, region):
+        # Copy the part of the layer inside region into the overlay,
+        # drawing it first if its key changed
+        part = _intersect(layer.rect, region)
+        if part is None:
+            return
+        lx1, ly1, lx2, ly2 = layer.rect
+        if layer.pixels is None:
+            a, b = self._scratch
+            if layer.opaque:
+                layer.draw(a)
+                layer.pixels = a[ly1:ly2, lx1:lx2].copy()
+            else:
+                # Drawn pixels come out the same on a black and a white background
+                a[ly1:ly2, lx1:lx2] = 0
+                b[ly1:ly2, lx1:lx2] = 255
+                layer.draw(a)
+                layer.draw(b)
+                layer.pixels = a[ly1:ly2, lx1:lx2].copy()
+                layer.drawn = (layer.pixels == b[ly1:ly2, lx1:lx2]).all(axis=2).astype(np.uint8)
+        x1, y1, x2, y2 = part
+        pixels = layer.pixels[y1 - ly1:y2 - ly1, x1 - lx1:x2 - lx1]
+        if layer.opaque:
+            self.overlay[y1:y2, x1:x2] = pixels
+            self.mask[y1:y2, x1:x2] = 1
+            return
+        drawn = layer.drawn[y1 - ly1:y2 - ly1, x1 - lx1:x2 - lx1]
+        # cv2.copyTo writes into the views; far faster than np.copyto(where=)
+        cv2.copyTo(pixels, drawn, self.overlay[y1:y2, x1:x2])
+        self.mask[y1:y2, x1:x2] |= drawn
+
+    # -- per frame --
+
+    def compose(self, transient=()):
+        """
+        Bring the display up to date and draw transient items on top.
+        transient: (rect, draw) pairs redrawn every frame (cursor, selection box).
+        Returns the display buffer (reused; show or copy it before the next call).
+        """
+        with self.dirty_lock:
+            rects = self.dirty
+            full = self.full
+            self.dirty = []
+            self.full = False
+        rects = rects + self.transient
+        area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+        if full or area > FULL_REDRAW_SHARE * self.w * self.h:
+            rects = [(0, 0, self.w, self.h)]
+
+        display = self.display
+        with self.lock:
+            for x1, y1, x2, y2 in rects:
+                display[y1:y2, x1:x2] = self.canvas[y1:y2, x1:x2]
+        # Overlay only where a dirty rect meets a layer (strokes mostly don't)
+        layer_rects = [layer.rect for layer in self.layers.values() if layer.rect is not None]
+        for rect in rects:
+            self.pixels += (rect[2] - rect[0]) * (rect[3] - rect[1])
+            for layer_rect in layer_rects:
+                part = _intersect(rect, layer_rect)
+                if part is not None:
+                    x1, y1, x2, y2 = part
+                    cv2.copyTo(self.overlay[y1:y2, x1:x2], self.mask[y1:y2, x1:x2], display[y1:y2, x1:x2])
+
+        self.transient = []
+        for rect, draw in transient:
+            rect = _clip(rect, self.w, self.h)
+            if rect is not None:
+                draw(display)
+                self.transient.append(rect)
+        self.frames += 1
+        return display
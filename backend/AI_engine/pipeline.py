@@ -0,0 +1,107 @@
+import threading
+import time
+
+# Building blocks for drawer.py's staged loop:
+#   camera thread -> inference worker -> stroke/encode worker
+#                                     \-> render loop (reads, never waits)
+# Stages are joined by latest-value mailboxes: a slow consumer only ever
+# sees the newest item, older ones are dropped instead of queueing up.
+
+class Mailbox():
+    """Single-slot, latest-value hand-off between threads."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.seq = 0        # bumped on every put
+        self.taken = 0      # seq of the last item a consumer got
+        self.dropped = 0    # items overwritten before anyone took them
+
+    def put(self, item):
+        with self.cond:
+            if self.seq > self.taken:
+                self.dropped += 1
+            self.item = item
+            self.seq += 1
+            self.cond.notify_all()
+
+    def latest(self):
+        """(seq, item) right now, without waiting or counting as taken."""
+        with self.cond:
+            return self.seq, self.item
+
+    def wait(self, after, timeout=None):
+        """Newest (seq, item) with seq > after; (after, None) on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > after, timeout):
+                return after, None
+            self.taken = self.seq
+            return self.seq, self.item
+
+
+class StageStats():
+    """Per-stage timing: processing time and how old items are when done."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.last = 0.0     # seconds spent on the last item
+        self.avg = 0.0      # exponential moving average of the above
+        self.age = 0.0      # capture -> end of this stage, last item
+
+    def record(self, started, captured=None):
+        now = time.monotonic()
+        self.last = now - started
+        self.avg = self.last if self.count == 0 else self.avg * 0.9 + self.last * 0.1
+        if captured is not None:
+            self.age = now - captured
+        self.count += 1
+
+    def to_dict(self):
+        return {"stage": self.name, "count": self.count, "last_ms": round(self.last * 1000, 2),
+                "avg_ms": round(self.avg * 1000, 2), "age_ms": round(self.age * 1000, 2)}
+
+
+class Worker():
+    """
+    Thread running fn on the newest item of source and putting the result
+    (unless None) into sink. Items are dicts; "t" is their capture time.
+    """
+
+    def __init__(self, name, source, fn, sink=None):
+        self.source = source
+        self.fn = fn
+        self.sink = sink
+        self.stats = StageStats(name)
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        seq = 0
+        while not self.stopped:
+            seq, item = self.source.wait(seq, timeout=0.1)
+            if item is None:
+                continue
+            started = time.monotonic()
+            try:
+                out = self.fn(item)
+            except Exception as e:
+                print(f"{self.stats.name} stage error: {e}")
+                continue
+            self.stats.record(started, item.get("t"))
+            if self.sink is not None and out is not None:
+                self.sink.put(out)
+
+    def stop(self):
+        self.stopped = True
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+def format_stats(stats):
+    """One line for the HUD: avg processing ms per stage."""
+    return "  ".join(f"{s.name} {s.avg * 1000:.1f}ms" for s in stats)
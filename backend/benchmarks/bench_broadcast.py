@@ -0,0 +1,70 @@
+"""
+Broadcast fan-out cost per VIDEO_FRAME.
+
+Compares the old path (json.loads to classify + encode per recipient)
+with the encode-once path in stroke_server.broadcast.
+
+    python benchmarks/bench_broadcast.py [viewers] [frames]
+"""
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import stroke_server
+from protocol import Protocol
+from stubs import NullConnection, quiet
+
+
+def old_broadcast(clients, message, exclude_conn=None):
+    try:
+        data = json.loads(message)
+        if data.get(Protocol.ACTION) == Protocol.CHAT:
+            pass
+    except:
+        pass
+    for client in clients:
+        if client != exclude_conn:
+            client.send((message + "\n").encode('utf-8'))
+
+
+def main():
+    viewers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    # ~12 KB JPEG -> ~16 KB base64, typical for 320x180 q50
+    jpeg = os.urandom(12 * 1024)
+    message = json.dumps({
+        Protocol.ACTION: Protocol.VIDEO_FRAME,
+        Protocol.ROOM_ID: "BENCH",
+        Protocol.PAYLOAD: base64.b64encode(jpeg).decode('utf-8')
+    })
+
+    room_id = "BENCH"
+    sender = NullConnection()
+    clients = [sender] + [NullConnection() for _ in range(viewers)]
+    with quiet():
+        for i, conn in enumerate(clients):
+            stroke_server.game_state.add_client(room_id, conn, f"p{i}")
+
+    start = time.process_time()
+    for _ in range(frames):
+        old_broadcast(clients, message, exclude_conn=sender)
+    old_cpu = (time.process_time() - start) / frames
+
+    start = time.process_time()
+    for _ in range(frames):
+        stroke_server.broadcast(room_id, message, exclude_conn=sender, droppable=True)
+    new_cpu = (time.process_time() - start) / frames
+
+    print(f"{viewers} viewers, {len(message)} byte frame")
+    print(f"  per-recipient encode: {old_cpu * 1e6:8.1f} us CPU/frame")
+    print(f"  encode-once:          {new_cpu * 1e6:8.1f} us CPU/frame")
+    print(f"  saved:                {(old_cpu - new_cpu) * 1e6:8.1f} us CPU/frame ({old_cpu / new_cpu:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
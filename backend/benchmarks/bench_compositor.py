@@ -0,0 +1,150 @@
+"""
+Display composition per frame: full canvas copy + redraw vs Compositor.
+
+Replays the same drawer session through both: a couple of strokes per
+frame, a moving cursor, the HUD text (timer ticking once a second), and
+the PiP video changing at 10 fps. "full" is drawer.py's old loop
+(image_canvas.copy(), PiP, header and every label drawn each frame);
+"dirty" is AI_engine.painter.Compositor. Checks the frames match and
+reports CPU per frame and the FPS that alone would allow.
+
+    python benchmarks/bench_compositor.py [frames]
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from AI_engine.painter import Compositor
+
+W, H = 1280, 720
+HEADER_HEIGHT = 100
+PIP = (0, HEADER_HEIGHT, 320, HEADER_HEIGHT + 180)
+FPS = 60
+LABELS = [("Room: ABC123", (10, 150), 1, (255, 0, 0), 2),
+          ("Player: Guest", (10, 170), 1, (255, 0, 0), 2),
+          ("Mode: GESTURE", (10, 210), 1.5, (0, 255, 0), 2),
+          ("('m': Mouse, 'g': Gesture)", (10, 230), 1, (100, 100, 100), 1),
+          ("Status: READY", (10, 260), 1.5, (0, 255, 0), 2),
+          ("('r': Toggle Ready)", (10, 280), 1, (100, 100, 100), 1)]
+
+
+def session(frames):
+    # Per frame: (strokes, cursor, time left, video frame index)
+    rng = np.random.default_rng(0)
+    out = []
+    prev = (640, 400)
+    for i in range(frames):
+        t = i / FPS
+        strokes = []
+        for k in range(2):
+            a = t * 1.3 + k * 0.008
+            p = (int(700 + 300 * math.cos(a)), int(420 + 200 * math.sin(a * 1.7)))
+            strokes.append((prev, p))
+            prev = p
+        out.append((strokes, prev, 80 - int(t), int(t * 10)))
+    return out
+
+
+def video_frames():
+    rng = np.random.default_rng(1)
+    return [cv2.GaussianBlur(rng.integers(0, 255, (180, 320, 3), dtype=np.uint8), (9, 9), 0) for _ in range(8)]
+
+
+def draw_label(frame, text, org, scale, color, thickness):
+    cv2.putText(frame, text, org, cv2.FONT_HERSHEY_PLAIN, scale, color, thickness)
+
+
+def draw_pip(frame, video):
+    x1, y1, x2, y2 = PIP
+    frame[y1:y2, x1:x2] = video
+
+
+def draw_pip_frame(frame):
+    x1, y1, x2, y2 = PIP
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (50, 50, 50), 3)
+    cv2.rectangle(frame, (x1, y1 - 25), (x1 + 100, y1), (50, 50, 50), cv2.FILLED)
+    cv2.putText(frame, "DRAWER", (x1 + 10, y1 - 5), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 1)
+
+
+def draw_header(frame, header):
+    frame[0:HEADER_HEIGHT] = header
+
+
+def draw_chrome(frame, header, video):
+    # PiP, border + label, header (same order as drawer.py)
+    draw_pip(frame, video)
+    draw_pip_frame(frame)
+    draw_header(frame, header)
+
+
+def draw_cursor(frame, c):
+    cv2.circle(frame, c, 15, (255, 0, 255), cv2.FILLED)
+    cv2.circle(frame, c, 15, (0, 0, 0), 2)
+
+
+def run_full(frames, header, videos):
+    canvas = np.full((H, W, 3), 255, np.uint8)
+    shown = []
+    c0 = time.process_time()
+    for strokes, cursor, left, vi in frames:
+        for p1, p2 in strokes:
+            cv2.line(canvas, p1, p2, (255, 0, 255), 15)
+        display = canvas.copy()
+        draw_chrome(display, header, videos[vi % len(videos)])
+        for label in LABELS + [(f"Time: {left}s", (10, 190), 1, (255, 0, 0), 2)]:
+            draw_label(display, *label)
+        draw_cursor(display, cursor)
+        shown.append(display[::97, ::97].copy())
+    return time.process_time() - c0, shown
+
+
+def run_dirty(frames, header, videos):
+    canvas = np.full((H, W, 3), 255, np.uint8)
+    comp = Compositor(canvas)
+    shown = []
+    c0 = time.process_time()
+    for strokes, cursor, left, vi in frames:
+        for p1, p2 in strokes:
+            cv2.line(canvas, p1, p2, (255, 0, 255), 15)
+            comp.mark_line(p1, p2, 15)
+        # Layers as drawer.py sets them up
+        video = videos[vi % len(videos)]
+        comp.layer("pip", PIP, vi, lambda f, v=video: draw_pip(f, v), opaque=True)
+        comp.layer("pip_frame", (PIP[0] - 2, PIP[1] - 27, PIP[2] + 3, PIP[3] + 3), "static", draw_pip_frame)
+        comp.layer("header", (0, 0, W, HEADER_HEIGHT), "static", lambda f: draw_header(f, header), opaque=True)
+        for i, label in enumerate(LABELS + [(f"Time: {left}s", (10, 190), 1, (255, 0, 0), 2)]):
+            text, org, scale, color, thickness = label
+            (w, h), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_PLAIN, scale, thickness)
+            comp.layer(i, (org[0] - thickness, org[1] - h - thickness, org[0] + w + thickness, org[1] + base + thickness),
+                       text, lambda f, label=label: draw_label(f, *label))
+        display = comp.compose([((cursor[0] - 17, cursor[1] - 17, cursor[0] + 18, cursor[1] + 18),
+                                 lambda f, c=cursor: draw_cursor(f, c))])
+        shown.append(display[::97, ::97].copy())
+    return time.process_time() - c0, shown, comp
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    frames = session(n)
+    header = np.full((HEADER_HEIGHT, W, 3), (40, 120, 200), np.uint8)
+    videos = video_frames()
+
+    full_cpu, full_shown = run_full(frames, header, videos)
+    dirty_cpu, dirty_shown, comp = run_dirty(frames, header, videos)
+    same = all((a == b).all() for a, b in zip(full_shown, dirty_shown))
+
+    print(f"{n} frames, frames match: {same}")
+    print(f"{'mode':>6} {'ms/frame':>9} {'max fps':>8}")
+    for name, cpu in (("full", full_cpu), ("dirty", dirty_cpu)):
+        print(f"{name:>6} {cpu / n * 1000:>9.3f} {n / cpu:>8.0f}")
+    print(f"dirty recomposed {comp.pixels / n / (W * H) * 100:.1f}% of the frame on average")
+
+
+if __name__ == "__main__":
+    main()
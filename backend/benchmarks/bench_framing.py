@@ -0,0 +1,67 @@
+"""
+Stream parsing: the old str buffer + split("\\n", 1) loop vs StreamDecoder.
+
+Feeds one message of each size in recv()-sized chunks and reports the
+time to get it back out. The str loop rescans and re-copies the whole
+buffer per chunk, so its cost grows with message size squared.
+
+    python benchmarks/bench_framing.py [chunk_size]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from framing import StreamDecoder, encode_record, MSG_JSON
+
+SIZES = (1024, 16 * 1024, 128 * 1024, 1024 * 1024)
+
+
+def str_loop(chunks):
+    buffer = ""
+    out = []
+    for data in chunks:
+        buffer += data.decode('utf-8')
+        while "\n" in buffer:
+            message, buffer = buffer.split("\n", 1)
+            out.append(message)
+    return out
+
+
+def decoder_loop(chunks):
+    decoder = StreamDecoder(max_line=2 * max(SIZES))
+    out = []
+    for data in chunks:
+        out.extend(decoder.feed(data))
+    return out
+
+
+def best_of(fn, chunks, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(chunks)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    chunk = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    print(f"recv size {chunk}")
+    print(f"{'message':>9} {'str ms':>8} {'line ms':>8} {'record ms':>10}")
+    for size in SIZES:
+        body = b'{"payload": "' + b"x" * size + b'"}'
+        as_line = body + b"\n"
+        as_record = encode_record(MSG_JSON, body)
+        line_chunks = [as_line[i:i + chunk] for i in range(0, len(as_line), chunk)]
+        record_chunks = [as_record[i:i + chunk] for i in range(0, len(as_record), chunk)]
+
+        print(f"{size // 1024:>7}KB {best_of(str_loop, line_chunks) * 1000:>8.2f} "
+              f"{best_of(decoder_loop, line_chunks) * 1000:>8.2f} "
+              f"{best_of(decoder_loop, record_chunks) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
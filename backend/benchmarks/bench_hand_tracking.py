@@ -0,0 +1,77 @@
+"""
+Hand tracking cost per frame: handDetect's standard path vs fast mode.
+
+Plays a recorded video (ideally of someone drawing with a finger, at
+drawer.py's 1280x720) through findHands + findPosition in each mode and
+reports CPU-side FPS, mean / p95 latency per frame, how often a hand was
+found, and how far fast-mode landmarks land from the standard ones.
+
+    python benchmarks/bench_hand_tracking.py video.mp4 [max_frames]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+import AI_engine.handTracking as htm
+
+
+def load_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if frame.shape[1] != 1280:
+            frame = cv2.resize(frame, (1280, 720))
+        frames.append(cv2.flip(frame, 1)) # drawer.py mirrors the camera
+    cap.release()
+    return frames
+
+
+def run(frames, fast):
+    detector = htm.handDetect(min_dect_confidence=0.85, fast=fast)
+    times = []
+    found = []
+    for frame in frames:
+        img = frame.copy() # findHands may draw on it
+        t0 = time.perf_counter()
+        detector.findHands(img, draw=False)
+        lmList = detector.findPosition(img, draw=False)
+        times.append(time.perf_counter() - t0)
+        found.append(np.array(lmList, np.float32)[:, 1:] if len(lmList) else None)
+    return np.array(times), found
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    frames = load_frames(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 600)
+    if not frames:
+        print(f"No frames read from {sys.argv[1]}")
+        sys.exit(1)
+    print(f"{len(frames)} frames")
+    print(f"{'mode':>8} {'fps':>6} {'mean ms':>8} {'p95 ms':>7} {'hand %':>7} {'vs std px':>10}")
+
+    reference = None
+    for name, fast in (("standard", False), ("fast", True)):
+        times, found = run(frames, fast)
+        hands = sum(f is not None for f in found)
+        error = ""
+        if reference is None:
+            reference = found
+        else:
+            deltas = [np.abs(a - b).mean() for a, b in zip(found, reference) if a is not None and b is not None]
+            error = f"{np.mean(deltas):.1f}" if deltas else "-"
+        print(f"{name:>8} {1 / times.mean():>6.1f} {times.mean() * 1000:>8.2f} "
+              f"{np.percentile(times, 95) * 1000:>7.2f} {hands / len(frames) * 100:>6.0f}% {error:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Late-join cost vs stroke history length, with and without compaction.
+
+For each history length, fills a room with drawer-style strokes and
+times stroke_server.join_room for a fresh connection: catch-up
+serialization + bytes queued. "full" replays every stroke, "compacted"
+is canvas snapshot + strokes since (compact_history run first, leaving
+`tail` uncompacted strokes).
+
+    python benchmarks/bench_late_join.py [tail]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import stroke_server
+import canvas_snapshot
+from game_state import GameState
+from stubs import RecordingConnection
+
+LENGTHS = (1000, 10000, 50000, 200000)
+JOINS = 5
+
+
+def fill(state, room_id, n):
+    # Wandering line, like a hand-drawn session
+    x, y = 640, 360
+    for i in range(n):
+        nx = 100 + (x + 37 * (i % 7) - 100) % 1080
+        ny = 100 + (y + 23 * (i % 5) - 100) % 520
+        stroke = {"x1": x, "y1": y, "x2": nx, "y2": ny, "color": [0, 0, 255],
+                  "thickness": 15, "room_id": room_id, "mode": "gesture"}
+        state.add_stroke(room_id, json.dumps(stroke), stroke)
+        x, y = nx, ny
+
+
+def time_join(room_id):
+    best = None
+    sent = 0
+    for i in range(JOINS):
+        conn = RecordingConnection()
+        t0 = time.perf_counter()
+        stroke_server.join_room(room_id, conn, f"late{i}")
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+        sent = conn.bytes
+    return best, sent
+
+
+def main():
+    tail = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    if not canvas_snapshot.available():
+        print("cv2/numpy not installed: compaction unavailable")
+        return
+
+    print(f"{'strokes':>8} {'full ms':>9} {'full KB':>9} {'compact ms':>11} {'snap KB':>9} {'join ms':>9} {'join KB':>9}")
+    for n in LENGTHS:
+        state = GameState()
+        stroke_server.game_state = state
+        state.add_client("BENCH", RecordingConnection(), "drawer")
+
+        fill(state, "BENCH", n)
+        full_t, full_b = time_join("BENCH")
+
+        t0 = time.perf_counter()
+        state.compact_history("BENCH", min_segments=1)
+        compact_t = time.perf_counter() - t0
+        fill(state, "BENCH", tail)
+        join_t, join_b = time_join("BENCH")
+        snapshot, _ = state.get_catch_up("BENCH")
+
+        print(f"{n:>8} {full_t * 1000:>9.1f} {full_b / 1024:>9.0f} {compact_t * 1000:>11.1f} "
+              f"{len(snapshot.png) / 1024:>9.0f} {join_t * 1000:>9.2f} {join_b / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
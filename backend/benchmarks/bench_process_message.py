@@ -0,0 +1,94 @@
+"""
+Per-message cost of stroke_server.process_message vs room size.
+
+Drives strokes from the drawer at a fixed rate (default 1000/s) into a
+room of N players and reports CPU per message. Fan-out is done with
+no-op connections, so the numbers are the server's own hot path:
+JSON parse, is_drawer, add_stroke, encode and enqueue.
+
+    python benchmarks/bench_process_message.py [rate] [seconds]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import stroke_server
+from stubs import NullConnection, quiet
+
+
+def setup_room(room_id, n_players):
+    state = stroke_server.game_state
+    conns = [NullConnection() for _ in range(n_players)]
+    for i, conn in enumerate(conns):
+        state.add_client(room_id, conn, f"p{i}")
+    state.set_round_active(room_id, True)
+    state.select_drawer(room_id)
+    state.set_word(room_id, "apple")
+    return conns[0], conns[1:]
+
+
+def stroke_line(i):
+    return json.dumps({
+        "x1": i % 1280, "y1": i % 720, "x2": (i + 3) % 1280, "y2": (i + 2) % 720,
+        "color": [0, 0, 255], "thickness": 15, "room_id": "BENCH", "mode": "gesture"
+    })
+
+
+def paced(room_id, drawer, rate, seconds):
+    """Feed process_message at `rate` msgs/s; returns (sent, cpu_per_msg)."""
+    interval = 1.0 / rate
+    lines = [stroke_line(i) for i in range(1000)]
+    sent = 0
+    cpu = 0.0
+    start = time.perf_counter()
+    next_t = start
+    while time.perf_counter() - start < seconds:
+        c0 = time.process_time()
+        stroke_server.process_message(room_id, lines[sent % 1000], drawer)
+        cpu += time.process_time() - c0
+        sent += 1
+        next_t += interval
+        delay = next_t - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return sent, cpu / sent
+
+
+def burst(room_id, conn, n=20000):
+    """Unpaced per-call cost of the validation paths."""
+    state = stroke_server.game_state
+    c0 = time.process_time()
+    for _ in range(n):
+        state.is_drawer(room_id, conn)
+    drawer_us = (time.process_time() - c0) / n * 1e6
+    c0 = time.process_time()
+    for _ in range(n):
+        state.process_guess(room_id, conn, "banana")
+    guess_us = (time.process_time() - c0) / n * 1e6
+    return drawer_us, guess_us
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    with quiet():
+        drawer, guessers = setup_room("BENCH", 50)
+        sent, per_msg = paced("BENCH", drawer, rate, seconds)
+    print(f"50 players, {rate} strokes/s target: {sent / seconds:.0f}/s achieved, "
+          f"{per_msg * 1e6:.1f} us CPU/stroke ({per_msg * rate * 100:.1f}% of one core)")
+
+    print(f"{'players':>8} {'is_drawer us':>13} {'process_guess us':>17}")
+    for n in (10, 50, 200, 1000):
+        room_id = f"SIZE{n}"
+        with quiet():
+            _, guessers = setup_room(room_id, n)
+            drawer_us, guess_us = burst(room_id, guessers[-1])
+        print(f"{n:>8} {drawer_us:>13.2f} {guess_us:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Remote stroke replay on the render thread: per-segment vs batched.
+
+Builds a late-join backlog (a drawer's gesture strokes with color
+changes, eraser passes and pen lifts) and drains it the way drawer.py
+does: "per-segment" is the old loop (get_stroke, lock, cv2.line,
+mark_line per segment), "batched" is draw_strokes over chunks under
+REMOTE_STROKE_BUDGET. Checks both canvases match and reports the total
+time, the longest single frame and how many frames the replay took.
+
+    python benchmarks/bench_remote_strokes.py [strokes]
+"""
+import math
+import os
+import sys
+import threading
+import time
+from queue import Queue, Empty
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from AI_engine.painter import Compositor, draw_strokes
+
+W, H = 1280, 720
+# Same as drawer.py
+REMOTE_STROKE_BUDGET = 0.004
+REMOTE_STROKE_CHUNK = 256
+COLORS = [(0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 0, 0)]
+
+
+def backlog(n):
+    rng = np.random.default_rng(0)
+    strokes = []
+    x, y = 640, 400
+    color, thickness = COLORS[0], 15
+    while len(strokes) < n:
+        r = rng.random()
+        if r < 0.01:
+            # Pen lifted: jump somewhere else
+            x, y = int(rng.integers(50, W - 50)), int(rng.integers(150, H - 50))
+        elif r < 0.013:
+            color, thickness = COLORS[int(rng.integers(len(COLORS)))], 15
+        elif r < 0.015:
+            color, thickness = (255, 255, 255), 60 # eraser
+        a = rng.random() * 2 * math.pi
+        nx = min(max(x + int(12 * math.cos(a)), 0), W - 1)
+        ny = min(max(y + int(12 * math.sin(a)), 100), H - 1)
+        strokes.append({"x1": x, "y1": y, "x2": nx, "y2": ny, "color": list(color),
+                        "thickness": thickness, "mode": "gesture"})
+        x, y = nx, ny
+    return strokes
+
+
+def fill(strokes):
+    queue = Queue()
+    for s in strokes:
+        queue.put(s)
+    return queue
+
+
+def get_strokes(queue, limit):
+    items = []
+    try:
+        while len(items) < limit:
+            items.append(queue.get_nowait())
+    except Empty:
+        pass
+    return items
+
+
+def run_per_segment(strokes):
+    canvas = np.full((H, W, 3), 255, np.uint8)
+    comp = Compositor(canvas)
+    lock = threading.Lock()
+    queue = fill(strokes)
+    c0 = time.perf_counter()
+    # The old loop drained everything in one frame
+    while not queue.empty():
+        s = queue.get()
+        with lock:
+            cv2.line(canvas, (s["x1"], s["y1"]), (s["x2"], s["y2"]), s["color"], s["thickness"])
+        comp.mark_line((s["x1"], s["y1"]), (s["x2"], s["y2"]), s["thickness"])
+    total = time.perf_counter() - c0
+    return canvas, total, total, 1
+
+
+def run_batched(strokes):
+    canvas = np.full((H, W, 3), 255, np.uint8)
+    comp = Compositor(canvas)
+    lock = threading.Lock()
+    queue = fill(strokes)
+    total, longest, frames = 0.0, 0.0, 0
+    while not queue.empty():
+        started = time.monotonic()
+        deadline = started + REMOTE_STROKE_BUDGET
+        while time.monotonic() < deadline:
+            items = get_strokes(queue, REMOTE_STROKE_CHUNK)
+            if not items:
+                break
+            with lock:
+                rects = draw_strokes(canvas, items)
+            for rect in rects:
+                comp.mark(*rect)
+        spent = time.monotonic() - started
+        total += spent
+        longest = max(longest, spent)
+        frames += 1
+    return canvas, total, longest, frames
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    strokes = backlog(n)
+    ref, seg_total, seg_longest, seg_frames = run_per_segment(strokes)
+    out, bat_total, bat_longest, bat_frames = run_batched(strokes)
+
+    print(f"{n} strokes, canvases match: {(ref == out).all()}")
+    print(f"{'mode':>12} {'total ms':>9} {'longest frame ms':>17} {'frames':>7}")
+    for name, total, longest, frames in (("per-segment", seg_total, seg_longest, seg_frames),
+                                         ("batched", bat_total, bat_longest, bat_frames)):
+        print(f"{name:>12} {total * 1000:>9.1f} {longest * 1000:>17.1f} {frames:>7}")
+
+
+if __name__ == "__main__":
+    main()
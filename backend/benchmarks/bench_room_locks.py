@@ -0,0 +1,87 @@
+"""
+Lock contention across rooms.
+
+One worker thread per room runs the stroke hot path (is_drawer +
+add_stroke + get_clients) while an admin thread keeps snapshotting
+every room like /api/state pollers do. Both loops hold the room
+lock across a short blocking call (HOLD_S), standing in for socket work
+done under the lock. Pure-Python work stays GIL-bound either way;
+what sharding removes is one room waiting on another room's lock.
+
+    python benchmarks/bench_room_locks.py [seconds]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import game_state as gs
+from stubs import NullConnection, quiet
+
+HOLD_S = 0.0002
+STROKE = '{"x1":1,"y1":2,"x2":3,"y2":4,"color":[0,0,0],"thickness":5,"mode":"gesture"}'
+
+
+class GlobalLockGameState(gs.GameState):
+    """Old behaviour: every room shares one lock."""
+
+    def _new_room_lock(self):
+        return self.lock
+
+
+def run(state_cls, n_rooms, seconds):
+    state = state_cls()
+    conns = {}
+    for r in range(n_rooms):
+        room_id = f"R{r}"
+        conn = NullConnection()
+        state.add_client(room_id, conn, f"p{r}")
+        conns[room_id] = conn
+
+    stop = threading.Event()
+    counts = [0] * n_rooms
+
+    def worker(i):
+        room_id = f"R{i}"
+        conn = conns[room_id]
+        room_lock = state.rooms[room_id].lock
+        while not stop.is_set():
+            if state.is_drawer(room_id, conn):
+                with room_lock:
+                    state.add_stroke(room_id, STROKE)
+                    time.sleep(HOLD_S)
+            state.get_clients(room_id)
+            counts[i] += 1
+
+    def admin():
+        while not stop.is_set():
+            for room_id in state.list_rooms():
+                with state.rooms[room_id].lock:
+                    state.snapshot_room(room_id)
+                    time.sleep(HOLD_S)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_rooms)]
+    threads.append(threading.Thread(target=admin))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    print(f"{'rooms':>5} {'global lock ops/s':>18} {'per-room ops/s':>15} {'speedup':>8}")
+    for n_rooms in (1, 2, 4, 8, 16):
+        with quiet():
+            old = run(GlobalLockGameState, n_rooms, seconds)
+            new = run(gs.GameState, n_rooms, seconds)
+        print(f"{n_rooms:>5} {old:>18.0f} {new:>15.0f} {new / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+StrokeSender writes per second of mouse drawing, by batching setting.
+
+Runs a real StrokeSender against a local socket that acknowledges the
+JOIN and then just drains, feeds it drawer.py-style mouse segments at
+125 Hz for a few seconds, and prints its stats() for each latency
+budget / merge tolerance.
+
+    python benchmarks/bench_sender_batching.py [seconds]
+"""
+import math
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from network.stroke_sender import StrokeSender
+
+SETTINGS = (
+    # (batch_interval, merge_tolerance)
+    (0.0, None),
+    (0.016, None),
+    (0.016, 1.0),
+    (0.050, 1.0),
+)
+JOIN_ACK = b'{"action": "join_ack", "payload": {"framed": true, "compact_strokes": true, "video_tiles": true}}\n'
+
+
+def drain_server():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('localhost', 0))
+    listener.listen()
+
+    def drain(conn):
+        # Accept the JOIN like stroke_server does, so the sender goes framed
+        conn.recv(65536)
+        conn.sendall(JOIN_ACK)
+        while conn.recv(65536):
+            pass
+
+    def serve():
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=drain, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def draw(sender, seconds):
+    xp, yp = 640, 360
+    start = time.perf_counter()
+    i = 0
+    while time.perf_counter() - start < seconds:
+        t = i / 125
+        x = int(640 + 400 * math.cos(t * 0.9) + 6 * math.sin(t * 11))
+        y = int(360 + 250 * math.sin(t * 1.3))
+        if math.hypot(x - xp, y - yp) > 2:
+            sender.send_stroke({"x1": xp, "y1": yp, "x2": x, "y2": y,
+                                "color": [255, 0, 255], "thickness": 15,
+                                "room_id": "BENCH", "mode": "mouse"})
+            xp, yp = x, y
+        i += 1
+        time.sleep(max(0.0, start + i / 125 - time.perf_counter()))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    port = drain_server()
+    print(f"{'interval':>8} {'merge':>6} {'seg in/s':>9} {'seg out/s':>10} {'syscalls/s':>11} {'B/s':>7}")
+    for interval, tolerance in SETTINGS:
+        sender = StrokeSender(port=port, room_id="BENCH", batch_interval=interval,
+                              merge_tolerance=tolerance)
+        sender.negotiated.wait(1.0)
+        sender.started = time.monotonic()
+        sender.send_syscalls = sender.bytes_sent = sender.strokes_queued = sender.segments_sent = 0
+        draw(sender, seconds)
+        time.sleep(0.1)
+        stats = sender.stats()
+        sender.close()
+        elapsed = seconds + 0.1
+        print(f"{interval * 1000:>6.0f}ms {str(tolerance):>6} {stats['strokes_queued'] / elapsed:>9.1f} "
+              f"{stats['segments_sent'] / elapsed:>10.1f} {stats['syscalls_per_sec']:>11.1f} "
+              f"{stats['bytes_per_sec']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
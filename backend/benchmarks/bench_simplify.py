@@ -0,0 +1,125 @@
+"""
+History size with and without server-side stroke simplification.
+
+Replays a drawing session into GameState.add_stroke at several
+simplify tolerances and reports the stored segments, the catch-up a
+late joiner gets (JSON bytes) and, with cv2/numpy, the share of canvas
+pixels that come out different from the unsimplified replay.
+
+The session is a recorded one if a file is given (the JSON from
+/api/strokes/<room>, or one stroke per line), otherwise a synthetic mix:
+gesture strokes at 30 fps with hand jitter, plus mouse strokes at
+drawer.py's 2 px steps. --poll N reads the history every N strokes, like
+a web client polling mid-stroke (each read flushes the pending polyline).
+
+    python benchmarks/bench_simplify.py [session.json] [--poll N]
+"""
+import json
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import canvas_snapshot
+from game_state import GameState
+
+TOLERANCES = (None, 0.5, 1.0, 2.0, 3.0)
+
+
+def synthetic_session(seconds=120, seed=1):
+    rng = random.Random(seed)
+    strokes = []
+    colors = ([255, 0, 255], [255, 0, 0], [0, 255, 0], [0, 0, 0])
+    t = 0.0
+    while t < seconds:
+        # One pen-down stretch of 1-4 s, then lift
+        mode = "gesture" if rng.random() < 0.7 else "mouse"
+        color = rng.choice(colors)
+        thickness = 100 if color == [0, 0, 0] else 15
+        cx, cy = rng.uniform(200, 1080), rng.uniform(150, 570)
+        r, speed = rng.uniform(40, 200), rng.uniform(0.8, 2.5)
+        duration = rng.uniform(1, 4)
+        prev = None
+        if mode == "gesture":
+            # One point per camera frame, landmark jitter of ~1.5 px
+            for i in range(int(duration * 30)):
+                a = speed * i / 30
+                p = (int(cx + r * math.cos(a) + rng.gauss(0, 1.5)),
+                     int(cy + r * 0.6 * math.sin(a) + rng.gauss(0, 1.5)))
+                if prev is not None:
+                    strokes.append(stroke(prev, p, color, thickness, mode))
+                prev = p
+        else:
+            # Mouse: a segment every > 2 px of motion
+            for i in range(int(duration * 125)):
+                a = speed * i / 125
+                p = (int(cx + r * math.cos(a)), int(cy + r * 0.6 * math.sin(a)))
+                if prev is None or math.hypot(p[0] - prev[0], p[1] - prev[1]) > 2:
+                    if prev is not None:
+                        strokes.append(stroke(prev, p, color, thickness, mode))
+                    prev = p
+        t += duration + rng.uniform(0.3, 1.5)
+    return strokes
+
+
+def stroke(p1, p2, color, thickness, mode):
+    return {"x1": p1[0], "y1": p1[1], "x2": p2[0], "y2": p2[1], "color": color,
+            "thickness": thickness, "room_id": "BENCH", "mode": mode}
+
+
+def load_session(path):
+    with open(path) as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        return data["strokes"] if isinstance(data, dict) else data
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def replay(strokes, tolerance, poll):
+    state = GameState(simplify_tolerance=tolerance)
+    state.create_room_if_missing("BENCH")
+    for i, s in enumerate(strokes):
+        state.add_stroke("BENCH", json.dumps(s), s)
+        if poll and i % poll == 0:
+            state.get_history("BENCH")
+    return state.get_history("BENCH")
+
+
+def raster(view):
+    canvas = canvas_snapshot.np.zeros((canvas_snapshot.CANVAS_HEIGHT, canvas_snapshot.CANVAS_WIDTH, 3),
+                                      canvas_snapshot.np.uint8)
+    canvas_snapshot.draw_view(canvas, view)
+    return canvas
+
+
+def main():
+    args = sys.argv[1:]
+    poll = 0
+    if "--poll" in args:
+        poll = int(args[args.index("--poll") + 1])
+        del args[args.index("--poll"):args.index("--poll") + 2]
+    strokes = load_session(args[0]) if args else synthetic_session()
+    print(f"session: {len(strokes)} strokes, poll every {poll or '-'}")
+    print(f"{'tolerance':>9} {'segments':>9} {'catch-up B':>11} {'size':>6} {'px diff':>8}")
+
+    reference = None
+    for tolerance in TOLERANCES:
+        view = replay(strokes, tolerance, poll)
+        size = len(view.to_json_lines())
+        diff = ""
+        if canvas_snapshot.available():
+            canvas = raster(view)
+            if reference is None:
+                reference = canvas
+            diff = f"{(canvas != reference).any(axis=2).mean() * 100:.2f}%"
+        if tolerance is None:
+            full = size
+        print(f"{str(tolerance):>9} {len(view):>9} {size:>11} {size / full * 100:>5.0f}% {diff:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+/api/state load test: CPU per request as the number of rooms grows.
+
+Each room has PLAYERS web players and a full chat history. Compares the
+old all-rooms /api/state, the per-room /api/state/<room>, and the
+per-room request with the client's current version (304 Not Modified),
+all through Flask's test client so routing and JSON encoding count.
+The second table is GameState alone: rebuilding + encoding a room
+snapshot vs the cached, pre-encoded bytes.
+
+    python benchmarks/bench_state_endpoint.py [requests]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import admin
+from game_state import GameState
+
+ROOM_COUNTS = (1, 10, 100, 500)
+PLAYERS = 8
+
+
+def build_state(n_rooms):
+    state = GameState()
+    for r in range(n_rooms):
+        room_id = f"R{r}"
+        for p in range(PLAYERS):
+            state.add_web_client(room_id, f"p{p}")
+        for i in range(100):
+            state.append_chat(room_id, f"p{i % PLAYERS}: guess number {i}")
+    return state
+
+
+def cpu_per_request(client, url, n, headers=None):
+    c0 = time.process_time()
+    for _ in range(n):
+        resp = client.get(url, headers=headers)
+    return (time.process_time() - c0) / n, resp.status_code
+
+
+def time_per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    client = admin.app.test_client()
+
+    print(f"{'rooms':>6} {'/api/state us':>15} {'/state/<room> us':>17} {'304 us':>9}")
+    for n_rooms in ROOM_COUNTS:
+        admin.game_state_ref = build_state(n_rooms)
+        version = admin.game_state_ref.get_room_version("R0")
+
+        all_rooms, _ = cpu_per_request(client, "/api/state", max(5, n // n_rooms))
+        one_room, _ = cpu_per_request(client, "/api/state/R0", n)
+        unchanged, status = cpu_per_request(client, "/api/state/R0", n, {"If-None-Match": f'"{version}"'})
+        assert status == 304
+
+        print(f"{n_rooms:>6} {all_rooms * 1e6:>15.0f} {one_room * 1e6:>17.0f} {unchanged * 1e6:>9.0f}")
+
+    state = build_state(1)
+    rebuild = time_per_call(lambda: json.dumps(state.snapshot_room("R0", include_stats=False)).encode('utf-8'), n * 10)
+    cached = time_per_call(lambda: state.room_state_json("R0"), n * 10)
+    print(f"\nroom snapshot: rebuild+encode {rebuild * 1e6:.1f} us, cached {cached * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Stroke bytes per second of drawing: JSON records vs compact STROKES records.
+
+Simulates one second of drawing in each drawer.py input mode and encodes
+the segments the way StrokeSender would:
+  json      - one MSG_JSON record per segment (the stroke dict as sent)
+  compact/1 - one STROKES record per segment (sender never falls behind)
+  compact/N - the segments queued during one send tick coalesced into a
+              record (16 ms; a polyline run per record)
+  compact/s - the whole second as one record (upper bound, what a late
+              joiner's catch-up could look like)
+Also reports encode/decode CPU per segment.
+
+    python benchmarks/bench_stroke_codec.py [seconds]
+"""
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from framing import encode_record, MSG_JSON, STROKES
+from stroke_store import pack_stroke, unpack_stroke
+from stroke_codec import encode_segments, decode_segments
+
+TICK = 0.016
+
+
+def mouse_second(t0=0.0):
+    # ~125 Hz mouse events along a wobbly curve, a segment every > 2 px
+    # like drawer.py's mouse callback
+    strokes = []
+    xp, yp = 200, 200
+    for i in range(125):
+        t = t0 + i / 125
+        x = int(640 + 400 * math.cos(t * 1.7) + 15 * math.sin(t * 23))
+        y = int(360 + 250 * math.sin(t * 2.3) + 15 * math.cos(t * 19))
+        if math.hypot(x - xp, y - yp) > 2:
+            strokes.append((t, {"x1": xp, "y1": yp, "x2": x, "y2": y,
+                                "color": [255, 0, 255], "thickness": 15,
+                                "room_id": "ROOM42", "mode": "mouse"}))
+        xp, yp = x, y
+    return strokes
+
+
+def gesture_second(t0=0.0):
+    # one segment per camera frame at ~30 fps, switching to the eraser halfway
+    strokes = []
+    xp, yp = 300, 300
+    for i in range(30):
+        t = t0 + i / 30
+        x = int(640 + 300 * math.cos(t * 3.1))
+        y = int(360 + 200 * math.sin(t * 2.2))
+        eraser = i >= 15
+        strokes.append((t, {"x1": xp, "y1": yp, "x2": x, "y2": y,
+                            "color": [0, 0, 0] if eraser else [255, 0, 0],
+                            "thickness": 100 if eraser else 15,
+                            "room_id": "ROOM42", "mode": "gesture"}))
+        xp, yp = x, y
+    return strokes
+
+
+def json_bytes(timed):
+    return sum(len(encode_record(MSG_JSON, json.dumps(s).encode('utf-8'))) for _, s in timed)
+
+
+def compact_bytes(groups):
+    return sum(len(encode_record(STROKES, encode_segments([pack_stroke(s) for s in g])))
+               for g in groups if g)
+
+
+def by_tick(timed):
+    groups = {}
+    for t, stroke in timed:
+        groups.setdefault(int(t / TICK), []).append(stroke)
+    return list(groups.values())
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{'mode':>8} {'seg/s':>6} {'json B/s':>9} {'compact/1':>10} {'compact/N':>10} {'compact/s':>10}")
+    for name, make in (("mouse", mouse_second), ("gesture", gesture_second)):
+        totals = [0, 0, 0, 0, 0]
+        for sec in range(seconds):
+            timed = make(sec)
+            strokes = [s for _, s in timed]
+            totals[0] += len(strokes)
+            totals[1] += json_bytes(timed)
+            totals[2] += compact_bytes([[s] for s in strokes])
+            totals[3] += compact_bytes(by_tick(timed))
+            totals[4] += compact_bytes([strokes])
+        print(f"{name:>8} " + " ".join(f"{v / seconds:>{w}.0f}" for v, w in zip(totals, (6, 9, 10, 10, 10))))
+
+    # CPU: encode + decode every segment, both formats
+    strokes = [s for sec in range(seconds) for _, s in mouse_second(sec)]
+    c0 = time.process_time()
+    for s in strokes:
+        json.loads(json.dumps(s))
+    json_us = (time.process_time() - c0) / len(strokes) * 1e6
+    c0 = time.process_time()
+    for s in strokes:
+        [unpack_stroke(p) for p in decode_segments(encode_segments([pack_stroke(s)]))]
+    compact_us = (time.process_time() - c0) / len(strokes) * 1e6
+    decoded = [unpack_stroke(p) for p in decode_segments(encode_segments([pack_stroke(s) for s in strokes]))]
+    assert [pack_stroke(s) for s in decoded] == [pack_stroke(s) for s in strokes]
+    print(f"round trip per segment: json {json_us:.1f} us, compact {compact_us:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
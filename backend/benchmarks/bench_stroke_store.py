@@ -0,0 +1,81 @@
+"""
+Stroke history memory and replay cost: list of JSON strings vs StrokeStore.
+
+    python benchmarks/bench_stroke_store.py [segments]
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from stroke_store import StrokeStore
+
+
+def make_strokes(n):
+    rnd = random.Random(1)
+    x, y = 640, 360
+    strokes = []
+    for _ in range(n):
+        nx, ny = x + rnd.randint(-6, 6), y + rnd.randint(-6, 6)
+        strokes.append({
+            "x1": x, "y1": y, "x2": nx, "y2": ny,
+            "color": [0, 0, 255], "thickness": 15, "room_id": "ABCD", "mode": "mouse"
+        })
+        x, y = nx, ny
+    return strokes
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    strokes = make_strokes(n)
+    lines = [json.dumps(s) for s in strokes]
+
+    def build_list():
+        return [json.dumps(s) for s in strokes]
+
+    def build_store():
+        store = StrokeStore()
+        for s, line in zip(strokes, lines):
+            store.append(s, line)
+        return store
+
+    history, list_bytes = measure(build_list)
+    store, store_bytes = measure(build_store)
+
+    print(f"{n} segments")
+    print(f"  list[str] history: {list_bytes / 1e6:7.2f} MB ({list_bytes / n:.0f} B/segment)")
+    print(f"  StrokeStore:       {store_bytes / 1e6:7.2f} MB ({store_bytes / n:.0f} B/segment)")
+    print(f"  reduction:         {list_bytes / store_bytes:.1f}x")
+
+    t = time.perf_counter()
+    for _ in range(100):
+        list(history)
+    copy_ms = (time.perf_counter() - t) / 100 * 1e3
+    t = time.perf_counter()
+    for _ in range(100):
+        store.view(0)
+    view_ms = (time.perf_counter() - t) / 100 * 1e3
+    print(f"  get_history: list copy {copy_ms:.3f} ms, zero-copy view {view_ms:.3f} ms")
+
+    t = time.perf_counter()
+    data = store.view(0).to_json_lines()
+    print(f"  lazy JSON replay of all segments: {(time.perf_counter() - t) * 1e3:.1f} ms, {len(data) / 1e6:.2f} MB")
+    t = time.perf_counter()
+    data = store.view(0).to_binary()
+    print(f"  lazy binary export: {(time.perf_counter() - t) * 1e3:.2f} ms, {len(data) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
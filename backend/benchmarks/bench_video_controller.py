@@ -0,0 +1,131 @@
+"""
+Drawer video over a changing link: the old fixed settings vs VideoController.
+
+Simulates 30 fps camera frames (a textured scene with a moving hand-sized
+blob that stops now and then) going through a sender whose link drains
+a set number of bytes per second: good, then bad, then good again. The
+sender mimics StrokeSender (drop at VIDEO_QUEUE_MAX queued frames,
+moving-average latency). "fixed" is drawer.py's old loop (320x180, JPEG
+quality 50, 10 fps); "adaptive" is network.video_controller. Reports per
+phase the frames delivered per second, link bytes/s, and how long
+frames took to get through (settled: after the first SETTLE seconds).
+
+    python benchmarks/bench_video_controller.py [seconds per phase]
+"""
+import os
+import sys
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from network.stroke_sender import VIDEO_QUEUE_MAX
+import network.video_controller as vc
+
+CAMERA_FPS = 30
+SETTLE = 3.0 # seconds into a phase before "settled" latency counts
+PHASES = [("good", 400_000), ("bad", 30_000), ("good", 400_000)] # link bytes/s
+
+
+class SimSender:
+    """StrokeSender's video path over a link of a given capacity."""
+
+    def __init__(self):
+        self.queue = deque()    # [bytes left, time queued]
+        self.video_queued = 0
+        self.video_sent = 0
+        self.video_dropped = 0
+        self.video_latency = 0.0
+        self.delivered = []     # (time delivered, latency, size)
+
+    def send_video(self, jpeg, now):
+        if len(self.queue) >= VIDEO_QUEUE_MAX:
+            self.video_dropped += 1
+            return False
+        self.queue.append([len(jpeg), now, len(jpeg)])
+        self.video_queued += 1
+        return True
+
+    @property
+    def video_pending(self):
+        return self.video_queued - self.video_sent
+
+    def tick(self, now, budget):
+        while self.queue and budget > 0:
+            item = self.queue[0]
+            used = min(budget, item[0])
+            item[0] -= used
+            budget -= used
+            if item[0] == 0:
+                self.queue.popleft()
+                latency = now - item[1]
+                self.video_latency = latency if self.video_sent == 0 else self.video_latency * 0.7 + latency * 0.3
+                self.video_sent += 1
+                self.delivered.append((now, latency, item[2]))
+
+
+def camera(seconds):
+    rng = np.random.default_rng(0)
+    scene = cv2.GaussianBlur(rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8), (31, 31), 0)
+    scene = cv2.normalize(scene, None, 0, 250, cv2.NORM_MINMAX)
+    frame = np.empty_like(scene)
+    for i in range(int(seconds * CAMERA_FPS)):
+        t = i / CAMERA_FPS
+        # Moves for 4 s, holds still for 2 s
+        phase = t % 6
+        moving_t = t - phase + min(phase, 4)
+        x = int(640 + 400 * np.cos(moving_t * 1.1))
+        y = int(400 + 200 * np.sin(moving_t * 1.7))
+        frame[:] = scene
+        cv2.circle(frame, (x, y), 70, (120, 160, 200), cv2.FILLED)
+        # Camera noise
+        frame += rng.integers(0, 3, (1, 1280, 3), dtype=np.uint8)
+        yield t, frame
+
+
+def run(adaptive, seconds):
+    sender = SimSender()
+    controller = vc.VideoController(sender) if adaptive else None
+    last = -1.0
+    total = seconds * len(PHASES)
+    for t, frame in camera(total):
+        capacity = PHASES[min(int(t // seconds), len(PHASES) - 1)][1]
+        sender.tick(t, capacity / CAMERA_FPS)
+        if adaptive:
+            if controller.due(t):
+                jpeg = controller.encode(frame, t)
+                if jpeg is not None and not sender.send_video(jpeg, t):
+                    controller.dropped()
+        elif t - last > 0.1:
+            small = cv2.resize(frame, (320, 180))
+            _, buffer = cv2.imencode('.jpg', small, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
+            sender.send_video(buffer.tobytes(), t)
+            last = t
+    return sender, controller
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    results = {}
+    for name, adaptive in (("fixed", False), ("adaptive", True)):
+        results[name] = run(adaptive, seconds)
+
+    print(f"{'phase':>6} {'link KB/s':>9} {'mode':>9} {'fps':>5} {'KB/s':>6} {'mean ms':>8} {'p95 ms':>7} {'settled p95':>12}")
+    for i, (phase, capacity) in enumerate(PHASES):
+        lo, hi = i * seconds, (i + 1) * seconds
+        for name, (sender, _) in results.items():
+            got = [(lat, size) for t, lat, size in sender.delivered if lo <= t < hi]
+            lat = np.array([g[0] for g in got]) if got else np.zeros(1)
+            settled = [l for t, l, _ in sender.delivered if lo + SETTLE <= t < hi] or [0]
+            print(f"{phase:>6} {capacity / 1000:>9.0f} {name:>9} {len(got) / seconds:>5.1f} "
+                  f"{sum(g[1] for g in got) / seconds / 1000:>6.1f} {lat.mean() * 1000:>8.0f} "
+                  f"{np.percentile(lat, 95) * 1000:>7.0f} {np.percentile(settled, 95) * 1000:>12.0f}")
+    for name, (sender, controller) in results.items():
+        extra = f", skipped still: {controller.skipped_still}" if controller else ""
+        print(f"{name}: dropped at the sender: {sender.video_dropped}{extra}")
+
+
+if __name__ == "__main__":
+    main()
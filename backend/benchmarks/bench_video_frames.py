@@ -0,0 +1,108 @@
+"""
+Video frame cost per hop: base64-in-JSON lines vs binary JPEG records.
+
+Encodes a 320x180 q50 JPEG (like drawer.py) and pushes it through the
+three hops of each format, feeding the byte stream in the recv() sizes
+each side used:
+  sender   - build the wire bytes
+  server   - reassemble from recv() chunks, parse, build viewer bytes
+  receiver - reassemble from recv() chunks, recover the JPEG bytes
+JPEG encode/decode is the same for both and left out.
+
+    python benchmarks/bench_video_frames.py [frames]
+"""
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import numpy as np
+import cv2
+
+from framing import StreamDecoder, VideoFrame, encode_record, VIDEO_JPEG
+
+
+class Viewer:
+    binary_video = True
+
+
+def make_jpeg():
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (180, 320, 3), dtype=np.uint8), (7, 7), 0)
+    _, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
+    return buf
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def legacy_hops(buf):
+    # sender (drawer.py + StrokeSender)
+    packet = {"action": "video_frame", "room_id": "R", "player_name": "p",
+              "payload": base64.b64encode(buf).decode('utf-8')}
+    wire = (json.dumps(packet) + "\n").encode('utf-8')
+
+    # server: recv(1024) str buffer, handle_line + process_message both parse
+    buffer = ""
+    out = None
+    for chunk in chunks(wire, 1024):
+        buffer += chunk.decode('utf-8')
+        while "\n" in buffer:
+            message, buffer = buffer.split("\n", 1)
+            json.loads(message)
+            data = json.loads(message)
+            payload = data.get("payload")
+            out = (message + "\n").encode('utf-8')
+
+    # receiver: recv(4096) str buffer, json + base64 decode
+    buffer = ""
+    for chunk in chunks(out, 4096):
+        buffer += chunk.decode('utf-8')
+        while "\n" in buffer:
+            message, buffer = buffer.split("\n", 1)
+            jpeg = base64.b64decode(json.loads(message)["payload"])
+    return len(wire), len(out), jpeg
+
+
+def binary_hops(buf):
+    # sender
+    wire = encode_record(VIDEO_JPEG, buf.tobytes())
+
+    # server: recv(65536) into StreamDecoder, one lazily built variant per capability
+    decoder = StreamDecoder()
+    for chunk in chunks(wire, 65536):
+        for record_type, payload in decoder.feed(chunk):
+            out = VideoFrame(jpeg=payload).for_client(Viewer)
+
+    # receiver
+    decoder = StreamDecoder()
+    for chunk in chunks(out, 65536):
+        for record_type, payload in decoder.feed(chunk):
+            jpeg = payload
+    return len(wire), len(out), jpeg
+
+
+def measure(hops, buf, frames):
+    c0 = time.process_time()
+    for _ in range(frames):
+        sent, relayed, jpeg = hops(buf)
+    assert jpeg == buf.tobytes()
+    return (time.process_time() - c0) / frames, sent, relayed
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    buf = make_jpeg()
+    print(f"JPEG: {len(buf)} bytes, 10 fps")
+    print(f"{'format':>8} {'us/frame':>9} {'sent B':>8} {'relayed B':>10} {'KB/s per viewer':>16}")
+    for name, hops in (("json", legacy_hops), ("binary", binary_hops)):
+        cpu, sent, relayed = measure(hops, buf, frames)
+        print(f"{name:>8} {cpu * 1e6:>9.1f} {sent:>8} {relayed:>10} {relayed * 10 / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
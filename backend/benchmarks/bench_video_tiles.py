@@ -0,0 +1,123 @@
+"""
+Drawer video bytes: a full JPEG per frame vs tile deltas (video_tiles.py).
+
+Plays a recorded drawer session (ideally a webcam recording of someone
+drawing, any size; frames are taken at 10 fps and scaled to 320x180 like
+drawer.py) through both encoders at JPEG quality 50 and reports bytes per
+second, bytes per frame, how many tiles a delta carried, encode/decode
+cost and the PSNR of what a viewer ends up showing. Without a video, a
+synthetic session is used: textured background, sensor noise and a
+hand-sized blob that moves, then holds still.
+
+    python benchmarks/bench_video_tiles.py [video.mp4] [max_frames]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+import cv2
+import numpy as np
+
+from video_tiles import TileEncoder, TileDecoder, TILE
+
+FPS = 10
+SIZE = (320, 180)
+QUALITY = 50
+
+
+def load_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    step = max(1, round((cap.get(cv2.CAP_PROP_FPS) or 30) / FPS))
+    frames = []
+    i = 0
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if i % step == 0:
+            frames.append(cv2.resize(cv2.flip(frame, 1), SIZE, interpolation=cv2.INTER_AREA))
+        i += 1
+    cap.release()
+    return frames
+
+
+def synthetic_frames(limit):
+    rng = np.random.default_rng(0)
+    scene = cv2.GaussianBlur(rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8), (31, 31), 0)
+    frames = []
+    for i in range(limit):
+        t = i / FPS
+        # Moves for 4 s, holds still for 2 s
+        phase = t % 6
+        moving_t = t - phase + min(phase, 4)
+        frame = scene.copy()
+        cv2.circle(frame, (int(640 + 400 * np.cos(moving_t * 1.1)), int(400 + 200 * np.sin(moving_t * 1.7))),
+                   70, (120, 160, 200), cv2.FILLED)
+        noise = rng.normal(0, 3, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        frames.append(cv2.resize(frame, SIZE, interpolation=cv2.INTER_AREA))
+    return frames
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return 10 * np.log10(255 ** 2 / max(mse, 1e-9))
+
+
+def run_full(frames):
+    sizes, quality, enc, dec = [], [], 0.0, 0.0
+    for frame in frames:
+        t0 = time.perf_counter()
+        _, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), QUALITY])
+        t1 = time.perf_counter()
+        shown = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        dec += time.perf_counter() - t1
+        enc += t1 - t0
+        sizes.append(len(jpeg))
+        quality.append(psnr(shown, frame))
+    return sizes, quality, enc, dec, None
+
+
+def run_tiles(frames):
+    encoder, decoder = TileEncoder(), TileDecoder()
+    sizes, quality, enc, dec = [], [], 0.0, 0.0
+    for i, frame in enumerate(frames):
+        t0 = time.perf_counter()
+        payload = encoder.encode(frame, QUALITY, now=i / FPS)
+        t1 = time.perf_counter()
+        decoder.apply(payload)
+        dec += time.perf_counter() - t1
+        enc += t1 - t0
+        sizes.append(len(payload))
+        quality.append(psnr(decoder.frame, frame))
+    return sizes, quality, enc, dec, encoder
+
+
+def main():
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    if len(sys.argv) > 1:
+        frames = load_frames(sys.argv[1], limit)
+        if not frames:
+            print(f"No frames read from {sys.argv[1]}")
+            sys.exit(1)
+        source = sys.argv[1]
+    else:
+        frames = synthetic_frames(limit)
+        source = "synthetic session"
+    seconds = len(frames) / FPS
+    print(f"{source}: {len(frames)} frames at {FPS} fps, {SIZE[0]}x{SIZE[1]}, quality {QUALITY}")
+    print(f"{'mode':>6} {'KB/s':>7} {'B/frame':>8} {'enc ms':>7} {'dec ms':>7} {'PSNR dB':>8}")
+    for name, run in (("full", run_full), ("tiles", run_tiles)):
+        sizes, quality, enc, dec, encoder = run(frames)
+        print(f"{name:>6} {sum(sizes) / seconds / 1000:>7.1f} {np.mean(sizes):>8.0f} "
+              f"{enc / len(frames) * 1000:>7.2f} {dec / len(frames) * 1000:>7.2f} {np.mean(quality):>8.1f}")
+    tiles = -(-SIZE[0] // TILE) * -(-SIZE[1] // TILE)
+    print(f"tiles: {encoder.keyframes} keyframes, {encoder.deltas} deltas, "
+          f"{encoder.tiles_sent / max(encoder.deltas, 1):.1f} of {tiles} tiles per delta")
+
+
+if __name__ == "__main__":
+    main()
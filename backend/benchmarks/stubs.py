@@ -0,0 +1,44 @@
+"""
+Stand-ins shared by the benchmarks. The connection stubs subclass
+ClientConnection, so they pick up every attribute the server reads
+from a connection as it grows.
+"""
+import contextlib
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from connection import ClientConnection
+
+
+class NullConnection(ClientConnection):
+    """Discards everything it is sent: measures only the server's own CPU."""
+
+    def send(self, data, droppable=False):
+        return True
+
+    def _wake(self):
+        pass
+
+    def _close_transport(self):
+        pass
+
+
+class RecordingConnection(NullConnection):
+    """Counts the bytes it is sent."""
+
+    def __init__(self, peername=None):
+        super().__init__(peername)
+        self.bytes = 0
+
+    def send(self, data, droppable=False):
+        self.bytes += len(data)
+        return True
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the server's "Created new room"/"Added player" prints."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
@@ -6,7 +6,6 @@ import os
 import time
 import sys
 import json
-import base64
 
 # Add server directory to path to import Protocol
 sys.path.append(os.path.join(os.path.dirname(__file__), 'server'))
@@ -17,8 +16,12 @@ except ImportError:
 
 import AI_engine.handTracking as htm
 from AI_engine.stroke_manager import StrokeManager
+from AI_engine.pipeline import Mailbox, Worker, StageStats, format_stats
+from AI_engine.camera import WebcamStream
+from AI_engine.painter import Compositor, draw_strokes
 from network.stroke_sender import StrokeSender
 from network.stroke_receiver import StrokeReceiver
+from network.video_controller import VideoController
 folderPath = "assets/header"
 myList = os.listdir(folderPath)
 print(myList)
@@ -32,72 +35,18 @@ for imPath in myList:
 
 header = overlayList[0]
 
-# -------- WEBCAM STREAM CLASS --------
-class WebcamStream:
-    def __init__(self, src=0):
-        self.stream = None
-        self.src = src
-        self.stopped = True
-        self.thread = None
-        self.lock = threading.Lock()
-
-    def start(self):
-        if not self.stopped:
-            return self
-            
-        self.stream = cv2.VideoCapture(self.src)
-        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        
-        (self.grabbed, self.frame) = self.stream.read()
-        if not self.grabbed:
-             print("Failed to open camera")
-             self.stream.release()
-             return self
-
-        self.stopped = False
-        self.thread = threading.Thread(target=self.update, args=())
-        self.thread.start()
-        return self
-
-    def update(self):
-        while True:
-            if self.stopped:
-                return
-
-            (grabbed, frame) = self.stream.read()
-            with self.lock:
-                self.grabbed = grabbed
-                self.frame = frame
-
-    def read(self):
-        with self.lock:
-            if self.frame is None:
-                return False, None
-            return self.grabbed, self.frame.copy()
-
-    def stop(self):
-        self.stopped = True
-        if self.thread is not None and self.thread.is_alive():
-            self.thread.join()
-        
-        if self.stream:
-             self.stream.release()
-
 # -------- CAMERA --------
 # -------- CAMERA --------
 # Initialize Webcam Stream (but don't start yet)
 # Initialize Webcam Stream (but don't start yet)
 webcam_stream = WebcamStream(src=0)
 image_canvas = np.ones((720, 1280, 3), dtype=np.uint8) * 255
+# The stroke stage, mouse callback and remote strokes all draw on image_canvas
+canvas_lock = threading.Lock()
+# Persistent display frame; whoever draws on image_canvas marks the area
+compositor = Compositor(image_canvas, canvas_lock)
 
-# Video Constants
-VIDEO_WIDTH = 320
-VIDEO_HEIGHT = 180
-VIDEO_FPS = 10
-VIDEO_INTERVAL = 1.0 / VIDEO_FPS
-last_video_time = 0
-small_frame_to_send = None 
+# Video: size, JPEG quality and fps adapt to the link (network/video_controller.py)
 last_remote_frame = None 
 last_remote_frame_time = 0 
 
@@ -106,7 +55,8 @@ HEADER_HEIGHT = 100
 FRAME_WIDTH = 1280
 header = cv2.resize(header, (FRAME_WIDTH, HEADER_HEIGHT))
  
-detector = htm.handDetect(min_dect_confidence = 0.85)
+# fast: downscaled inference on a tracked ROI around the hand (handTracking.py)
+detector = htm.handDetect(min_dect_confidence = 0.85, fast = True)
 strokeManager = StrokeManager()
 
 # Ask for Room ID
@@ -145,6 +95,16 @@ except:
     player_name = "Guest"
 
 strokeSender = StrokeSender(room_id=room_id, player_name=player_name)
+# tiles: between keyframes only the parts of the frame that changed go out
+# (once the server says it takes them in its join_ack)
+video_controller = VideoController(strokeSender, tiles=True)
+
+def on_sender_message(msg):
+    # The server reports how viewers keep up with our video
+    if msg.get("action") == "video_feedback":
+        video_controller.on_feedback(msg.get("payload") or {})
+
+strokeSender.on_message = on_sender_message
 strokeReceiver = StrokeReceiver(room_id=room_id, player_name=player_name)
 strokeReceiver.connect()
 
@@ -193,7 +153,9 @@ def drawLocally(stroke,img,image_canvas):
     x2,y2 = stroke["x2"],stroke["y2"]
     color = stroke["color"]
     thickness = stroke["thickness"]
-    cv2.line(image_canvas, (x1, y1), (x2, y2), color, thickness)
+    with canvas_lock:
+        cv2.line(image_canvas, (x1, y1), (x2, y2), color, thickness)
+    compositor.mark_line((x1, y1), (x2, y2), thickness)
 
 # -------- MOUSE DRAWING STATE --------
 DRAW_MODE = "gesture" # "gesture" or "mouse"
@@ -234,7 +196,7 @@ def draw_mouse(event, x, y, flags, param):
                 }
                 
                 # Draw Locally (Reuse same function as gestures)
-                drawLocally(stroke, img, image_canvas)
+                drawLocally(stroke, None, image_canvas)
                 
                 # Send Stroke
                 if strokeSender:
@@ -251,8 +213,172 @@ def draw_mouse(event, x, y, flags, param):
 cv2.namedWindow("Image")
 cv2.setMouseCallback("Image", draw_mouse)
 
+# -------- PIPELINE --------
+# camera thread -> inference worker -> stroke/encode worker; the main loop
+# only renders what the stages produced last and never waits on them.
+# Stale frames are dropped at each mailbox instead of queueing up.
+hands_box = Mailbox()   # inference -> stroke stage (and the render overlay)
+
+def infer_stage(item):
+    # Read-only view into WebcamStream's ring, already mirrored and 1280x720
+    img = item["frame"]
+    hand = None
+    if DRAW_MODE == "gesture":
+        detector.findHands(img, draw = False)
+        lmList = detector.findPosition(img, draw = False)
+        if len(lmList) != 0:
+            # Copy: fast mode rewrites lmList on the next findHands
+            hand = {"lm": np.array(lmList), "fingers": detector.fingersUp()}
+    if not webcam_stream.is_current(item["seq"]):
+        # The camera overwrote the frame mid-inference: landmarks may be torn
+        return None
+    return {"t": item["t"], "seq": item["seq"], "img": img, "hand": hand}
+
+def stroke_stage(item):
+    if not is_drawer:
+        return None
+
+    # Send Video (Throttled to the controller's fps, still frames skipped)
+    # (skipped if the camera already reused this frame's ring slot)
+    if video_controller.due() and webcam_stream.is_current(item["seq"]):
+        jpeg = video_controller.encode(item["img"])
+        if jpeg is not None and not webcam_stream.is_current(item["seq"]):
+            # Reused while encoding: the JPEG may mix two frames
+            video_controller.dropped()
+            jpeg = None
+        # Send (raw JPEG bytes as a binary record, no base64/JSON)
+        if jpeg is not None and strokeSender:
+            if not strokeSender.send_video(jpeg, video_controller.record_type):
+                # Viewers never got it: the next frame can't build on it
+                video_controller.dropped()
+
+    if item["hand"] is not None:
+        handle_gesture(item["hand"])
+    return None
+
+def handle_gesture(hand):
+    global selectionColor, drawColor, Xprev, Yprev
+    lmList = hand["lm"]
+    fingers = hand["fingers"]
+    # Plain ints: strokes go out as JSON
+    x1,y1 = map(int, lmList[8][1:])
+    x2,y2 = map(int, lmList[12][1:])
+    xthumb,ythumb = map(int, lmList[4][1:])
+    xlittle,ylittle = map(int, lmList[20][1:])
+
+    # if selection mode ---->> two finger are up.
+    if fingers[1] and fingers[2]:
+        Xprev,Yprev = 0,0
+        if abs(x1-x2)<=50:
+            if y1<=130:
+                # overlay images here.
+                if 10<x1<200:
+                    selectionColor = (0,0,255)
+                elif 350<x1<550:
+                    selectionColor = (0,255,0)
+                elif 730<x1<880:
+                    selectionColor = (230,216,173)
+                elif 1030<x1<1280:
+                    selectionColor = (255,255,255)
+                    
+    # drawing mode----index finger is up.
+    drawColor = selectionColor
+        
+    if fingers[1] == 1 and fingers[2] == 0 and fingers[3] == 0 and fingers[4] == 0 and fingers[0] == 0 :
+        stroke = strokeManager.getStroke(x1,y1,drawColor,lineThickNess)
+        if stroke:
+            drawLocally(stroke, None, image_canvas)
+            stroke_data = stroke # Already a dict
+            stroke_data['room_id'] = room_id
+            stroke_data['mode'] = "gesture"
+            strokeSender.send_stroke(stroke_data)
+
+    if fingers[1] and fingers[2] == 1 and fingers[3] == 1 and fingers[4] == 1 and fingers[0] == 1:
+        # Local Drawing
+        with canvas_lock:
+            cv2.line(image_canvas,(xthumb,ythumb),(xlittle,ylittle),(255,255,255),60)
+        compositor.mark_line((xthumb,ythumb),(xlittle,ylittle),60)
+        
+        # Network Transmission
+        eraser_stroke = {
+            "x1": xthumb, "y1": ythumb, "x2": xlittle, "y2": ylittle,
+            "color": (255, 255, 255),
+            "thickness": 60,
+            "room_id": room_id,
+            "mode": "gesture"
+        }
+        if strokeSender:
+            strokeSender.send_stroke(eraser_stroke)
+
+infer_worker = Worker("infer", webcam_stream.frames, infer_stage, hands_box).start()
+stroke_worker = Worker("stroke", hands_box, stroke_stage).start()
+render_stats = StageStats("render")
+HAND_MAX_AGE = 0.5 # seconds; older inference results aren't drawn as a cursor
+stats_shown_at = 0
+stats_text = ""
+
+# -------- DISPLAY LAYERS (see compositor.layer) --------
+# Video box size: 320x180, top left below the 100px header
+PIP_W, PIP_H = 320, 180
+PIP_RECT = (0, HEADER_HEIGHT, PIP_W, HEADER_HEIGHT + PIP_H)
+
+def draw_pip_watched(frame):
+    x1, y1, x2, y2 = PIP_RECT
+    frame[y1:y2, x1:x2] = (30, 30, 30) # Dark gray background
+    cv2.putText(frame, "You are being", (x1 + 60, y1 + 80), cv2.FONT_HERSHEY_PLAIN, 1.5, (255, 255, 255), 2)
+    cv2.putText(frame, "watched!", (x1 + 100, y1 + 110), cv2.FONT_HERSHEY_PLAIN, 1.5, (255, 255, 255), 2)
+
+def draw_pip_no_video(frame):
+    x1, y1, x2, y2 = PIP_RECT
+    frame[y1:y2, x1:x2] = 0
+    cv2.putText(frame, "NO VIDEO", (x1 + 100, y1 + 100), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 1)
+
+def draw_pip_frame(frame, remote):
+    x1, y1, x2, y2 = PIP_RECT
+    # Remote frame is already 320x180, but just in case
+    if remote.shape[1] != PIP_W or remote.shape[0] != PIP_H:
+        remote = cv2.resize(remote, (PIP_W, PIP_H))
+    frame[y1:y2, x1:x2] = remote
+
+def draw_pip_frame_label(frame):
+    x1, y1, x2, y2 = PIP_RECT
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (50, 50, 50), 3)
+    # Label "DRAWER" on its own background
+    cv2.rectangle(frame, (x1, y1 - 25), (x1 + 100, y1), (50, 50, 50), cv2.FILLED)
+    cv2.putText(frame, "DRAWER", (x1 + 10, y1 - 5), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 1)
+
+def draw_header(frame):
+    frame[0:HEADER_HEIGHT, 0:FRAME_WIDTH] = header
+
+def draw_word_card(frame, text, color):
+    cv2.rectangle(frame, (390, 60), (900, 110), (255, 255, 255), cv2.FILLED)
+    cv2.putText(frame, text, (400, 100), cv2.FONT_HERSHEY_PLAIN, 3, color, 4)
+
+def draw_cursor(frame, center, radius, color, border):
+    cv2.circle(frame, center, radius, color, cv2.FILLED)
+    cv2.circle(frame, center, radius, (0,0,0), border)
+
+def text_layer(name, text, org, scale, color, thickness):
+    # A putText as a layer, only re-rendered when the text or color changes
+    (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_PLAIN, scale, thickness)
+    rect = (org[0] - thickness, org[1] - h - thickness, org[0] + w + thickness, org[1] + baseline + thickness)
+    compositor.layer(name, rect, (text, color),
+                     lambda frame: cv2.putText(frame, text, org, cv2.FONT_HERSHEY_PLAIN, scale, color, thickness))
+RENDER_INTERVAL = 1.0 / 60 # render no faster than this; the rest of the CPU is inference's
+# Remote strokes: drained in chunks and drawn batched (draw_strokes) for at
+# most this long per frame, so a late-join replay is spread over frames
+REMOTE_STROKE_BUDGET = 0.004
+REMOTE_STROKE_CHUNK = 256
+
+def draw_remote_strokes(strokes):
+    with canvas_lock:
+        rects = draw_strokes(image_canvas, strokes)
+    for rect in rects:
+        compositor.mark(*rect)
+
 # -------- MAIN LOOP --------
 while True:
+    render_started = time.monotonic()
     # 0. Determine Role First
     if strokeReceiver.current_drawer:
         is_drawer = (player_name == strokeReceiver.current_drawer)
@@ -264,40 +390,10 @@ while True:
     # 1. Camera & Video Logic (STRICT SEPARATION)
     if is_drawer:
         # --- DRAWER PATH ---
-        # 1. Ensure Camera Running
+        # Ensure Camera Running; capture, inference, strokes and video
+        # encoding happen in the pipeline stages
         if webcam_stream.stopped:
             webcam_stream.start()
-        
-        # 2. Capture Frame
-        success, img = webcam_stream.read()
-        if not success or img is None:
-            img = np.zeros((720, 1280, 3), dtype=np.uint8)
-        else:
-            img = cv2.flip(img, 1)
-            if img.shape[1] != 1280 or img.shape[0] != 720:
-                img = cv2.resize(img, (1280, 720))
-
-        # 3. Send Video (Throttled)
-        current_time = time.time()
-        if current_time - last_video_time > VIDEO_INTERVAL:
-            # Resize
-            small_frame_to_send = cv2.resize(img, (VIDEO_WIDTH, VIDEO_HEIGHT))
-            
-            # Encode
-            _, buffer = cv2.imencode('.jpg', small_frame_to_send, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-            jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-            
-            # Send
-            video_packet = {
-                "action": Protocol.VIDEO_FRAME,
-                "room_id": room_id,
-                "player_name": player_name,
-                "payload": jpg_as_text
-            }
-            if strokeSender:
-                strokeSender.send_video(video_packet)
-            
-            last_video_time = current_time
 
     else:
         # --- GUESSER PATH ---
@@ -314,203 +410,151 @@ while True:
         # 3. Timeout Cleanup (3s)
         if time.time() - last_remote_frame_time > 3.0:
             last_remote_frame = None
-
-        # 4. Dummy Img (Guesser doesn't process own camera)
-        img = np.zeros((720, 1280, 3), dtype=np.uint8)
-        success = True
     
-    # Check for remote strokes
-    while True:
-        remote_stroke = strokeReceiver.get_stroke()
-        if not remote_stroke:
+    # Check for remote strokes (batched, within the frame budget)
+    remote_deadline = time.monotonic() + REMOTE_STROKE_BUDGET
+    while time.monotonic() < remote_deadline:
+        remote_items = strokeReceiver.get_strokes(REMOTE_STROKE_CHUNK)
+        if not remote_items:
             break
-            
-        if remote_stroke.get("action") == "clear_canvas":
-            # Clear Canvas to White
-            image_canvas[:] = 255
-            print("Canvas Cleared!")
-            continue
-            
-        drawLocally(remote_stroke, img, image_canvas)
-        
-    if not success and is_drawer:
-         pass # Don't break loop if camera flickers, just keep trying or show black
-         # print("Camera failed")
-         # break
 
-    # find landmark---2
-    lmList = []
-    if DRAW_MODE == "gesture":
-        img = detector.findHands(img)
-        lmList = detector.findPosition(img,draw = False)
-    
-    if len(lmList) != 0: # Already checked DRAW_MODE via lmList being empty if not gesture
-        x1,y1 = lmList[8][1:]
-        x2,y2 = lmList[12][1:]
-        xthumb,ythumb = lmList[4][1:]
-        xlittle,ylittle = lmList[20][1:]
-
-        # check which fingers are up---3
-        fingers = detector.fingersUp()
-
-        if is_drawer:
-            # if selection mode ---->> two finger are up.
-            if fingers[1] and fingers[2]:
-                Xprev,Yprev = 0,0
-                if abs(x1-x2)<=50:
-                    cv2.rectangle(img,(x1,y1-25),(x2,y2+25),selectionColor,cv2.FILLED)
-                    if y1<=130:
-                        # overlay images here.
-                        if 10<x1<200:
-                            selectionColor = (0,0,255)
-                        elif 350<x1<550:
-                            selectionColor = (0,255,0)
-                        elif 730<x1<880:
-                            selectionColor = (230,216,173)
-                        elif 1030<x1<1280:
-                            selectionColor = (255,255,255)
-                            
-            # drawing mode----index finger is up.
-            drawColor = selectionColor
-                
-            if fingers[1] == 1 and fingers[2] == 0 and fingers[3] == 0 and fingers[4] == 0 and fingers[0] == 0 :
-                cv2.circle(img,(x1,y1),15,drawColor,cv2.FILLED)
-                
-                stroke = strokeManager.getStroke(x1,y1,drawColor,lineThickNess)
-                if stroke:
-                    drawLocally(stroke, img, image_canvas)
-                    stroke_data = stroke # Already a dict
-                    stroke_data['room_id'] = room_id
-                    stroke_data['mode'] = "gesture"
-                    strokeSender.send_stroke(stroke_data)
-
-            if fingers[1] and fingers[2] == 1 and fingers[3] == 1 and fingers[4] == 1 and fingers[0] == 1:
-                # Local Drawing
-                cv2.line(image_canvas,(xthumb,ythumb),(xlittle,ylittle),(255,255,255),60)
-                
-                # Network Transmission
-                eraser_stroke = {
-                    "x1": xthumb, "y1": ythumb, "x2": xlittle, "y2": ylittle,
-                    "color": (255, 255, 255),
-                    "thickness": 60,
-                    "room_id": room_id,
-                    "mode": "gesture"
-                }
-                if strokeSender:
-                    strokeSender.send_stroke(eraser_stroke)
-        else:
-             pass # Guessers don't draw
-
-    # -------- MOUSE DRAWING (MAIN LOOP) --------
-    # Mouse drawing logic is now handled in the callback (draw_mouse) 
-    # to ensure high sampling rate and smooth curves.
-    pass
+        strokes = []
+        for remote_stroke in remote_items:
+            action = remote_stroke.get("action")
+            if action is None and "x1" in remote_stroke:
+                strokes.append(remote_stroke)
+                continue
+            if action not in ("clear_canvas", "canvas_snapshot"):
+                continue
+            # Canvas actions apply after the strokes before them
+            draw_remote_strokes(strokes)
+            strokes = []
+
+            if action == "clear_canvas":
+                # Clear Canvas to White
+                with canvas_lock:
+                    image_canvas[:] = 255
+                compositor.mark_all()
+                print("Canvas Cleared!")
+            else:
+                # Joined mid-round: start from the server's raster of the canvas
+                snapshot = remote_stroke["image"]
+                if snapshot.shape != image_canvas.shape:
+                    snapshot = cv2.resize(snapshot, (image_canvas.shape[1], image_canvas.shape[0]))
+                with canvas_lock:
+                    image_canvas[:] = snapshot
+                compositor.mark_all()
+        draw_remote_strokes(strokes)
+
+    # Latest hand for the cursor overlay (whatever inference has, no waiting)
+    _, latest = hands_box.latest()
+    hand = None
+    if is_drawer and DRAW_MODE == "gesture" and latest is not None \
+            and time.monotonic() - latest["t"] < HAND_MAX_AGE:
+        hand = latest["hand"]
 
     # -------- COMPOSITION --------
-    # 1. Base Layer: Drawing Canvas (White)
-    img_display = image_canvas.copy()
-
-    # 2. Overlay: Camera Feed (PIP - Picture in Picture)
-    # Resize camera to be smaller (e.g., 20% of width)
-    # 1280 * 0.2 = 256 width. Aspect ratio 16:9 -> 144 height.
-    h, w, _ = img.shape
-    pip_w = 320
-    pip_h = 180
-    
+    # Persistent display frame (AI_engine/painter.py): only areas touched by
+    # strokes, the cursor or a changed overlay are recomposed. Overlays are
+    # layers, re-rendered only when their key (content) changes.
+
+    # 1. Overlay: Camera Feed (PIP - Picture in Picture)
     if is_drawer:
         # Drawer sees a placeholder, not themselves
-        pip_img = np.zeros((pip_h, pip_w, 3), dtype=np.uint8)
-        pip_img[:] = (30, 30, 30) # Dark gray background
-        cv2.putText(pip_img, "You are being", (60, 80), cv2.FONT_HERSHEY_PLAIN, 1.5, (255, 255, 255), 2)
-        cv2.putText(pip_img, "watched!", (100, 110), cv2.FONT_HERSHEY_PLAIN, 1.5, (255, 255, 255), 2)
+        compositor.layer("pip", PIP_RECT, "watched", draw_pip_watched, opaque=True)
+    elif last_remote_frame is not None:
+        # New frames only (~10 fps); the frame object is the key
+        compositor.layer("pip", PIP_RECT, id(last_remote_frame),
+                         lambda frame, remote=last_remote_frame: draw_pip_frame(frame, remote), opaque=True)
     else:
-        if last_remote_frame is not None:
-             # Remote frame is already 320x180, but just in case
-             if last_remote_frame.shape[1] != pip_w or last_remote_frame.shape[0] != pip_h:
-                 pip_img = cv2.resize(last_remote_frame, (pip_w, pip_h))
-             else:
-                 pip_img = last_remote_frame
-        else:
-             # Placeholder (Black box)
-             pip_img = np.zeros((pip_h, pip_w, 3), dtype=np.uint8)
-             cv2.putText(pip_img, "NO VIDEO", (100, 100), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 1)
-    
-    # Position: Top Left (below header)
-    # Header is 100px.
-    # Video box size: 320x180
-    pip_x1 = 0
-    pip_y1 = HEADER_HEIGHT
-    pip_x2 = pip_x1 + pip_w
-    pip_y2 = HEADER_HEIGHT + pip_h
-    
-    img_display[pip_y1:pip_y2, pip_x1:pip_x2] = pip_img
-    
-    # Draw Border
-    cv2.rectangle(img_display, (pip_x1, pip_y1), (pip_x2, pip_y2), (50, 50, 50), 3)
-    
-    # Draw Label "DRAWER"
-    # Background for label
-    cv2.rectangle(img_display, (pip_x1, pip_y1 - 25), (pip_x1 + 100, pip_y1), (50, 50, 50), cv2.FILLED)
-    cv2.putText(img_display, "DRAWER", (pip_x1 + 10, pip_y1 - 5), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 1)
+        compositor.layer("pip", PIP_RECT, "no video", draw_pip_no_video, opaque=True)
+    # Border and "DRAWER" label
+    compositor.layer("pip_frame", (PIP_RECT[0] - 2, PIP_RECT[1] - 27, PIP_RECT[2] + 3, PIP_RECT[3] + 3),
+                     "static", draw_pip_frame_label)
 
-    # 3. Overlay: UI Elements (Header)
-    img_display[0:HEADER_HEIGHT, 0:FRAME_WIDTH] = header
-    
-    # 4. Overlay: Feedback & Cursors (Temporary, not saved to canvas)
-    # If Gesture Mode, show hand landmarks or at least the drawing cursor
-    if DRAW_MODE == "gesture":
-        # We need to project the finger position onto the canvas if possible?
-        # x1, y1 are already screen coordinates.
-        if len(lmList) != 0:
-            # Draw cursor on display only
-            if fingers[1] == 1 and fingers[2] == 0:
-                 cv2.circle(img_display, (x1, y1), 15, drawColor, cv2.FILLED)
-                 cv2.circle(img_display, (x1, y1), 15, (0,0,0), 2) # border
-            elif fingers[1] and fingers[2]:
-                 # Selection mode
-                  cv2.rectangle(img_display, (x1, y1-25), (x2, y2+25), selectionColor, cv2.FILLED)
-
-    elif DRAW_MODE == "mouse":
-         # Draw mouse cursor
-         cv2.circle(img_display, (mouse_x, mouse_y), 10, drawColor, cv2.FILLED)
-         cv2.circle(img_display, (mouse_x, mouse_y), 10, (0,0,0), 1)
+    # 2. Overlay: UI Elements (Header)
+    compositor.layer("header", (0, 0, FRAME_WIDTH, HEADER_HEIGHT), "static", draw_header, opaque=True)
 
-    # UI Text
-    cv2.putText(img_display, f"Room: {room_id}", (10, 150), cv2.FONT_HERSHEY_PLAIN, 1, (255, 0, 0), 2)
-    cv2.putText(img_display, f"Player: {player_name}", (10, 170), cv2.FONT_HERSHEY_PLAIN, 1, (255, 0, 0), 2)
+    # 3. UI Text
+    text_layer("room", f"Room: {room_id}", (10, 150), 1, (255, 0, 0), 2)
+    text_layer("player", f"Player: {player_name}", (10, 170), 1, (255, 0, 0), 2)
     
     # Mode Display
     mode_color = (0, 255, 0) if DRAW_MODE == "gesture" else (0, 0, 255)
-    cv2.putText(img_display, f"Mode: {DRAW_MODE.upper()}", (10, 210), cv2.FONT_HERSHEY_PLAIN, 1.5, mode_color, 2)
-    cv2.putText(img_display, "('m': Mouse, 'g': Gesture)", (10, 230), cv2.FONT_HERSHEY_PLAIN, 1, (100, 100, 100), 1)
+    text_layer("mode", f"Mode: {DRAW_MODE.upper()}", (10, 210), 1.5, mode_color, 2)
+    text_layer("mode_help", "('m': Mouse, 'g': Gesture)", (10, 230), 1, (100, 100, 100), 1)
 
     # Ready Status
     status_text = "READY" if is_ready else "NOT READY"
     status_color = (0, 255, 0) if is_ready else (0, 0, 255)
-    cv2.putText(img_display, f"Status: {status_text}", (10, 260), cv2.FONT_HERSHEY_PLAIN, 1.5, status_color, 2)
-    cv2.putText(img_display, "('r': Toggle Ready)", (10, 280), cv2.FONT_HERSHEY_PLAIN, 1, (100, 100, 100), 1)
+    text_layer("status", f"Status: {status_text}", (10, 260), 1.5, status_color, 2)
+    text_layer("status_help", "('r': Toggle Ready)", (10, 280), 1, (100, 100, 100), 1)
 
     # Timer Display
     if strokeReceiver.round_end_time:
         time_left = max(0, int(strokeReceiver.round_end_time - time.time()))
-        cv2.putText(img_display, f"Time: {time_left}s", (10, 190), cv2.FONT_HERSHEY_PLAIN, 1, (255, 0, 0), 2)
+        text_layer("timer", f"Time: {time_left}s", (10, 190), 1, (255, 0, 0), 2)
+    else:
+        compositor.remove_layer("timer")
     
-    # Word Display
+    # Word Display ('card' background for the word)
     if strokeReceiver.current_word:
-         # Draw 'card' background for word
-         cv2.rectangle(img_display, (390, 60), (900, 110), (255, 255, 255), cv2.FILLED)
-         cv2.putText(img_display, f"DRAW: {strokeReceiver.current_word}", (400, 100), cv2.FONT_HERSHEY_PLAIN, 3, (0, 0, 0), 4)
+         word_card = (f"DRAW: {strokeReceiver.current_word}", (0, 0, 0))
     elif strokeReceiver.current_drawer and not is_drawer:
-         cv2.rectangle(img_display, (390, 60), (900, 110), (255, 255, 255), cv2.FILLED)
-         cv2.putText(img_display, "GUESS THE WORD!", (400, 100), cv2.FONT_HERSHEY_PLAIN, 3, (0, 0, 255), 4)
+         word_card = ("GUESS THE WORD!", (0, 0, 255))
+    else:
+         word_card = None
+    if word_card:
+         compositor.layer("word", (390, 60, 901, 111), word_card,
+                          lambda frame, card=word_card: draw_word_card(frame, *card))
+    else:
+         compositor.remove_layer("word")
 
     # Guesser/Drawer status
     if not is_drawer:
-         cv2.putText(img_display, f"Guesser (Drawer: {strokeReceiver.current_drawer})", (20, 50), cv2.FONT_HERSHEY_PLAIN, 2, (0, 0, 255), 3)
+         text_layer("role", f"Guesser (Drawer: {strokeReceiver.current_drawer})", (20, 50), 2, (0, 0, 255), 3)
+    else:
+         compositor.remove_layer("role")
+
+    # Per-stage latency (drawer only: the stages idle otherwise), refreshed twice a second
+    if is_drawer:
+        if time.monotonic() - stats_shown_at > 0.5:
+            stats_shown_at = time.monotonic()
+            stats_text = format_stats([infer_worker.stats, stroke_worker.stats, render_stats]) + \
+                         f"  frame age {render_stats.age * 1000:.0f}ms"
+        text_layer("stats", stats_text, (10, 710), 1, (100, 100, 100), 1)
+    else:
+        compositor.remove_layer("stats")
+
+    # 4. Feedback & Cursors (Temporary, not saved to canvas), redrawn every frame
+    cursors = []
+    if DRAW_MODE == "gesture":
+        # x1, y1 are already screen coordinates.
+        if hand is not None:
+            fingers = hand["fingers"]
+            x1,y1 = map(int, hand["lm"][8][1:])
+            x2,y2 = map(int, hand["lm"][12][1:])
+            if fingers[1] == 1 and fingers[2] == 0:
+                 cursors.append(((x1 - 17, y1 - 17, x1 + 18, y1 + 18),
+                                 lambda frame, c=(x1, y1), color=drawColor: draw_cursor(frame, c, 15, color, 2)))
+            elif fingers[1] and fingers[2]:
+                 # Selection mode
+                 box = ((x1, y1-25), (x2, y2+25))
+                 cursors.append(((min(x1, x2), min(y1 - 25, y2 + 25), max(x1, x2) + 1, max(y1 - 25, y2 + 25) + 1),
+                                 lambda frame, box=box, color=selectionColor: cv2.rectangle(frame, box[0], box[1], color, cv2.FILLED)))
+
+    elif DRAW_MODE == "mouse":
+         # Draw mouse cursor
+         cursors.append(((mouse_x - 11, mouse_y - 11, mouse_x + 12, mouse_y + 12),
+                         lambda frame, c=(mouse_x, mouse_y), color=drawColor: draw_cursor(frame, c, 10, color, 1)))
+
+    img_display = compositor.compose(cursors)
 
     # Show Image
     cv2.imshow("Image", img_display)
-    key = cv2.waitKey(1)
+    render_stats.record(render_started, latest["t"] if latest is not None else None)
+    # waitKey doubles as the frame pacing (and runs the mouse callback)
+    key = cv2.waitKey(max(1, int((render_started + RENDER_INTERVAL - time.monotonic()) * 1000)))
     if  key & 0xFF == ord("q") or key == 27:
         break
     elif key & 0xFF == ord('m'):
@@ -545,8 +589,16 @@ while True:
         if strokeSender:
             strokeSender.send_ready(is_ready)
 
+infer_worker.stop()
+stroke_worker.stop()
+print(f"Pipeline stats: {[w.stats.to_dict() for w in (infer_worker, stroke_worker)] + [render_stats.to_dict()]}")
+print(f"Frames dropped: camera->infer {webcam_stream.frames.dropped}, infer->stroke {hands_box.dropped}")
 if not webcam_stream.stopped:
     webcam_stream.stop()
 strokeReceiver.close()
+if strokeSender:
+    print(f"Sender stats: {strokeSender.stats()}")
+    print(f"Video stats: {video_controller.stats()}")
+    strokeSender.close()
 cv2.destroyAllWindows()
     
@@ -1,11 +1,20 @@
 import socket
 import json
 import threading
-from queue import Queue
+from queue import Queue, Empty
 import base64
+import os
+import sys
 import numpy as np
 import cv2
 
+# Shared wire format lives with the server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+from framing import StreamDecoder, VIDEO_JPEG, VIDEO_TILES, MSG_JSON, STROKES
+from stroke_store import unpack_stroke
+from stroke_codec import decode_segments
+from video_tiles import TileDecoder
+
 class StrokeReceiver:
     def __init__(self, host='localhost', port=8080, room_id='default', player_name='Unknown'):
         self.address = (host, port)
@@ -14,6 +23,7 @@ class StrokeReceiver:
         self.running = False
         self.stroke_queue = Queue()
         self.video_queue = Queue(maxsize=2) # Keep it fresh
+        self.tile_decoder = TileDecoder() # drawer's picture, patched by tile deltas
         self.client_socket = None
         self.current_drawer = None
         self.current_word = None
@@ -38,7 +48,12 @@ class StrokeReceiver:
             return False
 
     def _send_handshake(self):
-        handshake = {"action": "join", "room_id": self.room_id, "player_name": self.player_name}
+        # framed: the server sends every message as a length-prefixed record,
+        # video as the drawer's raw JPEG bytes; compact_strokes: strokes as
+        # delta-coded polylines (stroke_codec.py); video_tiles: video as
+        # changed tiles only (video_tiles.py)
+        handshake = {"action": "join", "room_id": self.room_id, "player_name": self.player_name,
+                     "framed": True, "compact_strokes": True, "video_tiles": True}
         try:
             msg = json.dumps(handshake) + "\n"
             self.client_socket.sendall(msg.encode('utf-8'))
@@ -47,82 +62,32 @@ class StrokeReceiver:
             self.running = False
 
     def _receive_loop(self):
-        buffer = ""
+        # Records (and newline JSON from older servers) on the same socket
+        decoder = StreamDecoder()
         while self.running and self.client_socket:
             try:
-                data = self.client_socket.recv(4096) # Increase buffer for video
+                data = self.client_socket.recv(65536) # Large reads for video
                 if not data:
                     break
                     
-                chunk = data.decode('utf-8')
-                buffer += chunk
-                
-                while "\n" in buffer:
-                    message, buffer = buffer.split("\n", 1)
-                    if message.strip():
+                for record_type, payload in decoder.feed(data):
+                    if record_type == VIDEO_JPEG:
+                        # Raw JPEG bytes, no base64/JSON to undo
+                        self._push_video(payload)
+                    elif record_type == VIDEO_TILES:
+                        self._push_tiles(payload)
+                    elif record_type == STROKES:
                         try:
-                            msg = json.loads(message)
-                            
-                            # Check for Protocol Actions
-                            action = msg.get("action")
-                            if action == "video_frame":
-                                try:
-                                    payload = msg.get("payload")
-                                    # Decode Base64 to Bytes
-                                    img_bytes = base64.b64decode(payload)
-                                    # Decode Image (Fast enough? If not, move to main thread. 
-                                    # But main thread is busy drawing. 
-                                    # Let's decode here. 320x180 JPEG is small.)
-                                    # Convert bytes to numpy array
-                                    nparr = np.frombuffer(img_bytes, np.uint8)
-                                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                                    
-                                    if frame is not None:
-                                        # Push to queue (Drop old if full to keep low latency)
-                                        if self.video_queue.full():
-                                            try:
-                                                self.video_queue.get_nowait()
-                                            except:
-                                                pass
-                                        self.video_queue.put(frame)
-                                except Exception as e:
-                                    # print(f"Video decode error: {e}") 
-                                    pass # drop frame
-                                    
-                            elif action == "drawer_assign":
-                                self.current_drawer = msg.get("player_name")
-                                print(f"New Drawer: {self.current_drawer}")
-                            elif action == "game_start":
-                                print("Game Started!")
-                                duration = msg.get("payload", 60)
-                                import time
-                                self.round_end_time = time.time() + float(duration)
-                            elif action == "your_word":
-                                self.current_word = msg.get("payload")
-                                print(f"YOUR WORD: {self.current_word}")
-                            elif action == "round_over":
-                                self.current_drawer = None
-                                self.current_word = None
-                                self.round_end_time = None
-                                print("\n=== ROUND OVER ===")
-                                # Inject Clear Canvas command
-                                self.stroke_queue.put({"action": "clear_canvas"})
-                            elif action == "chat":
-                                payload = msg.get("payload")
-                                print(f"\n[CHAT] {payload}\n")
-                            else:
-                                # Assume it's a stroke or other data
-                                self.stroke_queue.put(msg)
-                                
+                            for segment in decode_segments(payload):
+                                self.stroke_queue.put(unpack_stroke(segment))
+                        except (ValueError, IndexError, KeyError) as e:
+                            # One bad record must not end the receive loop
+                            print(f"Receiver stroke record error: {e!r}")
+                    elif (record_type is None or record_type == MSG_JSON) and payload.strip():
+                        try:
+                            self._handle_message(json.loads(payload))
                         except json.JSONDecodeError:
-                            # Might happen if video packet gets split awkwardly? 
-                            # But we split by \n, so strictly one line.
-                            # Large payloads might exceed recv buffer?
-                            # We increased recv to 4096. 
-                            # TCP stream ensures we get full bytes eventually, 
-                            # but `recv` might return partial chunk.
-                            # `buffer += chunk` handles reconstruction.
-                            print(f"Receiver JSON error: {message[:50]}...")
+                            print(f"Receiver JSON error: {payload[:50]}...")
                             
             except Exception as e:
                 if self.running: # Only print error if we weren't trying to close
@@ -134,11 +99,100 @@ class StrokeReceiver:
         if self.client_socket:
             self.client_socket.close()
 
+    def _push_video(self, img_bytes):
+        try:
+            # Decode Image (Fast enough? If not, move to main thread. 
+            # But main thread is busy drawing. 
+            # Let's decode here. 320x180 JPEG is small.)
+            # Convert bytes to numpy array
+            nparr = np.frombuffer(img_bytes, np.uint8)
+            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            
+            if frame is not None:
+                self._push_frame(frame)
+        except Exception as e:
+            # print(f"Video decode error: {e}") 
+            pass # drop frame
+
+    def _push_tiles(self, payload):
+        try:
+            if self.tile_decoder.apply(payload):
+                # Copy: the decoder patches its frame in place
+                self._push_frame(self.tile_decoder.frame.copy())
+        except ValueError as e:
+            print(f"Video tiles error: {e}")
+
+    def _push_frame(self, frame):
+        # Push to queue (Drop old if full to keep low latency)
+        if self.video_queue.full():
+            try:
+                self.video_queue.get_nowait()
+            except:
+                pass
+        self.video_queue.put(frame)
+
+    def _handle_message(self, msg):
+        # Check for Protocol Actions
+        action = msg.get("action")
+        if action == "video_frame":
+            # Legacy base64-in-JSON frame
+            try:
+                self._push_video(base64.b64decode(msg.get("payload")))
+            except Exception:
+                pass # drop frame
+                
+        elif action == "drawer_assign":
+            self.current_drawer = msg.get("player_name")
+            print(f"New Drawer: {self.current_drawer}")
+        elif action == "game_start":
+            print("Game Started!")
+            duration = msg.get("payload", 60)
+            import time
+            self.round_end_time = time.time() + float(duration)
+        elif action == "your_word":
+            self.current_word = msg.get("payload")
+            print(f"YOUR WORD: {self.current_word}")
+        elif action == "round_over":
+            self.current_drawer = None
+            self.current_word = None
+            self.round_end_time = None
+            print("\n=== ROUND OVER ===")
+            # Inject Clear Canvas command
+            self.stroke_queue.put({"action": "clear_canvas"})
+        elif action == "canvas_snapshot":
+            # Late join into a compacted room: canvas so far as a PNG
+            try:
+                img_bytes = base64.b64decode(msg.get("payload", ""))
+                canvas = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+                if canvas is not None:
+                    # Same queue as strokes so it lands before the ones after it
+                    self.stroke_queue.put({"action": "canvas_snapshot", "image": canvas})
+            except Exception as e:
+                print(f"Snapshot decode error: {e}")
+        elif action == "join_ack":
+            pass # framed mode confirmed; the decoder takes both forms anyway
+        elif action == "chat":
+            payload = msg.get("payload")
+            print(f"\n[CHAT] {payload}\n")
+        else:
+            # Assume it's a stroke or other data
+            self.stroke_queue.put(msg)
+
     def get_stroke(self):
         if not self.stroke_queue.empty():
             return self.stroke_queue.get()
         return None
         
+    def get_strokes(self, limit):
+        """Up to limit queued items (strokes and canvas actions), oldest first, without waiting."""
+        items = []
+        try:
+            while len(items) < limit:
+                items.append(self.stroke_queue.get_nowait())
+        except Empty:
+            pass
+        return items
+
     def get_video_frame(self):
         if not self.video_queue.empty():
             return self.video_queue.get()
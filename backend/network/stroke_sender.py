@@ -1,10 +1,28 @@
+import base64
 import json
+import os
 import socket
+import sys
 import threading
+import time
 import queue
 
+# Shared wire format lives with the server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+from framing import encode_record, StreamDecoder, VIDEO_JPEG, VIDEO_TILES, MSG_JSON, STROKES
+from stroke_store import pack_stroke, unpack_stroke
+from stroke_codec import encode_segments, merge_collinear
+
+# Stroke batching: a stroke waits at most BATCH_INTERVAL for more to share
+# its write, and a write carries at most BATCH_MAX queued items
+BATCH_INTERVAL = 0.016
+BATCH_MAX = 32
+MERGE_TOLERANCE = 1.0   # px; None sends every segment as drawn
+VIDEO_QUEUE_MAX = 5     # video frames are dropped while the queue is this deep
+
 class StrokeSender:
-    def __init__(self, host='localhost', port=8080, room_id='default', player_name='Unknown'):
+    def __init__(self, host='localhost', port=8080, room_id='default', player_name='Unknown',
+                 batch_interval=BATCH_INTERVAL, batch_max=BATCH_MAX, merge_tolerance=MERGE_TOLERANCE):
         self.address = (host, port)
         self.room_id = room_id
         self.player_name = player_name
@@ -15,17 +33,38 @@ class StrokeSender:
         # but we will manual check size for video frames.
         self.send_queue = queue.Queue()
         self.running = True
+        # Optional callback for JSON messages the server sends on this socket
+        self.on_message = None
+        # Negotiated in the JOIN handshake (join_ack); until then, and with
+        # servers that don't answer, everything goes out as JSON lines.
+        # negotiated is set when the ack arrives (nothing waits for it here)
+        self.framed = False
+        self.compact_strokes = False   # strokes as compact records (stroke_codec.py)
+        self.video_tiles = False       # server takes VIDEO_TILES records (video_tiles.py)
+        self.negotiated = threading.Event()
+        # Latency budget for batching strokes, and merging of near-collinear segments
+        self.batch_interval = batch_interval
+        self.batch_max = batch_max
+        self.merge_tolerance = merge_tolerance
+        # Stats (see stats())
+        self.started = time.monotonic()
+        self.send_syscalls = 0
+        self.bytes_sent = 0
+        self.writes = 0
+        self.strokes_queued = 0
+        self.segments_sent = 0
+        self.video_queued = 0
+        self.video_sent = 0
+        self.video_dropped = 0
+        # Seconds a video frame spends queued + in send() (moving average);
+        # grows as soon as the link can't keep up (see VideoController)
+        self.video_latency = 0.0
         
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client_socket.connect(self.address)
             print(f"Connected to {host}:{port}")
             
-            # Start Network Thread
-            # This thread is the ONLY one allowed to write to client_socket
-            self.sender_thread = threading.Thread(target=self._network_sender_loop, daemon=True)
-            self.sender_thread.start()
-            
             # Start Drain Thread
             # We must read from the socket to prevent the server from blocking 
             # when it broadcasts back to us (TCP flow control).
@@ -34,13 +73,36 @@ class StrokeSender:
             
             self._send_handshake()
             
+            # Start Network Thread
+            # This thread is the ONLY one allowed to write to client_socket
+            self.sender_thread = threading.Thread(target=self._network_sender_loop, daemon=True)
+            self.sender_thread.start()
+            
         except ConnectionRefusedError:
             print(f"Connection to {host}:{port} failed. Is the server running?")
             self.client_socket = None
 
     def _send_handshake(self):
-        handshake = {"action": "join", "room_id": self.room_id, "player_name": self.player_name}
-        self.send_data(handshake)
+        # framed: every message as a length-prefixed record (framing.py),
+        # so video goes out as raw JPEG bytes, not base64 JSON. The JOIN
+        # itself is a plain JSON line any server can read. Written before
+        # the sender thread starts, so it is the first thing on the wire;
+        # no waiting for the reply (see _on_join_ack).
+        handshake = {"action": "join", "room_id": self.room_id, "player_name": self.player_name,
+                     "framed": True}
+        self._write((json.dumps(handshake) + "\n").encode('utf-8'))
+
+    def _on_join_ack(self, payload):
+        # Drain thread. The sender thread has been sending JSON lines and
+        # switches to records from its next batch; the server's
+        # StreamDecoder takes both on one socket. framed is set first, so
+        # compact_strokes/video_tiles never hold without it.
+        if not isinstance(payload, dict):
+            payload = {}
+        self.framed = bool(payload.get("framed"))
+        self.compact_strokes = self.framed and bool(payload.get("compact_strokes"))
+        self.video_tiles = self.framed and bool(payload.get("video_tiles"))
+        self.negotiated.set()
 
     def send_data(self, data_dict: dict):
         """
@@ -51,21 +113,46 @@ class StrokeSender:
             self.send_queue.put(data_dict)
 
     def send_stroke(self, stroke: dict):
-        self.send_data(stroke)
+        # Tagged so the sender loop can pack consecutive strokes together
+        if self.client_socket:
+            self.strokes_queued += 1
+            self.send_queue.put(("stroke", stroke))
         
-    def send_video(self, video_packet: dict):
+    def send_video(self, jpeg_bytes, record_type=VIDEO_JPEG):
         """
-        Send video frame with Backpressure Logic.
+        Send video frame (JPEG bytes) with Backpressure Logic.
         If the network queue is backing up (e.g., > 5 items), 
         drop this video frame to keep latency low.
+        record_type VIDEO_TILES: a video_tiles.py payload instead of a JPEG
+        (only if the server accepts them, see video_tiles).
+        Returns False if the frame was dropped (see VideoController.dropped).
         """
         if self.client_socket:
+            if record_type == VIDEO_TILES and not self.video_tiles:
+                return False
             # Check queue size approx
-            if self.send_queue.qsize() < 5:
-                self.send_queue.put(video_packet)
+            if self.send_queue.qsize() < VIDEO_QUEUE_MAX:
+                if self.framed:
+                    # Length-prefixed binary record: the JPEG bytes travel untouched
+                    data = encode_record(record_type, jpeg_bytes)
+                else:
+                    # Server without framed mode: base64 JSON line
+                    data = self._encode_message({"action": "video_frame", "room_id": self.room_id,
+                                                 "player_name": self.player_name,
+                                                 "payload": base64.b64encode(jpeg_bytes).decode('ascii')})
+                # Tagged with the time queued to measure send latency
+                self.send_queue.put(("video", data, time.monotonic()))
+                self.video_queued += 1
+                return True
             else:
                 # Drop frame - Network is too slow
-                pass
+                self.video_dropped += 1
+        return False
+
+    @property
+    def video_pending(self):
+        """Video frames queued but not written yet."""
+        return self.video_queued - self.video_sent
 
     def send_ready(self, is_ready: bool):
         """Send READY status update"""
@@ -77,32 +164,148 @@ class StrokeSender:
         }
         self.send_data(packet)
 
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "strokes_queued": self.strokes_queued,
+            "segments_sent": self.segments_sent,
+            "video_sent": self.video_sent,
+            "video_dropped": self.video_dropped,
+            "video_latency_ms": round(self.video_latency * 1000, 1),
+            "writes": self.writes,
+            "send_syscalls": self.send_syscalls,
+            "bytes_sent": self.bytes_sent,
+            "syscalls_per_sec": round(self.send_syscalls / elapsed, 1),
+            "bytes_per_sec": round(self.bytes_sent / elapsed, 1),
+        }
+
     def _network_sender_loop(self):
         while self.running:
             try:
                 # Blocking get - waits effectively for data
-                data_dict = self.send_queue.get()
+                batch = [self.send_queue.get()]
+                
+                if isinstance(batch[0], tuple) and batch[0][0] == "stroke":
+                    # A stroke may wait up to batch_interval so the segments
+                    # drawn meanwhile share its write
+                    deadline = time.monotonic() + self.batch_interval
+                    while len(batch) < self.batch_max:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            batch.append(self.send_queue.get(timeout=remaining))
+                        except queue.Empty:
+                            break
                 
-                if self.client_socket:
+                # Plus whatever else is already waiting
+                while len(batch) < self.batch_max:
                     try:
-                        msg = json.dumps(data_dict) + "\n"
-                        self.client_socket.sendall(msg.encode('utf-8'))
-                    except Exception as e:
-                         print(f"Socket send error: {e}")
+                        batch.append(self.send_queue.get_nowait())
+                    except queue.Empty:
+                        break
                 
-                self.send_queue.task_done()
+                self._write(self._encode_batch(batch))
+                self._video_written(batch)
             except Exception as e:
                 print(f"Sender thread error: {e}")
+
+    def _encode_batch(self, batch):
+        # Queue order is kept; each run of consecutive strokes is packed together
+        chunks = []
+        strokes = []
+        for item in batch:
+            if isinstance(item, tuple) and item[0] == "stroke":
+                strokes.append(item[1])
+                continue
+            if strokes:
+                self._encode_strokes(strokes, chunks)
+                strokes = []
+            if isinstance(item, tuple):
+                # Pre-encoded video
+                chunks.append(item[1])
+            else:
+                chunks.append(self._encode_message(item))
+        if strokes:
+            self._encode_strokes(strokes, chunks)
+        return b"".join(chunks)
+
+    def _encode_message(self, message):
+        data = json.dumps(message).encode('utf-8')
+        return encode_record(MSG_JSON, data) if self.framed else data + b"\n"
+
+    def _encode_strokes(self, strokes, chunks):
+        # Packable strokes are merged and go into STROKES records; anything
+        # else (fills, unknown keys) as JSON, keeping the original order
+        packed = []
+        for stroke in strokes + [None]:
+            p = pack_stroke(stroke) if stroke is not None else None
+            if p is not None:
+                packed.append(p)
+                continue
+            if packed:
+                if self.merge_tolerance is not None:
+                    packed = merge_collinear(packed, self.merge_tolerance)
+                self.segments_sent += len(packed)
+                if self.compact_strokes:
+                    chunks.append(encode_record(STROKES, encode_segments(packed)))
+                else:
+                    for p in packed:
+                        merged = unpack_stroke(p)
+                        merged["room_id"] = self.room_id
+                        chunks.append(self._encode_message(merged))
+                packed = []
+            if stroke is not None:
+                self.segments_sent += 1
+                chunks.append(self._encode_message(stroke))
+
+    def _video_written(self, batch):
+        now = time.monotonic()
+        for item in batch:
+            if isinstance(item, tuple) and item[0] == "video":
+                latency = now - item[2]
+                self.video_latency = latency if self.video_sent == 0 else self.video_latency * 0.7 + latency * 0.3
+                self.video_sent += 1
+
+    def _write(self, data):
+        # One write per batch; send() instead of sendall() so the stats
+        # count the real syscalls
+        if not self.client_socket or not data:
+            return
+        self.writes += 1
+        try:
+            view = memoryview(data)
+            while view:
+                sent = self.client_socket.send(view)
+                self.send_syscalls += 1
+                self.bytes_sent += sent
+                view = view[sent:]
+        except Exception as e:
+             print(f"Socket send error: {e}")
                 
     def _socket_drain_loop(self):
-        """Read and discard data to keep TCP window open"""
+        """Read data to keep TCP window open; hand JSON messages to on_message, drop the rest"""
+        decoder = StreamDecoder()
         while self.running and self.client_socket:
             try:
-                data = self.client_socket.recv(4096)
+                data = self.client_socket.recv(65536)
                 if not data:
                     break
+                items = decoder.feed(data)
             except:
                 break
+            if self.on_message is None and self.negotiated.is_set():
+                continue
+            for record_type, payload in items:
+                if record_type is None or record_type == MSG_JSON:
+                    try:
+                        msg = json.loads(payload)
+                        if isinstance(msg, dict) and msg.get("action") == "join_ack":
+                            self._on_join_ack(msg.get("payload"))
+                        elif self.on_message is not None:
+                            self.on_message(msg)
+                    except Exception as e:
+                        print(f"Sender message error: {e}")
                 
     def close(self):
         self.running = False
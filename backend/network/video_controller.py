@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Shared wire format lives with the server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+from framing import VIDEO_JPEG, VIDEO_TILES
+from video_tiles import TileEncoder
+
+# Settings ladder, worst to best: (width, height, JPEG quality, fps)
+VIDEO_LEVELS = [
+    (160, 90, 35, 4),
+    (224, 126, 40, 6),
+    (320, 180, 45, 8),
+    (320, 180, 50, 10),     # the old fixed settings
+    (320, 180, 60, 15),
+]
+START_LEVEL = 3
+ADJUST_INTERVAL = 1.0       # seconds between level decisions
+UPGRADE_AFTER = 2           # clean intervals in a row before stepping up
+# Local signal: seconds a frame spends in the sender's queue + send(),
+# and frames still waiting there (a stalled link delivers none to time)
+LATENCY_HIGH = 0.15
+LATENCY_LOW = 0.05
+PENDING_HIGH = 2
+# Remote signal: viewer queue depth (the server drops video at 8, connection.DROP_DEPTH)
+DEPTH_HIGH = 4
+FEEDBACK_MAX_AGE = 2.0      # server feedback older than this is ignored
+# Motion check on a tiny thumbnail of the outgoing frame: each cell
+# averages ~40x40 camera pixels, so sensor noise cancels out but a hand
+# moving a few pixels still shifts the cells along its edge
+THUMB_SIZE = (32, 18)
+MOTION_THRESHOLD = 8        # largest cell change (0-255) that still counts as still
+KEEPALIVE = 1.0             # seconds; a still picture is resent this often (viewers time out at 3)
+
+
+class VideoController:
+    """
+    Picks resolution, JPEG quality and frame rate for the drawer's video
+    and skips frames that barely differ from the last one sent. Two
+    congestion signals:
+      - local: StrokeSender.video_latency (queued + send() time) and the
+        frames it dropped because its queue was full,
+      - remote: the server's video_feedback (deepest viewer queue and
+        frames dropped on the way to viewers), fed to on_feedback.
+    Steps down a level as soon as either looks congested (halves the level
+    when frames are being dropped), back up one level after UPGRADE_AFTER
+    clean intervals. now arguments default to time.monotonic() (benchmarks
+    pass a simulated clock).
+    tiles: send only the tiles that changed (video_tiles.py) as VIDEO_TILES
+    records once the sender has negotiated them (StrokeSender.video_tiles);
+    until then frames are plain JPEGs. record_type is the type of the last
+    frame encode() returned.
+    """
+
+    def __init__(self, sender=None, levels=VIDEO_LEVELS, start=START_LEVEL, tiles=False):
+        self.sender = sender
+        self.levels = levels
+        self.level = start
+        self.tile_encoder = TileEncoder() if tiles else None
+        self.record_type = VIDEO_JPEG
+        self.buffers = {}           # (width, height) -> reused resize target
+        self.thumb = np.empty((THUMB_SIZE[1], THUMB_SIZE[0], 3), np.uint8)
+        self.sent_thumb = None      # thumbnail of the last frame sent
+        self.last_frame_at = 0.0    # last frame slot used (sent or skipped)
+        self.last_sent_at = 0.0
+        self._undo = None           # (sent_thumb, last_sent_at, size) before the last frame (dropped)
+        self.adjusted_at = None
+        self.clean = 0              # clean intervals in a row
+        self.feedback = None
+        self.feedback_at = 0.0
+        self._sender_sent = 0       # sender counters at the last decision
+        self._sender_dropped = 0
+        # Stats
+        self.sent = 0
+        self.skipped_still = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def on_feedback(self, payload, now=None):
+        """video_feedback payload from the server (sender's receive thread)."""
+        self.feedback = payload
+        self.feedback_at = time.monotonic() if now is None else now
+
+    def due(self, now=None):
+        """True when the current frame rate allows another frame."""
+        now = time.monotonic() if now is None else now
+        return now - self.last_frame_at >= 1.0 / self.settings[3]
+
+    def encode(self, img, now=None):
+        """
+        JPEG bytes (tiles payload in tiles mode) of img at the current
+        settings, or None when it is skipped as unchanged. Uses up the
+        frame slot either way.
+        """
+        now = time.monotonic() if now is None else now
+        self._adjust(now)
+        self.last_frame_at = now
+        self._undo = None
+
+        width, height, quality, _ = self.settings
+        small = self.buffers.get((width, height))
+        if small is None:
+            small = self.buffers[(width, height)] = np.empty((height, width, 3), np.uint8)
+        cv2.resize(img, (width, height), dst=small, interpolation=cv2.INTER_AREA)
+
+        # Cheap motion check against the last frame sent (so slow drift adds up)
+        cv2.resize(small, THUMB_SIZE, dst=self.thumb, interpolation=cv2.INTER_AREA)
+        if self.sent_thumb is not None and now - self.last_sent_at < KEEPALIVE \
+                and cv2.norm(self.thumb, self.sent_thumb, cv2.NORM_INF) <= MOTION_THRESHOLD:
+            self.skipped_still += 1
+            return None
+
+        tiles = self.tile_encoder is not None and (self.sender is None or self.sender.video_tiles)
+        self.record_type = VIDEO_TILES if tiles else VIDEO_JPEG
+        if tiles:
+            data = self.tile_encoder.encode(small, quality, now)
+            if data is None:
+                return None
+        else:
+            ok, buffer = cv2.imencode('.jpg', small, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            if not ok:
+                return None
+            data = buffer.tobytes()
+        self._undo = (self.sent_thumb, self.last_sent_at, len(data))
+        self.sent_thumb = self.thumb.copy()
+        self.last_sent_at = now
+        self.sent += 1
+        self.bytes += len(data)
+        return data
+
+    def dropped(self):
+        """
+        The frame encode() just returned was not sent (the sender's queue
+        was full, or there is no connection): the motion check and the
+        tile encoder go back to what viewers last got, so the next frame
+        isn't skipped as unchanged or sent as a delta against it.
+        """
+        if self._undo is None:
+            return
+        self.sent_thumb, self.last_sent_at, size = self._undo
+        self._undo = None
+        self.sent -= 1
+        self.bytes -= size
+        if self.record_type == VIDEO_TILES:
+            self.tile_encoder.discard_last()
+
+    def _adjust(self, now):
+        if self.adjusted_at is None:
+            self.adjusted_at = now
+            return
+        if now - self.adjusted_at < ADJUST_INTERVAL:
+            return
+        self.adjusted_at = now
+
+        congested = severe = False
+        clean = True
+        if self.sender is not None:
+            # Latency only counts if frames went out since the last decision
+            sent = self.sender.video_sent - self._sender_sent
+            dropped = self.sender.video_dropped - self._sender_dropped
+            self._sender_sent, self._sender_dropped = self.sender.video_sent, self.sender.video_dropped
+            latency = self.sender.video_latency if sent else 0.0
+            pending = self.sender.video_pending
+            severe = dropped > 0 or latency > 4 * LATENCY_HIGH
+            congested = severe or latency > LATENCY_HIGH or pending >= PENDING_HIGH
+            clean = not congested and latency < LATENCY_LOW and pending == 0
+        feedback = self.feedback
+        if feedback is not None and now - self.feedback_at < FEEDBACK_MAX_AGE:
+            if feedback.get("dropped", 0) > 0 or feedback.get("max_depth", 0) >= DEPTH_HIGH:
+                congested = True
+            clean = clean and not congested and feedback.get("max_depth", 0) <= 1
+
+        if congested:
+            self.clean = 0
+            if self.level > 0:
+                self.level = self.level // 2 if severe else self.level - 1
+                print(f"Video: congested, down to {self.settings}")
+        elif clean:
+            self.clean += 1
+            if self.clean >= UPGRADE_AFTER and self.level < len(self.levels) - 1:
+                self.clean = 0
+                self.level += 1
+                print(f"Video: link clear, up to {self.settings}")
+        else:
+            self.clean = 0
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        width, height, quality, fps = self.settings
+        return {
+            "level": self.level,
+            "size": f"{width}x{height}",
+            "quality": quality,
+            "fps": fps,
+            "sent": self.sent,
+            "skipped_still": self.skipped_still,
+            "keyframes": self.tile_encoder.keyframes if self.tile_encoder else None,
+            "bytes_per_sec": round(self.bytes / elapsed, 1),
+        }
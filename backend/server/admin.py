@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 import threading
 import json
 import os
@@ -9,6 +9,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from protocol import Protocol
+from connection import StreamConnection
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -26,59 +27,46 @@ def get_state():
     if not game_state_ref:
         return jsonify({"error": "Game state not linked"}), 500
     
-    # Build serialization-safe state
-    state_dump = {}
-    with game_state_ref.lock:
-        for room_id, room_data in game_state_ref.rooms.items():
-            # Aggregate players by name
-            players_dict = {}
-            for conn, p_data in room_data['players'].items():
-                name = p_data['name']
-                if name not in players_dict:
-                    players_dict[name] = {
-                        "name": name,
-                        "score": p_data['score'],
-                        "is_host": p_data['is_host'],
-                        "is_ready": p_data.get('is_ready', False),
-                        "conns": []
-                    }
-                # Track connections for kicking
-                try:
-                    addr = str(conn.getpeername())
-                    players_dict[name]["conns"].append(addr)
-                except:
-                    pass
-                
-                # Sync score (in case of drift, though GameState should handle it)
-                if p_data['score'] > players_dict[name]['score']:
-                     players_dict[name]['score'] = p_data['score']
-                if p_data['is_host']:
-                     players_dict[name]['is_host'] = True
-                if p_data.get('is_ready'):
-                     players_dict[name]['is_ready'] = True
-
-            # Convert to list
-            players_list = []
-            for p in players_dict.values():
-                players_list.append({
-                    "name": p['name'],
-                    "score": p['score'],
-                    "is_host": p['is_host'],
-                    "is_ready": p['is_ready'],
-                    "addr": ", ".join(p['conns']) # Show all addrs
-                })
-            
-            state_dump[room_id] = {
-                "round_active": room_data.get('round_active', False),
-                "drawer": room_data.get('drawer'),
-                "current_word": room_data.get('current_word'),
-                "time_remaining": int(room_data.get('time_remaining', 0)),
-                "player_count": len(players_list), # Unique count
-                "players": players_list,
-                "chat_history": room_data.get('chat_history', [])
-            }
-            
-    return jsonify(state_dump)
+    # Pre-encoded per-room snapshots, rebuilt only for rooms that changed
+    return Response(game_state_ref.rooms_state_json(), mimetype='application/json')
+
+LONG_POLL_MAX = 30.0 # seconds a /api/state/<room> long-poll may hang
+
+@app.route('/api/state/<room_id>')
+def get_room_state(room_id):
+    """
+    State of one room, versioned. The version is the ETag; a client that
+    already has it (If-None-Match or ?version=N) gets 304 Not Modified, or
+    with ?wait=S the request is held until the room changes (long-poll).
+    """
+    if not game_state_ref:
+        return jsonify({"error": "Game state not linked"}), 500
+
+    known = request.args.get('version', type=int)
+    if known is None:
+        etag = request.headers.get('If-None-Match', '').strip('W/').strip('"')
+        known = int(etag) if etag.isdigit() else None
+
+    version = game_state_ref.get_room_version(room_id)
+    if version is None:
+        return jsonify({"error": "Room not found"}), 404
+
+    wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX)
+    if version == known and wait > 0:
+        version = game_state_ref.wait_for_change(room_id, known, wait)
+        if version is None:
+            return jsonify({"error": "Room not found"}), 404
+
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    if version == known:
+        return Response(status=304, headers=headers)
+
+    version, state = game_state_ref.room_state_json(room_id)
+    if state is None:
+        return jsonify({"error": "Room not found"}), 404
+    # The cached state may be newer than the version we checked; tag what we send
+    headers["ETag"] = f'"{version}"'
+    return Response(state, mimetype='application/json', headers=headers)
 
 @app.route('/api/video/<room_id>')
 def get_video(room_id):
@@ -91,38 +79,26 @@ def get_video(room_id):
         
     return jsonify({"frame": frame_data})
 
+@app.route('/api/connections')
+def get_connections():
+    """Per-connection outbound queue depth / drop counters, grouped by room."""
+    if not game_state_ref:
+        return jsonify({"error": "Game state not linked"}), 500
+
+    conns_dump = {}
+    for room_id in game_state_ref.list_rooms():
+        conns_dump[room_id] = [
+            conn.stats() for conn in game_state_ref.get_clients(room_id) if hasattr(conn, 'stats')
+        ]
+
+    return jsonify(conns_dump)
+
 @app.route('/api/check_room/<room_id>')
 def check_room(room_id):
     if not game_state_ref:
         return jsonify({"error": "Game state not linked"}), 500
     
-    exists = False
-    player_count = 0
-    round_active = False
-    all_ready = False
-    
-    with game_state_ref.lock:
-        if room_id in game_state_ref.rooms:
-            exists = True
-            room = game_state_ref.rooms[room_id]
-            player_count = len(room.get('players', {}))
-            round_active = room.get('round_active', False)
-            
-            # Check if all non-host players are ready
-            all_ready = True
-            for p in room.get('players', {}).values():
-                 if not p['is_host'] and not p.get('is_ready', False):
-                     all_ready = False
-                     break
-            if player_count < 2:
-                all_ready = False
-            
-    return jsonify({
-        "exists": exists, 
-        "player_count": player_count, 
-        "round_active": round_active,
-        "all_ready": all_ready
-    })
+    return Response(game_state_ref.room_summary_json(room_id), mimetype='application/json')
 
 @app.route('/api/action', methods=['POST'])
 def perform_action():
@@ -156,26 +132,15 @@ def perform_action():
         target_addrs = [a.strip() for a in player_addrs_str.split(',')]
         
         kicked_count = 0
-        with game_state_ref.lock:
-            if room_id in game_state_ref.rooms:
-                room = game_state_ref.rooms[room_id]
-                # Find all connections to kick
-                conns_to_kick = []
-                for conn in room['players']:
-                    try:
-                        peer = str(conn.getpeername())
-                        if peer in target_addrs:
-                            conns_to_kick.append(conn)
-                    except:
-                        pass
-                
-                for conn in conns_to_kick:
-                    try:
-                        conn.close()
-                    except:
-                        pass
-                    game_state_ref.remove_client(room_id, conn)
-                    kicked_count += 1
+        # Find all connections to kick
+        conns_to_kick = game_state_ref.find_connections_by_addr(room_id, target_addrs)
+        for conn in conns_to_kick:
+            try:
+                conn.close()
+            except:
+                pass
+            game_state_ref.remove_client(room_id, conn)
+            kicked_count += 1
                     
         return jsonify({"status": "kicked", "count": kicked_count})
 
@@ -185,12 +150,8 @@ def perform_action():
         if not message:
             return jsonify({"error": "No message"}), 400
             
-        # Broadcast via stroke_server's broadcast method
-        chat_msg = json.dumps({
-            Protocol.ACTION: Protocol.CHAT,
-            Protocol.PAYLOAD: f"[{sender}]: {message}" # Format: [Name]: Msg
-        })
-        stroke_server_module.broadcast(room_id, chat_msg)
+        # Broadcast via stroke_server (also records chat history)
+        stroke_server_module.broadcast_chat(room_id, f"[{sender}]: {message}") # Format: [Name]: Msg
         return jsonify({"status": "sent"})
 
     elif action == "ready_up":
@@ -200,15 +161,7 @@ def perform_action():
         if not sender:
             return jsonify({"error": "No sender"}), 400
             
-        found = False
-        with game_state_ref.lock:
-            if room_id in game_state_ref.rooms:
-                room = game_state_ref.rooms[room_id]
-                for conn, p in room['players'].items():
-                    if p['name'] == sender:
-                        p['is_ready'] = is_ready
-                        found = True
-                        # Don't break — update ALL connections for this name
+        found = game_state_ref.set_ready_by_name(room_id, sender, is_ready)
         
         if found:
             return jsonify({"status": "updated"})
@@ -241,7 +194,7 @@ def create_room():
     with game_state_ref.lock:
         for _ in range(10): # Try 10 times
             candidate = ''.join(random.choices(string.ascii_uppercase, k=4))
-            if candidate not in game_state_ref.rooms:
+            if not game_state_ref.room_exists(candidate):
                 new_room_id = candidate
                 # We don't necessarily need to "create" it here if GameState creates on join,
                 # but reserving it prevents race conditions if we had a reservation system.
@@ -271,12 +224,7 @@ def join_room():
     web_key = game_state_ref.add_web_client(room_id, player_name)
     
     # Check if this player is host
-    is_host = False
-    with game_state_ref.lock:
-        if room_id in game_state_ref.rooms:
-            p = game_state_ref.rooms[room_id]['players'].get(web_key)
-            if p:
-                is_host = p['is_host']
+    is_host = game_state_ref.is_host(room_id, web_key)
     
     return jsonify({"status": "joined", "web_key": web_key, "is_host": is_host})
 
@@ -300,7 +248,7 @@ def send_stroke():
     
     # Serialize and store
     stroke_json = json.dumps(stroke)
-    game_state_ref.add_stroke(room_id, stroke_json)
+    game_state_ref.add_stroke(room_id, stroke_json, stroke)
     
     # Broadcast to TCP clients (no exclude since web client isn't a TCP conn)
     stroke_server_module.broadcast(room_id, stroke_json)
@@ -314,20 +262,46 @@ def get_strokes(room_id):
         return jsonify({"error": "Game state not linked"}), 500
     
     since = request.args.get('since', 0, type=int)
-    history = game_state_ref.get_history(room_id)
-    
-    # Return strokes from index 'since' onwards
-    new_strokes = history[since:]
+    # Zero-copy view of strokes from index 'since' onwards; only these get serialized.
+    # If 'since' is inside the compacted range, send the canvas snapshot instead.
+    snapshot, history = game_state_ref.get_catch_up(room_id, since)
     
-    # Parse JSON strings back to objects for the frontend
-    parsed = []
-    for s in new_strokes:
+    result = {"strokes": history.to_dicts(), "total": history.end}
+    if snapshot is not None:
+        result["snapshot"] = snapshot.png_b64
+    return jsonify(result)
+
+@app.route('/api/stream/<room_id>')
+def stream_room(room_id):
+    """
+    Server-Sent Events: everything the room broadcasts (strokes, chat, round
+    events, video) pushed as it happens, one JSON protocol message per event.
+    Starts with the catch-up from ?since=N and a sync event carrying the total.
+    """
+    if not game_state_ref or not stroke_server_module:
+        return jsonify({"error": "Server not linked"}), 500
+
+    since = request.args.get('since', 0, type=int)
+    conn = StreamConnection(request.remote_addr)
+    conn.video_tiles = request.args.get('tiles', 0, type=int) == 1
+
+    # Subscribe before the catch-up so nothing falls in between
+    game_state_ref.add_listener(room_id, conn)
+    total = stroke_server_module.send_catch_up(room_id, conn, since)
+    conn.send(stroke_server_module.encode_line(json.dumps({
+        Protocol.ACTION: Protocol.SYNC,
+        Protocol.PAYLOAD: total
+    })))
+
+    def generate():
         try:
-            parsed.append(json.loads(s))
-        except:
-            pass
-    
-    return jsonify({"strokes": parsed, "total": len(history)})
+            for chunk in conn.events():
+                yield chunk
+        finally:
+            game_state_ref.remove_listener(room_id, conn)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
 
 @app.route('/api/clear_canvas', methods=['POST'])
 def clear_canvas():
@@ -342,9 +316,7 @@ def clear_canvas():
         return jsonify({"error": "Missing room_id"}), 400
     
     # Clear history
-    with game_state_ref.lock:
-        if room_id in game_state_ref.rooms:
-            game_state_ref.rooms[room_id]['history'] = []
+    game_state_ref.clear_history(room_id)
     
     # Broadcast clear command to TCP clients
     clear_msg = json.dumps({"action": "clear"})
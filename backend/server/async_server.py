@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+from connection import ClientConnection
+from framing import StreamDecoder, FramingError, MSG_JSON, VIDEO_JPEG, VIDEO_TILES
+
+READ_SIZE = 65536
+LISTEN_BACKLOG = 1024
+FD_LIMIT = 65536        # soft limit target when the hard limit is unlimited
+# Records whose handling decodes or composes images (cv2)
+VIDEO_RECORDS = (VIDEO_JPEG, VIDEO_TILES)
+
+
+class AsyncConnection(ClientConnection):
+    """
+    ClientConnection backed by an asyncio StreamWriter.
+    send() may be called from any thread (timers, Flask admin); a writer
+    task on the loop drains the queue and awaits drain() for flow control.
+    """
+
+    def __init__(self, writer, loop):
+        super().__init__(writer.get_extra_info('peername'))
+        self.writer = writer
+        self.loop = loop
+        # Created on the loop thread; remember it to skip call_soon_threadsafe
+        self.loop_thread = threading.get_ident()
+        self.ready = asyncio.Event()
+        self.writer_task = loop.create_task(self._writer_loop())
+
+    def _on_loop(self):
+        return self.loop_thread == threading.get_ident()
+
+    def _wake(self):
+        if self._on_loop():
+            self.ready.set()
+        else:
+            self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def _writer_loop(self):
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.queue:
+                    batch = self._take_batch()
+                    self.writer.writelines(batch)
+                    self.sent_messages += len(batch)
+                    await self.writer.drain()
+        except (ConnectionError, OSError) as e:
+            print(f"Send error to {self.peername}: {e}")
+            self.close()
+
+    def _close_transport(self):
+        if self._on_loop():
+            self.writer.close()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.close)
+
+
+def _handle_items(server_module, room_id, items, conn):
+    for record_type, payload in items:
+        server_module.handle_item(room_id, record_type, payload, conn)
+
+
+async def handle_client(server_module, reader, writer):
+    """
+    One client on the event loop. The server module's handlers are
+    synchronous and written for the threaded engine: strokes, chat and
+    control messages only hold a room lock briefly and run inline, but
+    joining (catch-up built from a snapshot and the history) and video
+    (JPEG/tile decoding and composing) run in the loop's default executor
+    so they don't stall every other client. Items are still handled one
+    read at a time, in order.
+    """
+    loop = asyncio.get_running_loop()
+    conn = AsyncConnection(writer, loop)
+    addr = conn.peername
+    room_id = None
+    game_state = server_module.game_state
+
+    # JSON lines and binary records (video) from the same byte stream
+    decoder = StreamDecoder()
+
+    try:
+        # 1. Handshake (first line must be JOIN)
+        items = []
+        while not items:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                return
+            items = decoder.feed(data)
+
+        record_type, line = items.pop(0)
+        joined = server_module.parse_handshake(line) if record_type in (None, MSG_JSON) else None
+        if joined is None:
+            print(f"Invalid handshake from {addr}: {line[:80]!r}")
+            return
+        room_id, player_name, handshake = joined
+        print(f"{addr} ({player_name}) joining room {room_id}")
+
+        # 2. Join + history + late joiner sync (same as threaded path)
+        await loop.run_in_executor(None, server_module.join_room, room_id, conn, player_name, handshake)
+
+        # 3. Main Loop
+        while True:
+            if any(record_type in VIDEO_RECORDS for record_type, _ in items):
+                await loop.run_in_executor(None, _handle_items, server_module, room_id, items, conn)
+            else:
+                _handle_items(server_module, room_id, items, conn)
+
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            items = decoder.feed(data)
+
+    except (ConnectionResetError, asyncio.IncompleteReadError):
+        pass
+    except FramingError as e:
+        print(f"Protocol error from {addr}: {e}")
+    except Exception as e:
+        print(f"Error handling client {addr}: {e}")
+    finally:
+        print(f"Disconnected {addr}")
+        if room_id:
+            game_state.remove_client(room_id, conn)
+        conn.close()
+
+
+def _raise_fd_limit():
+    # Each idle connection is one file descriptor; lift the soft limit
+    # so a single process can hold 10k+ sockets.
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # setrlimit rejects an unlimited soft limit (and RLIM_INFINITY is -1)
+    target = FD_LIMIT if hard == resource.RLIM_INFINITY else hard
+    if soft != resource.RLIM_INFINITY and soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError) as e:
+            print(f"Could not raise the open file limit from {soft} to {target}: {e}")
+
+
+async def serve(server_module, host, port):
+    server = await asyncio.start_server(
+        lambda r, w: handle_client(server_module, r, w),
+        host, port,
+        backlog=LISTEN_BACKLOG,
+        reuse_address=True,
+    )
+    print(f"Stroke Server (asyncio) listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def run(server_module, host, port):
+    _raise_fd_limit()
+    asyncio.run(serve(server_module, host, port))
@@ -0,0 +1,98 @@
+import base64
+import json
+
+# Rasterizing needs OpenCV + numpy (already used by the desktop client).
+# Without them the server still runs; history is just never compacted.
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+from stroke_store import COLOR_HEX
+
+# Backend canvas size (drawer.py's image_canvas, web clients scale from it)
+CANVAS_WIDTH = 1280
+CANVAS_HEIGHT = 720
+
+# Compact a room once this many strokes have piled up since the last snapshot
+COMPACT_MIN_SEGMENTS = 2000
+
+PNG_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 3] if cv2 is not None else []
+
+
+def available():
+    return cv2 is not None
+
+
+def _bgr(packed):
+    # [b, g, r] lists and '#rrggbb' both pack blue into the low byte
+    return (packed & 0xFF, (packed >> 8) & 0xFF, (packed >> 16) & 0xFF)
+
+
+def _hex_bgr(color):
+    packed = int(color[1:7], 16) | COLOR_HEX
+    return _bgr(packed)
+
+
+class CanvasSnapshot:
+    """
+    Raster of a room's canvas covering history strokes [0, upto).
+    Late joiners get this plus the strokes since `upto` instead of the
+    whole history. The PNG is encoded once, when the snapshot is built.
+    """
+    __slots__ = ('canvas', 'upto', 'png', 'png_b64')
+
+    def __init__(self, canvas, upto, png):
+        self.canvas = canvas    # BGR ndarray, never modified after build()
+        self.upto = upto
+        self.png = png
+        self.png_b64 = base64.b64encode(png).decode('ascii')
+
+
+def _draw_range(canvas, view, lo, hi):
+    line = cv2.line
+    for x1, y1, x2, y2, color, thickness in zip(
+            view.x1[lo:hi], view.y1[lo:hi], view.x2[lo:hi], view.y2[lo:hi],
+            view.color[lo:hi], view.thickness[lo:hi]):
+        line(canvas, (x1, y1), (x2, y2), _bgr(color), max(1, thickness))
+
+
+def _draw_extra(canvas, raw):
+    # Irregular strokes (zeroed in the columns); only web fills matter here
+    try:
+        stroke = json.loads(raw)
+        color = stroke.get('color')
+        if stroke.get('action') == 'fill' and isinstance(color, str):
+            canvas[:] = _hex_bgr(color)
+    except (ValueError, TypeError, AttributeError):
+        pass
+
+
+def draw_view(canvas, view):
+    """Draw every stroke of a StrokeView onto canvas, in order, the way drawer.py does."""
+    pos = 0
+    for index in sorted(view.extra):
+        i = index - view.start
+        _draw_range(canvas, view, pos, i)
+        _draw_extra(canvas, view.extra[index])
+        pos = i + 1
+    _draw_range(canvas, view, pos, len(view))
+
+
+def build(previous, view):
+    """
+    New snapshot = previous snapshot (or a white canvas) + the strokes in view.
+    view must start where previous ends. Runs without any room lock held.
+    """
+    if previous is not None:
+        canvas = previous.canvas.copy()
+    else:
+        canvas = np.full((CANVAS_HEIGHT, CANVAS_WIDTH, 3), 255, dtype=np.uint8)
+    draw_view(canvas, view)
+    ok, png = cv2.imencode('.png', canvas, PNG_PARAMS)
+    if not ok:
+        return None
+    return CanvasSnapshot(canvas, view.end, png.tobytes())
+
@@ -0,0 +1,229 @@
+import socket
+import threading
+import time
+from collections import deque
+
+from framing import lines_to_records, is_record
+
+# Outbound queue limits (messages, not bytes)
+DROP_DEPTH = 8        # droppable messages (video) are dropped at/above this depth
+SOFT_LIMIT = 256      # over this the client counts as a slow consumer
+HARD_LIMIT = 2048     # over this the client is evicted immediately
+EVICT_AFTER = 5.0     # seconds a client may stay over SOFT_LIMIT
+MAX_BATCH = 64        # buffers handed to one sendmsg()/writelines() call
+
+
+class ClientConnection:
+    """
+    Bounded outbound queue shared by the threaded and asyncio engines.
+    broadcast() only enqueues; a per-connection writer drains the queue,
+    so one stalled client never blocks the sender's receive loop.
+    Subclasses implement _wake() and _close_transport().
+    """
+
+    def __init__(self, peername=None):
+        self.peername = peername
+        self.queue = deque()
+        self.closed = False
+        self.over_limit_since = None
+        # Capabilities negotiated in the JOIN handshake
+        self.binary_video = False
+        self.framed = False     # every message as a framing.py record
+        self.compact_strokes = False # stroke_codec records instead of JSON strokes
+        self.video_tiles = False # tile-delta video (video_tiles.py)
+        self.video_synced = False # has every tile frame since its last keyframe
+        # Video this client sent since its last video_feedback (as the drawer)
+        self.video_feedback_at = 0.0
+        self.video_forwarded = 0
+        self.video_dropped = 0
+        self.video_peak_depth = 0
+        # Stats (read by the admin API)
+        self.peak_depth = 0
+        self.dropped = 0
+        self.sent_messages = 0
+
+    def send(self, data, droppable=False):
+        """
+        Queue bytes for the writer. Returns False if the message was
+        dropped (backpressure) or the connection is closed.
+        """
+        if self.closed:
+            return False
+
+        if self.framed and not is_record(data):
+            # broadcast() converts once per message; this covers direct sends
+            data = lines_to_records(data)
+
+        depth = len(self.queue)
+        if droppable and depth >= DROP_DEPTH:
+            self.dropped += 1
+            return False
+
+        if depth >= SOFT_LIMIT:
+            now = time.monotonic()
+            if self.over_limit_since is None:
+                self.over_limit_since = now
+            if depth >= HARD_LIMIT or now - self.over_limit_since > EVICT_AFTER:
+                print(f"Evicting slow consumer {self.peername} (queue depth {depth})")
+                self.close()
+                return False
+        else:
+            self.over_limit_since = None
+
+        self.queue.append(data)
+        if depth + 1 > self.peak_depth:
+            self.peak_depth = depth + 1
+        self._wake()
+        return True
+
+    # Legacy socket-style name used by older call sites
+    def sendall(self, data):
+        self.send(data)
+
+    @property
+    def queue_depth(self):
+        return len(self.queue)
+
+    def stats(self):
+        return {
+            "addr": str(self.peername),
+            "queue_depth": len(self.queue),
+            "peak_depth": self.peak_depth,
+            "dropped": self.dropped,
+            "sent": self.sent_messages,
+            "slow": self.over_limit_since is not None,
+        }
+
+    def getpeername(self):
+        return self.peername
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._wake()
+        self._close_transport()
+
+    def _take_batch(self):
+        # Pop up to MAX_BATCH queued buffers for one vectored write
+        batch = [self.queue.popleft()]
+        while self.queue and len(batch) < MAX_BATCH:
+            batch.append(self.queue.popleft())
+        return batch
+
+    def _wake(self):
+        raise NotImplementedError
+
+    def _close_transport(self):
+        raise NotImplementedError
+
+
+class SocketConnection(ClientConnection):
+    """Blocking socket with its own writer thread (threaded engine)."""
+
+    def __init__(self, sock, addr=None):
+        super().__init__(addr)
+        self.sock = sock
+        self.cond = threading.Condition()
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def recv(self, bufsize):
+        return self.sock.recv(bufsize)
+
+    def _wake(self):
+        with self.cond:
+            self.cond.notify()
+
+    def _writer_loop(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                batch = self._take_batch()
+            try:
+                self._send_batch(batch)
+                self.sent_messages += len(batch)
+            except OSError as e:
+                print(f"Send error to {self.peername}: {e}")
+                self.close()
+                return
+
+    def _send_batch(self, batch):
+        if len(batch) == 1 or not hasattr(self.sock, 'sendmsg'):
+            for data in batch:
+                self.sock.sendall(data)
+            return
+
+        # writev-style: one syscall for the whole batch, resume on short writes
+        views = [memoryview(data) for data in batch]
+        i = 0
+        while i < len(views):
+            sent = self.sock.sendmsg(views[i:])
+            while sent:
+                n = len(views[i])
+                if sent >= n:
+                    sent -= n
+                    i += 1
+                else:
+                    views[i] = views[i][sent:]
+                    sent = 0
+
+    def _close_transport(self):
+        # shutdown() also wakes the reader blocked in recv()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def sse_frame(data):
+    """Newline-delimited protocol bytes -> Server-Sent Events, one event per line."""
+    return b"data: " + data.rstrip(b"\n").replace(b"\n", b"\n\ndata: ") + b"\n\n"
+
+
+class StreamConnection(ClientConnection):
+    """
+    Server-Sent Events subscriber (web clients). Sits in the room's client
+    list like a socket, so broadcast() reaches it with the same queueing,
+    video dropping and slow-consumer eviction; the HTTP response generator
+    returned by events() is its writer.
+    """
+
+    def __init__(self, peername=None):
+        super().__init__(peername)
+        self.cond = threading.Condition()
+
+    def _wake(self):
+        with self.cond:
+            self.cond.notify()
+
+    def events(self, keepalive=15.0):
+        """Generator for the streaming response; ends when the connection closes."""
+        try:
+            while True:
+                with self.cond:
+                    if not self.queue and not self.closed:
+                        self.cond.wait(keepalive)
+                    if self.closed:
+                        return
+                    batch = self._take_batch() if self.queue else None
+                if batch is None:
+                    # Comment line keeps proxies from timing out and notices gone browsers
+                    yield b": keepalive\n\n"
+                    continue
+                self.sent_messages += len(batch)
+                yield b"".join(sse_frame(data) for data in batch)
+        finally:
+            self.close()
+
+    def _close_transport(self):
+        # Nothing to close: the HTTP server owns the socket
+        pass
@@ -0,0 +1,221 @@
+import base64
+import json
+import struct
+
+from protocol import Protocol
+import video_tiles
+
+# Binary records share the socket with the newline-delimited JSON lines.
+# A JSON line never starts with a NUL byte, so 0x00 marks a record:
+#   0x00 | version (1 byte) | type (1 byte) | payload length (uint32 BE) | payload
+# Clients that negotiate "framed" in JOIN get every message as a record;
+# decoders accept both forms on any connection.
+RECORD_MAGIC = 0x00
+RECORD_VERSION = 1
+RECORD_HEADER = struct.Struct('>BBBI')
+
+# Record types
+VIDEO_JPEG = 1      # payload: JPEG bytes of one drawer frame
+MSG_JSON = 2        # payload: one UTF-8 JSON protocol message (no newline)
+STROKES = 3         # payload: compact stroke segments (stroke_codec.py)
+VIDEO_TILES = 4     # payload: tile-delta or keyframe drawer frame (video_tiles.py)
+
+MAX_LINE = 1024 * 1024          # longest JSON line we buffer
+MAX_RECORD = 4 * 1024 * 1024    # biggest record payload we accept
+COMPACT_AT = 64 * 1024          # consumed bytes kept before the buffer is shifted
+COMPOSE_QUALITY = 70            # JPEG quality of frames rebuilt from tile deltas
+
+
+class FramingError(ValueError):
+    pass
+
+
+def encode_record(record_type, payload):
+    return RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, record_type, len(payload)) + payload
+
+
+def lines_to_records(data):
+    """Newline-delimited JSON bytes (one or more lines) -> MSG_JSON records."""
+    pack = RECORD_HEADER.pack
+    return b"".join(
+        pack(RECORD_MAGIC, RECORD_VERSION, MSG_JSON, len(line)) + line
+        for line in data.split(b"\n") if line
+    )
+
+
+def is_record(data):
+    return data[:1] == b"\x00"
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for a byte stream of JSON lines mixed with binary
+    records. feed() returns the complete items as (record_type, payload)
+    tuples; record_type is None for a JSON line (payload without the newline).
+    Works on one bytearray with a read offset (compacted once the consumed
+    prefix is large), so a payload split across many recv() calls is
+    neither re-joined nor re-scanned per chunk, and a UTF-8 sequence split
+    between chunks is only decoded once the item is complete.
+    """
+
+    def __init__(self, max_line=MAX_LINE, max_record=MAX_RECORD):
+        self.buffer = bytearray()
+        self.pos = 0        # start of the first unconsumed byte
+        self.scanned = 0    # no newline in buffer[pos:scanned]
+        self.max_line = max_line
+        self.max_record = max_record
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        items = []
+        pos = self.pos
+        end = len(buf)
+        header_size = RECORD_HEADER.size
+        with memoryview(buf) as view:
+            while pos < end:
+                if buf[pos] == RECORD_MAGIC:
+                    if end - pos < header_size:
+                        break
+                    _, version, record_type, length = RECORD_HEADER.unpack_from(buf, pos)
+                    if version != RECORD_VERSION or length > self.max_record:
+                        raise FramingError(f"bad record header (version {version}, length {length})")
+                    stop = pos + header_size + length
+                    if stop > end:
+                        break
+                    items.append((record_type, bytes(view[pos + header_size:stop])))
+                    pos = stop
+                else:
+                    newline = buf.find(b"\n", max(pos, self.scanned))
+                    if newline < 0:
+                        if end - pos > self.max_line:
+                            raise FramingError("line too long")
+                        self.scanned = end
+                        break
+                    items.append((None, bytes(view[pos:newline])))
+                    pos = newline + 1
+
+        if pos == end:
+            buf.clear()
+            pos = 0
+            self.scanned = 0
+        elif pos >= COMPACT_AT:
+            del buf[:pos]
+            self.scanned = max(0, self.scanned - pos)
+            pos = 0
+        self.pos = pos
+        return items
+
+
+class VideoFrame:
+    """
+    One drawer video frame, encoded per client capability on first use:
+    a binary record for clients that negotiated binary video, a base64
+    JSON line for everyone else (and the web API). Each variant is built
+    at most once, however many viewers the room has.
+
+    A tile-delta frame (tiles: a video_tiles payload) goes as is to
+    video_tiles clients that are in sync with the stream. Everyone else
+    gets the room's current picture (picture: a copy of the server's
+    TileDecoder frame, taken when first needed) as a tiles keyframe or a
+    plain JPEG.
+    """
+    __slots__ = ('_jpeg', '_b64', '_line', '_record', 'tiles', 'picture', '_room_picture',
+                 'is_keyframe', '_keyframe', '_tile_variants')
+
+    def __init__(self, jpeg=None, b64=None, tiles=None):
+        self._jpeg = jpeg
+        self._b64 = b64
+        self._line = None
+        self._record = None
+        self.tiles = tiles
+        self.picture = None
+        self._room_picture = None   # (decoder, lock) a delta's picture is copied from
+        self.is_keyframe = False
+        self._keyframe = None
+        self._tile_variants = {}
+
+    def applied(self, decoder, lock):
+        """
+        Called under lock (the room's) once decoder, the room's picture,
+        shows this tiles frame. A delta copies decoder.frame only when a
+        JPEG/keyframe variant is first built, still under lock since later
+        deltas patch it in place; viewers in sync never need it. During
+        this frame's own broadcast the picture is this frame; a later
+        reader (/api/video) may get a newer one, and a viewer resynced from
+        that still ends up right, as each delta replaces whole tiles.
+        """
+        self.is_keyframe = decoder.keyframe
+        if self.is_keyframe:
+            # The drawer's keyframe is a plain JPEG already
+            self._jpeg = video_tiles.decode_payload(self.tiles)[5]
+            self._keyframe = self.tiles
+        else:
+            self._room_picture = (decoder, lock)
+
+    def _picture(self):
+        if self.picture is None and self._room_picture is not None:
+            decoder, lock = self._room_picture
+            with lock:
+                self.picture = decoder.frame.copy()
+        return self.picture
+
+    @property
+    def jpeg(self):
+        if self._jpeg is None:
+            picture = self._picture()
+            if self._b64 is None and picture is not None:
+                self._jpeg = video_tiles.encode_jpeg(picture, COMPOSE_QUALITY)
+            else:
+                self._jpeg = base64.b64decode(self._b64)
+        return self._jpeg
+
+    @property
+    def b64(self):
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self.jpeg).decode('ascii')
+        return self._b64
+
+    @property
+    def line(self):
+        if self._line is None:
+            self._line = (json.dumps({
+                Protocol.ACTION: Protocol.VIDEO_FRAME,
+                Protocol.PAYLOAD: self.b64
+            }) + "\n").encode('utf-8')
+        return self._line
+
+    @property
+    def record(self):
+        if self._record is None:
+            self._record = encode_record(VIDEO_JPEG, self.jpeg)
+        return self._record
+
+    @property
+    def keyframe(self):
+        """This frame as a tiles keyframe payload (for viewers not in sync)."""
+        if self._keyframe is None:
+            height, width = self._picture().shape[:2]
+            self._keyframe = video_tiles.keyframe_payload(self.jpeg, width, height)
+        return self._keyframe
+
+    def _tile_message(self, payload, binary):
+        key = (payload is self.tiles, binary)
+        data = self._tile_variants.get(key)
+        if data is None:
+            if binary:
+                data = encode_record(VIDEO_TILES, payload)
+            else:
+                data = (json.dumps({
+                    Protocol.ACTION: Protocol.VIDEO_TILES,
+                    Protocol.PAYLOAD: base64.b64encode(payload).decode('ascii')
+                }) + "\n").encode('utf-8')
+            self._tile_variants[key] = data
+        return data
+
+    def for_client(self, client):
+        binary = getattr(client, 'binary_video', False)
+        if self.tiles is not None and getattr(client, 'video_tiles', False):
+            payload = self.tiles if self.is_keyframe or client.video_synced else self.keyframe
+            return self._tile_message(payload, binary)
+        return self.record if binary else self.line
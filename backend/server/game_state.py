@@ -3,544 +3,752 @@ import random
 import json
 import time
 
+from models import Room, RoundStats
+from stroke_store import StrokeStore, MODES, pack_stroke
+from stroke_codec import simplify_polyline
+import video_tiles
+from scheduler import default_scheduler
+import canvas_snapshot
+
+# Longest polyline held back for simplification before it is flushed anyway
+SIMPLIFY_MAX_POINTS = 256
+
 class GameState:
-    def __init__(self):
-        # Structure: { room_id: { 'clients': [conn], 'history': [json_stroke_str], 'score': {} } }
+    def __init__(self, scheduler=None, simplify_tolerance=None):
+        # Structure: { room_id: Room } (see models.py)
         self.rooms = {}
+        # Pixel tolerance for simplifying stroke history (Ramer-Douglas-Peucker),
+        # None stores every segment as received
+        self.simplify_tolerance = simplify_tolerance
+        # One timer thread for every room (round expiry, restarts, ...)
+        self.scheduler = scheduler or default_scheduler
+        # Worker thread of the running compaction pass (see start_compaction)
+        self.compaction_thread = None
+        # Registry lock: only held to create/remove rooms or snapshot the room list.
+        # Everything inside a room is guarded by that room's own lock.
         self.lock = threading.RLock()
 
+    def _new_room_lock(self):
+        return threading.RLock()
+
+    def _room(self, room_id):
+        # dict.get is atomic; no registry lock needed for lookups
+        return self.rooms.get(room_id)
+
     def create_room_if_missing(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            return room
         with self.lock:
             if room_id not in self.rooms:
-                self.rooms[room_id] = {
-                    'clients': [], 
-                    'history': [], 
-                    'score': {},
-                    'current_word': None,
-                    'guessed_players': set(),
-                    'round_active': False,
-                    'drawer': None,
-                    'drawer_queue': [], # List of names
-                    'round_start_time': 0,
-                    'round_duration': 60,
-                    'chat_history': [],
-                    'latest_video_frame': None
-                }
+                self.rooms[room_id] = Room(room_id, self._new_room_lock())
                 print(f"Created new room: {room_id}")
+            return self.rooms[room_id]
 
-    # ... (add_client, remove_client, etc. remain same, skipping to select_drawer) ...
-
-    def select_drawer(self, room_id):
+    def remove_room(self, room_id):
         with self.lock:
-            if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                room = self.rooms[room_id]
-                
-                # Check Queue
-                if not room['drawer_queue']:
-                    # Refill Queue (Round Robin)
-                    # We use insertion order from players dict values
-                    # Or sort by name for consistency? User said "repeat same queue".
-                    # Let's verify existing players.
-                    current_player_names = [p['name'] for p in room['players'].values()]
-                    
-                    if not current_player_names:
-                        return None
-                        
-                    # Sort to ensure consistent order across resets? 
-                    # Or just shuffle once? 
-                    # "one by one then repeat".
-                    # Let's just take current players.
-                    room['drawer_queue'] = list(current_player_names)
-                    # Optional: Shuffle if it's a fresh queue? 
-                    # User didn't explicitly ask for random, but usually games are random order then repeat.
-                    # Let's keep it simple: Sorted or Insertion. 
-                    # Python dict preserves insertion order since 3.7.
-                    
-                # Pop next
-                # Validate player is still here
-                while room['drawer_queue']:
-                    next_drawer = room['drawer_queue'].pop(0)
-                    # Check if this player is still in room
-                    player_exists = False
-                    for p in room['players'].values():
-                        if p['name'] == next_drawer:
-                            player_exists = True
-                            break
-                    
-                    if player_exists:
-                         room['drawer'] = next_drawer
-                         return next_drawer
-                
-                # If we ran out (everyone in queue left), try to refill immediately
-                # (Recursive call one level deep effectively)
-                # But let's just fail safe
-                return None
-                
-        return None
-
-    def start_timer(self, room_id, duration, callback):
-        # Cancel existing if any
-        self.cancel_timer(room_id)
-        
+            room = self.rooms.pop(room_id, None)
+        if room is not None:
+            with room.lock:
+                if room.timer:
+                    room.timer.cancel()
+                room.touch() # Wake long-polls so they see the room is gone
+            print(f"Removed room: {room_id}")
+
+    def room_exists(self, room_id):
+        return room_id in self.rooms
+
+    def list_rooms(self):
         with self.lock:
-            if room_id in self.rooms:
-                print(f"Starting {duration}s timer for {room_id}")
-                timer = threading.Timer(duration, callback, args=[room_id])
-                self.rooms[room_id]['timer'] = timer
-                self.rooms[room_id]['round_start_time'] = time.time()
-                self.rooms[room_id]['round_duration'] = duration
-                timer.start()
+            return list(self.rooms.keys())
 
-    def get_time_remaining(self, room_id):
-        with self.lock:
-            if room_id in self.rooms and self.rooms[room_id].get('round_active'):
-                start = self.rooms[room_id].get('round_start_time', 0)
-                duration = self.rooms[room_id].get('round_duration', 60)
-                elapsed = time.time() - start
-                remaining = max(0, duration - elapsed)
-                return int(remaining)
-        return 0
+    def add_client(self, room_id, conn, player_name="Unknown"):
+        room = self.create_room_if_missing(room_id)
+        with room.lock:
+            if conn not in room.connections:
+                room.clients.append(conn)
+            else:
+                room.detach(conn)
 
+            # Connections with the same name share one Player (score, ready, host)
+            player = room.attach(conn, player_name)
+            room.touch()
 
-    def add_client(self, room_id, conn, player_name="Unknown"):
-        self.create_room_if_missing(room_id)
-        with self.lock:
-            # Check if player is already in (by connection)
-            # Actually, we might have multiple players with same name? Let's allow for now.
-            
-            # Use connection as key for metadata
-            # Structure: players = { conn: {'name': '...', 'score': 0, 'is_host': ...} }
-            
-            if 'players' not in self.rooms[room_id]:
-                self.rooms[room_id]['players'] = {}
-            
-            if conn not in self.rooms[room_id]['clients']:
-                self.rooms[room_id]['clients'].append(conn)
-            
-            # Determine if host (first player is host)
-            is_host = len(self.rooms[room_id]['players']) == 0
-            
-            self.rooms[room_id]['players'][conn] = {
-                'name': player_name,
-                'score': 0,
-                'is_host': is_host,
-                'is_ready': is_host # Host is implicitly ready (or doesn't matter)
-            }
-            
-            print(f"Added player {player_name} to {room_id} (Host: {is_host})")
+            print(f"Added player {player_name} to {room_id} (Host: {player.is_host})")
+
+    def add_listener(self, room_id, conn):
+        """Receive the room's broadcasts without being a player (web event streams)."""
+        room = self.create_room_if_missing(room_id)
+        with room.lock:
+            room.clients.append(conn)
+
+    def remove_listener(self, room_id, conn):
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            if conn in room.clients:
+                room.clients.remove(conn)
 
     def set_player_ready(self, room_id, conn, is_ready):
-        """Set ready status for ALL connections with the same player name."""
-        with self.lock:
-            if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                if conn in self.rooms[room_id]['players']:
-                    player_name = self.rooms[room_id]['players'][conn]['name']
-                    # Update ALL connections for this player name
-                    for c, p in self.rooms[room_id]['players'].items():
-                        if p['name'] == player_name:
-                            p['is_ready'] = is_ready
-                    print(f"Player {player_name} ready: {is_ready}")
+        """Set ready status for the player behind this connection."""
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            player = room.connections.get(conn)
+            if player is not None:
+                player.is_ready = is_ready
+                room.touch()
+                print(f"Player {player.name} ready: {is_ready}")
+
+    def set_ready_by_name(self, room_id, player_name, is_ready):
+        """Set ready status for a player by name. Returns False if not found."""
+        room = self._room(room_id)
+        if room is None:
+            return False
+        with room.lock:
+            player = room.players.get(player_name)
+            if player is None:
+                return False
+            player.is_ready = is_ready
+            room.touch()
+            return True
 
     def are_all_players_ready(self, room_id):
         """Check readiness by unique player name, not per-connection."""
-        with self.lock:
-            if room_id not in self.rooms:
-                return False
-            
-            players = self.rooms[room_id].get('players', {})
-            
-            # Build unique player map: name -> {is_host, is_ready}
-            unique_players = {}
-            for p in players.values():
-                name = p['name']
-                if name not in unique_players:
-                    unique_players[name] = {'is_host': p['is_host'], 'is_ready': p.get('is_ready', False)}
-                else:
-                    # If ANY connection is host, player is host
-                    if p['is_host']:
-                        unique_players[name]['is_host'] = True
-                    # If ANY connection is ready, player is ready
-                    if p.get('is_ready', False):
-                        unique_players[name]['is_ready'] = True
-            
-            if len(unique_players) < 2:
+        room = self._room(room_id)
+        if room is None:
+            return False
+        with room.lock:
+            if len(room.players) < 2:
                 return False
-            
-            for info in unique_players.values():
-                if not info['is_host'] and not info['is_ready']:
+
+            for player in room.players.values():
+                if not player.is_host and not player.is_ready:
                     return False
-            
+
             return True
 
     def remove_client(self, room_id, conn):
-        with self.lock:
-            if room_id in self.rooms:
-                if conn in self.rooms[room_id]['clients']:
-                    self.rooms[room_id]['clients'].remove(conn)
-                if 'players' in self.rooms[room_id] and conn in self.rooms[room_id]['players']:
-                    del self.rooms[room_id]['players'][conn]
-                    
-                # If host left, assign new host? For now, keep it simple.
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            if conn in room.connections:
+                room.clients.remove(conn)
+                room.detach(conn)
+                room.touch()
+
+            # If host left, assign new host? For now, keep it simple.
 
     def add_web_client(self, room_id, player_name):
         """Register a web player using a string key (no TCP socket)."""
-        self.create_room_if_missing(room_id)
-        with self.lock:
-            if 'players' not in self.rooms[room_id]:
-                self.rooms[room_id]['players'] = {}
-            
+        room = self.create_room_if_missing(room_id)
+        with room.lock:
             web_key = f"web_{player_name}"
-            
+
             # Check if already registered
-            if web_key in self.rooms[room_id]['players']:
+            if web_key in room.connections:
                 return web_key  # Already registered
-            
-            # Determine if host (first player is host)
-            is_host = len(self.rooms[room_id]['players']) == 0
-            
-            self.rooms[room_id]['players'][web_key] = {
-                'name': player_name,
-                'score': 0,
-                'is_host': is_host,
-                'is_ready': is_host
-            }
-            
-            print(f"Added web player {player_name} to {room_id} (Host: {is_host})")
+
+            player = room.attach(web_key, player_name)
+            room.touch()
+
+            print(f"Added web player {player_name} to {room_id} (Host: {player.is_host})")
             return web_key
 
     def is_web_drawer(self, room_id, player_name):
         """Check if a web player (by name) is the current drawer."""
-        with self.lock:
-            if room_id in self.rooms:
-                room = self.rooms[room_id]
-                if not room.get('round_active', False):
-                    return True  # Allow drawing in lobby
-                return room.get('drawer') == player_name
-        return False
+        room = self._room(room_id)
+        if room is None:
+            return False
+        if not room.round_active:
+            return True  # Allow drawing in lobby
+        return room.drawer == player_name
 
     def get_player_name_by_key(self, room_id, key):
         """Get player name from any key (socket or string)."""
-        with self.lock:
-            if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                if key in self.rooms[room_id]['players']:
-                    return self.rooms[room_id]['players'][key]['name']
-        return None
-
-    def add_stroke(self, room_id, stroke_data):
-        with self.lock:
-            if room_id in self.rooms:
-                self.rooms[room_id]['history'].append(stroke_data)
+        room = self._room(room_id)
+        if room is None:
+            return None
+        player = room.connections.get(key)
+        return player.name if player is not None else None
+
+    def find_connections_by_addr(self, room_id, addrs):
+        """Return the socket connections in a room whose peer address is in addrs."""
+        room = self._room(room_id)
+        if room is None:
+            return []
+        matches = []
+        with room.lock:
+            for conn in room.connections:
+                try:
+                    if str(conn.getpeername()) in addrs:
+                        matches.append(conn)
+                except:
+                    pass
+        return matches
+
+    def add_stroke(self, room_id, stroke_data, stroke=None):
+        """
+        stroke_data is the raw JSON line; stroke is the already-parsed dict
+        (callers have it anyway) used to keep the round stats current.
+        """
+        room = self._room(room_id)
+        if room is None:
+            return
+        if stroke is None:
+            try:
+                stroke = json.loads(stroke_data)
+            except json.JSONDecodeError:
+                stroke = {}
+        if not isinstance(stroke, dict):
+            stroke = {}
+        packed = pack_stroke(stroke) if self.simplify_tolerance is not None else None
+        with room.lock:
+            if packed is not None:
+                self._extend_pending(room, packed)
+            else:
+                self._flush_pending(room)
+                room.history.append(stroke, stroke_data)
+            room.round_stats.record(stroke.get('mode'), len(stroke_data))
+
+    def add_segments(self, room_id, segments, size=0):
+        """
+        Store already-packed segments (a compact stroke record) under one lock.
+        size is the record's wire size, shared out for the round stats.
+        Returns a StrokeView of the new strokes (as received, for broadcasting).
+        """
+        room = self._room(room_id)
+        if room is None:
+            return StrokeStore().view()
+        per_segment = size // len(segments) if segments else 0
+        if self.simplify_tolerance is not None:
+            live = StrokeStore()
+            with room.lock:
+                record = room.round_stats.record
+                for segment in segments:
+                    self._extend_pending(room, segment)
+                    live.append_packed(segment)
+                    record(MODES[segment[6]] if segment[6] < len(MODES) else None, per_segment)
+            return live.view()
+        with room.lock:
+            history = room.history
+            start = len(history)
+            record = room.round_stats.record
+            for segment in segments:
+                history.append_packed(segment)
+                record(MODES[segment[6]] if segment[6] < len(MODES) else None, per_segment)
+            return history.view(start)
+
+    def _extend_pending(self, room, segment):
+        # Continue the room's pending polyline with a packed segment, or flush
+        # it and start a new one (style change, gap, or too long). Lock held.
+        pending = room.pending
+        if pending is not None:
+            style, points = pending
+            if segment[4:] == style and points[-1] == (segment[0], segment[1]) \
+                    and len(points) < SIMPLIFY_MAX_POINTS:
+                points.append((segment[2], segment[3]))
+                return
+            self._flush_pending(room)
+        room.pending = (segment[4:], [(segment[0], segment[1]), (segment[2], segment[3])])
+
+    def _flush_pending(self, room):
+        # Simplify the pending polyline into history. Lock held; called
+        # before anything reads history, so readers never miss a stroke.
+        pending = room.pending
+        if pending is None:
+            return
+        room.pending = None
+        style, points = pending
+        points = simplify_polyline(points, self.simplify_tolerance)
+        append = room.history.append_packed
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            append((x1, y1, x2, y2) + style)
+
+    def get_round_stats(self, room_id):
+        room = self._room(room_id)
+        if room is None:
+            return None
+        with room.lock:
+            return room.round_stats.to_dict()
+
+    def clear_history(self, room_id):
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            # Fresh store; views handed out earlier keep the old columns alive
+            room.history = StrokeStore()
+            room.snapshot = None
+            room.pending = None
+
+    def compact_history(self, room_id, min_segments=canvas_snapshot.COMPACT_MIN_SEGMENTS):
+        """
+        Fold strokes into the room's canvas snapshot once at least min_segments
+        have piled up since the last one. Rasterizing happens outside the room
+        lock; strokes that arrive meanwhile stay in the new (tail) store.
+        """
+        room = self._room(room_id)
+        if room is None or not canvas_snapshot.available():
+            return False
+        with room.lock:
+            history = room.history
+            previous = room.snapshot
+            if len(history) - history.base < min_segments:
+                return False
+            view = history.view(history.base)
+
+        snapshot = canvas_snapshot.build(previous, view)
+        if snapshot is None:
+            return False
+
+        with room.lock:
+            if room.history is not history:
+                return False # Cleared (new round) while we were drawing
+            room.history = history.tail(snapshot.upto)
+            room.snapshot = snapshot
+        print(f"Compacted {room_id}: {len(view)} strokes -> {len(snapshot.png)} byte snapshot")
+        return True
+
+    def compact_histories(self):
+        # Compaction worker thread (start_compaction)
+        for room_id in self.list_rooms():
+            try:
+                self.compact_history(room_id)
+            except Exception as e:
+                print(f"Compacting {room_id} failed: {e}")
+
+    def start_compaction(self):
+        """
+        Periodic task (scheduler thread): runs compact_histories on a worker
+        thread and returns at once, so rasterizing and PNG encoding never
+        hold up round timers. Skipped while the previous pass is still running.
+        """
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return
+        self.compaction_thread = threading.Thread(target=self.compact_histories, name="compaction", daemon=True)
+        self.compaction_thread.start()
 
     def append_chat(self, room_id, message):
-        with self.lock:
-            if room_id in self.rooms:
-                # Store tuple: (timestamp, message) or just message?
-                # Just message for now, simple string or dict
-                self.rooms[room_id]['chat_history'].append(message)
-                # Cap history? 
-                if len(self.rooms[room_id]['chat_history']) > 100:
-                    self.rooms[room_id]['chat_history'].pop(0)
-
-    def update_video_frame(self, room_id, frame_data):
-        # frame_data is base64 string
-        # No lock needed for simple assignment? safer with lock
-        with self.lock:
-            if room_id in self.rooms:
-                 self.rooms[room_id]['latest_video_frame'] = frame_data
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            # Just message for now, simple string
+            room.chat_history.append(message)
+            # Cap history
+            if len(room.chat_history) > 100:
+                room.chat_history.pop(0)
+            room.touch()
+
+    def update_video_frame(self, room_id, frame):
+        # frame is a framing.VideoFrame (JPEG bytes and/or base64)
+        # Single reference assignment, no lock needed
+        room = self._room(room_id)
+        if room is not None:
+            room.latest_video_frame = frame
+
+    def apply_video_tiles(self, room_id, frame):
+        """
+        Patch the room's picture with a tile-delta VideoFrame. False if it
+        can't be applied (malformed, or a delta before any keyframe).
+        Under the room lock: during a drawer handoff the old and new
+        drawer's frames can arrive on two connections at once.
+        """
+        room = self._room(room_id)
+        if room is None or not video_tiles.available():
+            return False
+        with room.lock:
+            if room.video_picture is None:
+                room.video_picture = video_tiles.TileDecoder()
+            try:
+                if not room.video_picture.apply(frame.tiles):
+                    return False
+            except ValueError:
+                return False
+            frame.applied(room.video_picture, room.lock)
+            return True
 
     def get_video_frame(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                return self.rooms[room_id].get('latest_video_frame')
+        """Latest frame as base64 (web API); encoded at most once per frame."""
+        room = self._room(room_id)
+        if room is not None and room.latest_video_frame is not None:
+            try:
+                return room.latest_video_frame.b64
+            except ValueError:
+                return None
         return None
 
     def get_clients(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                # Return a copy to avoid race conditions during iteration
-                return list(self.rooms[room_id]['clients'])
+        room = self._room(room_id)
+        if room is None:
             return []
+        with room.lock:
+            # Return a copy to avoid race conditions during iteration
+            return list(room.clients)
+
+    def get_history(self, room_id, start=0):
+        """Zero-copy StrokeView of strokes [start:] (compacted ones excluded, see get_catch_up)."""
+        room = self._room(room_id)
+        if room is None:
+            return StrokeStore().view()
+        with room.lock:
+            self._flush_pending(room)
+            return room.history.view(start)
+
+    def get_catch_up(self, room_id, start=0):
+        """
+        What a client that has seen strokes [:start] needs: (snapshot, view).
+        snapshot is None unless start falls inside the compacted range, in
+        which case view begins where the snapshot ends.
+        """
+        room = self._room(room_id)
+        if room is None:
+            return None, StrokeStore().view()
+        with room.lock:
+            self._flush_pending(room)
+            snapshot = room.snapshot
+            if snapshot is not None and start < snapshot.upto:
+                return snapshot, room.history.view(snapshot.upto)
+            return None, room.history.view(start)
 
-    def get_history(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                return list(self.rooms[room_id]['history'])
-            return []
-            
     def is_host(self, room_id, conn):
-        with self.lock:
-            if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                 if conn in self.rooms[room_id]['players']:
-                     return self.rooms[room_id]['players'][conn]['is_host']
-        return False
-        
+        room = self._room(room_id)
+        if room is None:
+            return False
+        player = room.connections.get(conn)
+        return player is not None and player.is_host
+
     def set_round_active(self, room_id, active):
-        with self.lock:
-             if room_id in self.rooms:
-                 self.rooms[room_id]['round_active'] = active
-                 if active:
-                     self.rooms[room_id]['guessed_players'] = set()
-                 
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            room.round_active = active
+            if active:
+                room.guessed_players = set()
+                room.round_stats = RoundStats()
+            room.touch()
+
     def is_round_active(self, room_id):
-        with self.lock:
-            return self.rooms.get(room_id, {}).get('round_active', False)
+        room = self._room(room_id)
+        return room is not None and room.round_active
 
     def set_word(self, room_id, word):
-        with self.lock:
-            if room_id in self.rooms:
-                self.rooms[room_id]['current_word'] = word
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            room.set_word(word)
+            room.touch()
 
     def get_word(self, room_id):
-        with self.lock:
-            return self.rooms.get(room_id, {}).get('current_word')
+        room = self._room(room_id)
+        return room.current_word if room is not None else None
 
     def select_drawer(self, room_id):
-        with self.lock:
-            if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                room = self.rooms[room_id]
-                
-                # Check Queue
-                if not room.get('drawer_queue'):
-                    # Refill Queue (Round Robin)
-                    # We use insertion order from players dict values
-                    current_player_names = []
-                    seen = set()
-                    for p in room['players'].values():
-                        name = p['name']
-                        if name not in seen:
-                            current_player_names.append(name)
-                            seen.add(name)
-                            
-                    if not current_player_names:
-                        return None
-                        
-                    room['drawer_queue'] = list(current_player_names)
-                    print(f"Refilled drawer queue for {room_id}: {room['drawer_queue']}")
-                    
-                # Pop next
-                # Validate player is still here
-                while room['drawer_queue']:
-                    next_drawer = room['drawer_queue'].pop(0)
-                    # Check if this player is still in room
-                    player_exists = False
-                    for p in room['players'].values():
-                        if p['name'] == next_drawer:
-                            player_exists = True
-                            break
-                    
-                    if player_exists:
-                         room['drawer'] = next_drawer
-                         return next_drawer
-                
-                # If list exhausted (all left), fallback
-                return None
-        return None
-        
+        room = self._room(room_id)
+        if room is None:
+            return None
+        with room.lock:
+            # Check Queue
+            if not room.drawer_queue:
+                # Refill Queue (Round Robin)
+                # Players dict keeps join order (insertion order)
+                if not room.players:
+                    return None
+
+                room.drawer_queue = list(room.players)
+                print(f"Refilled drawer queue for {room_id}: {room.drawer_queue}")
+
+            # Pop next
+            # Validate player is still here
+            while room.drawer_queue:
+                next_drawer = room.drawer_queue.pop(0)
+                if next_drawer in room.players:
+                     room.set_drawer(next_drawer)
+                     room.touch()
+                     return next_drawer
+
+            # If list exhausted (all left), fallback
+            return None
+
     def is_drawer(self, room_id, conn):
-        with self.lock:
-            if room_id in self.rooms:
-                room = self.rooms[room_id]
-                
-                # Allow everyone to draw in lobby (when round is not active)
-                if not room.get('round_active', False):
-                    return True
-
-                drawer_name = room.get('drawer')
-                if not drawer_name:
-                    return True # Should not happen if round is active, but fallback
-                
-                if 'players' in room and conn in room['players']:
-                    return room['players'][conn]['name'] == drawer_name
-        return False
+        # Hot path (every stroke / video frame): no lock, no scan
+        room = self._room(room_id)
+        if room is None:
+            return False
+
+        # Allow everyone to draw in lobby (when round is not active)
+        if not room.round_active:
+            return True
+
+        if not room.drawer:
+            return True # Should not happen if round is active, but fallback
+
+        return conn in room.drawer_conns
 
     def cleanup_empty_rooms(self):
-        # Optional: remove rooms with no clients
-        pass
+        # Remove rooms with no players left
+        for room_id in self.list_rooms():
+            room = self._room(room_id)
+            if room is not None and not room.players:
+                self.remove_room(room_id)
 
     def end_round(self, room_id):
-        with self.lock:
-            if room_id not in self.rooms:
-                return None
-            
-            room = self.rooms[room_id]
-            if not room.get('round_active'):
+        room = self._room(room_id)
+        if room is None:
+            return None
+        with room.lock:
+            if not room.round_active:
                 return None
 
             # 1. Drawer Bonus
             # Bonus ONLY if they used "gesture" mode at least once
-            drawer_name = room.get('drawer')
-            if drawer_name:
-                used_gesture = False
-                for s_str in room.get('history', []):
-                    # Check if stroke belongs to current round? 
-                    try:
-                        s = json.loads(s_str)
-                        if s.get('mode') == 'gesture':
-                            used_gesture = True
-                            break
-                    except:
-                        pass
-                
-                # Bonus Amount
-                bonus = 50 if used_gesture else 0
-                
-                if bonus > 0:
-                    # Update ALL connections for this drawer name
-                    for data in room['players'].values():
-                        if data['name'] == drawer_name:
-                            data['score'] += bonus
-                         
+            # (tracked incrementally by add_stroke, no history re-parse)
+            drawer = room.players.get(room.drawer) if room.drawer else None
+            if drawer is not None and room.round_stats.used_gesture:
+                drawer.score += 50
+
             # 2. Prepare Score Summary (Unique Players)
-            unique_scores = {} # name -> score
-            for data in room['players'].values():
-                name = data['name']
-                score = data['score']
-                # Keep the max score if there's a discrepancy (though sync should prevent it)
-                if name not in unique_scores or score > unique_scores[name]:
-                    unique_scores[name] = score
-            
-            scores = [(name, score) for name, score in unique_scores.items()]
-            
+            scores = [(p.name, p.score) for p in room.players.values()]
+
             # Sort by score desc
             scores.sort(key=lambda x: x[1], reverse=True)
-            
+
             # Reset Round State
-            room['round_active'] = False
-            room['guessed_players'] = set()
-            
-            room['drawer'] = None  # Clear drawer so video stops broadcasting in lobby
+            room.round_active = False
+            room.guessed_players = set()
+
+            room.set_drawer(None)  # Clear drawer so video stops broadcasting in lobby
             self.cancel_timer(room_id) # Ensure timer is cancelled if round ends manually
-            
+            room.touch()
+
             return scores
 
     def start_timer(self, room_id, duration, callback):
         # Cancel existing if any
         self.cancel_timer(room_id)
-        
-        with self.lock:
-            if room_id in self.rooms:
-                print(f"Starting {duration}s timer for {room_id}")
-                timer = threading.Timer(duration, callback, args=[room_id])
-                self.rooms[room_id]['timer'] = timer
-                self.rooms[room_id]['round_start_time'] = time.time()
-                self.rooms[room_id]['round_duration'] = duration
-                timer.start()
+
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            print(f"Starting {duration}s timer for {room_id}")
+            room.timer = self.scheduler.call_later(duration, callback, room_id)
+            room.round_start_time = time.time()
+            room.round_duration = duration
 
     def get_time_remaining(self, room_id):
-        with self.lock:
-            if room_id in self.rooms and self.rooms[room_id].get('round_active'):
-                start = self.rooms[room_id].get('round_start_time', 0)
-                duration = self.rooms[room_id].get('round_duration', 60)
-                elapsed = time.time() - start
-                remaining = max(0, duration - elapsed)
+        room = self._room(room_id)
+        if room is None:
+            return 0
+        with room.lock:
+            if room.round_active:
+                elapsed = time.time() - room.round_start_time
+                remaining = max(0, room.round_duration - elapsed)
                 return int(remaining)
         return 0
 
     def cancel_timer(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                timer = self.rooms[room_id].get('timer')
-                if timer:
-                    timer.cancel()
-                    self.rooms[room_id]['timer'] = None
-                    print(f"Cancelled timer for {room_id}")
+        room = self._room(room_id)
+        if room is None:
+            return
+        with room.lock:
+            if room.timer:
+                room.timer.cancel()
+                room.timer = None
+                print(f"Cancelled timer for {room_id}")
 
     def get_player_name(self, room_id, conn):
-        with self.lock:
-             if room_id in self.rooms and 'players' in self.rooms[room_id]:
-                if conn in self.rooms[room_id]['players']:
-                    return self.rooms[room_id]['players'][conn]['name']
-        return "Unknown"
+        return self.get_player_name_by_key(room_id, conn) or "Unknown"
 
     def get_drawer_name(self, room_id):
-        with self.lock:
-            if room_id in self.rooms:
-                return self.rooms[room_id].get('drawer')
+        room = self._room(room_id)
+        if room is not None:
+            return room.drawer
         return None
 
+    def room_summary(self, room_id):
+        """Lobby check: existence, player count, round flag and readiness."""
+        room = self._room(room_id)
+        if room is None:
+            return {"exists": False, "player_count": 0, "round_active": False, "all_ready": False}
+        with room.lock:
+            # Counted per connection, as the lobby always has
+            player_count = len(room.connections)
+
+            # Check if all non-host players are ready
+            all_ready = player_count >= 2 and all(
+                p.is_host or p.is_ready for p in room.players.values()
+            )
+
+            return {
+                "exists": True,
+                "player_count": player_count,
+                "round_active": room.round_active,
+                "all_ready": all_ready
+            }
+
+    def snapshot_room(self, room_id, include_stats=True):
+        """
+        Serialization-safe view of one room (one entry per player name).
+        Everything but round_stats changes only with room.version, so
+        per-room clients (include_stats=False) can be answered by version.
+        """
+        room = self._room(room_id)
+        if room is None:
+            return None
+        with room.lock:
+            players_list = []
+            for p in room.players.values():
+                # Track socket addresses for kicking (web keys have none)
+                # (peer address cached on the connection, no syscall)
+                addrs = [str(conn.peername) for conn in p.conns if not isinstance(conn, str)]
+                players_list.append({
+                    "name": p.name,
+                    "score": p.score,
+                    "is_host": p.is_host,
+                    "is_ready": p.is_ready,
+                    "addr": ", ".join(addrs) # Show all addrs
+                })
+
+            snapshot = {
+                "version": room.version,
+                "round_active": room.round_active,
+                "drawer": room.drawer,
+                "current_word": room.current_word,
+                "time_remaining": 0, # Not tracked per room (clients count down from GAME_START)
+                "player_count": len(players_list), # Unique count
+                "players": players_list,
+                "chat_history": list(room.chat_history),
+            }
+            if include_stats:
+                # Live counters, updated per stroke without a version bump
+                snapshot["round_stats"] = room.round_stats.to_dict()
+            return snapshot
+
+    def _cached(self, room, name, build):
+        # Lock-free hit while room.version is unchanged; rebuilt under the lock otherwise
+        entry = room.cache.get(name)
+        if entry is not None and entry[0] == room.version:
+            return entry
+        with room.lock:
+            entry = (room.version, build())
+            room.cache[name] = entry
+            return entry
+
+    def room_state_json(self, room_id):
+        """(version, JSON bytes) of snapshot_room(include_stats=False), rebuilt only after a change."""
+        room = self._room(room_id)
+        if room is None:
+            return None, None
+        return self._cached(room, 'state', lambda: json.dumps(
+            self.snapshot_room(room_id, include_stats=False)).encode('utf-8'))
+
+    def room_summary_json(self, room_id):
+        """room_summary() as JSON bytes, rebuilt only after a change."""
+        room = self._room(room_id)
+        if room is None:
+            return json.dumps(self.room_summary(room_id)).encode('utf-8')
+        return self._cached(room, 'summary', lambda: json.dumps(
+            self.room_summary(room_id)).encode('utf-8'))[1]
+
+    def rooms_state_json(self):
+        """
+        Every room's state as JSON bytes (admin /api/state): the cached room
+        snapshots with the live round_stats spliced in.
+        """
+        parts = []
+        for room_id in self.list_rooms():
+            room = self._room(room_id)
+            _, state = self.room_state_json(room_id)
+            if room is None or state is None:
+                continue
+            with room.lock:
+                stats = json.dumps(room.round_stats.to_dict()).encode('utf-8')
+            # state is a JSON object: reopen it before the closing brace
+            parts.append(json.dumps(room_id).encode('utf-8') + b": " +
+                         state[:-1] + b", \"round_stats\": " + stats + b"}")
+        return b"{" + b", ".join(parts) + b"}"
+
+    def get_room_version(self, room_id):
+        room = self._room(room_id)
+        return room.version if room is not None else None
+
+    def wait_for_change(self, room_id, version, timeout):
+        """
+        Block until the room's version differs from `version` (or timeout).
+        Returns the current version, None if the room doesn't exist.
+        """
+        room = self._room(room_id)
+        if room is None:
+            return None
+        with room.lock:
+            # Condition.wait releases the room lock while sleeping
+            room.changed.wait_for(lambda: room.version != version, timeout)
+            if self._room(room_id) is not room:
+                return None
+            return room.version
+
+    def snapshot_rooms(self):
+        # Registry lock only for the key list; each room is locked on its own
+        state_dump = {}
+        for room_id in self.list_rooms():
+            snapshot = self.snapshot_room(room_id)
+            if snapshot is not None:
+                state_dump[room_id] = snapshot
+        return state_dump
+
     def process_guess(self, room_id, conn, guess):
-        with self.lock:
-            if room_id not in self.rooms:
-                return "error", None
-            
-            room = self.rooms[room_id]
-            if not room.get('round_active'):
+        room = self._room(room_id)
+        if room is None:
+            return "error", None
+        with room.lock:
+            if not room.round_active:
                 return "chat", None # Just chat if no game
-                
-            current_word = room.get('current_word')
-            if not current_word:
+
+            if not room.word_key:
                 return "chat", None
-                
-            # Check if sender is drawer
-            drawer_name = room.get('drawer')
-            player_name = self.get_player_name(room_id, conn) # Verify we can call this inside lock? 
-            # Wait, get_player_name takes lock. recursive lock? 
-            # RLock is needed if we call internal methods that take lock.
-            # `self.lock = threading.Lock()` is standard lock. 
-            # So I should copy logic or use RLock. 
-            # For simplicity, I will access dict directly since I already hold lock here.
-            
-            if 'players' in room and conn in room['players']:
-                player_data = room['players'][conn]
-                player_name = player_data['name']
-            else:
+
+            player = room.connections.get(conn)
+            if player is None:
                 return "error", None
 
-            if player_name == drawer_name:
+            # Check if sender is drawer
+            if conn in room.drawer_conns:
                 return "chat", None # Drawer can't guess
-                
-            # Check if already guessed
-            if conn in room['guessed_players']:
-                return "chat", None # Already guessed, just chat (or block?)
+
+            # Check if already guessed (tracked by name)
+            if player.name in room.guessed_players:
+                return "chat", None # Already guessed, just chat
 
             # Check matching
-            if guess.strip().lower() == current_word.lower():
+            if guess.strip().lower() == room.word_key:
                 # CORRECT GUESS
-                # Use Name for tracking uniqueness
-                if player_name not in room['guessed_players']:
-                    room['guessed_players'].add(player_name)
-                    # Score Guesser
-                    player_data['score'] += 10
-                    
-                    # Score Drawer
-                    drawer_conn = None
-                    for c, data in room['players'].items():
-                        if data['name'] == drawer_name:
-                            data['score'] += 10 # +10 for drawer per correct guess
-                            drawer_conn = c
-                            # break # Don't break, in case drawer has multiple connections (score all? No just once)
-                            # Actually, score is stored in data dict. If multiple connections share same score object?
-                            # No, currently new dict per connection.
-                            # We should find ALL connections for drawer and update score? 
-                            # Or just update one and assume sync? 
-                            # Step 1: Just update the current iteration. 
-                            # Better: Score is associated with player name in a robust system. 
-                            # Here, simplistic: Update ALL matching names?
-                            break 
-                    
-                    # Update score for ALL connections with same name (to keep sync)
-                    for c, data in room['players'].items():
-                        if data['name'] == player_name:
-                             data['score'] = player_data['score']
-                        if data['name'] == drawer_name:
-                             # We already added +10 to one instance. 
-                             # Let's just ensure drawer score is consistent if we had central score.
-                             # For now, simplistic approach: 
-                             pass
+                room.guessed_players.add(player.name)
+                # Score Guesser (one shared record for all of the player's connections)
+                player.score += 10
+
+                # Score Drawer: +10 per correct guess
+                drawer = room.players.get(room.drawer)
+                if drawer is not None:
+                    drawer.score += 10
+                room.touch()
+
+                # Unique player count is len(room.players), maintained by attach/detach
 
                 # Check if ALL guessers have guessed
-                # Total UNIQUE players
-                unique_player_names = set()
-                for data in room['players'].values():
-                    unique_player_names.add(data['name'])
-                
-                total_players = len(unique_player_names)
                 # Drawer is one unique name
+                total_players = len(room.players)
                 total_guessers = total_players - 1 if total_players > 0 else 0
-                
-                if len(room['guessed_players']) >= total_guessers and total_guessers > 0:
+
+                if len(room.guessed_players) >= total_guessers and total_guessers > 0:
                     return "round_over", 10
-                
+
                 return "correct", 10
-            
+
             return "chat", None
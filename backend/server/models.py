@@ -0,0 +1,146 @@
+import itertools
+import threading
+
+from stroke_store import StrokeStore, MODE_CODES
+
+# State versions come from one counter so they never repeat, even for a
+# room that was removed and recreated under the same id
+_versions = itertools.count(1)
+
+
+class Player:
+    """
+    One player in a room. Shared by every connection that joined with the
+    same name (drawer.py opens two sockets, web players use a 'web_' key),
+    so score/ready/host live in exactly one place.
+    """
+    __slots__ = ('name', 'score', 'is_host', 'is_ready', 'conns')
+
+    def __init__(self, name, is_host=False):
+        self.name = name
+        self.score = 0
+        self.is_host = is_host
+        self.is_ready = is_host # Host is implicitly ready
+        self.conns = set()      # sockets and/or 'web_<name>' keys
+
+
+class RoundStats:
+    """Drawing statistics for the current round, updated as strokes arrive."""
+    __slots__ = ('segments', 'bytes', 'mode_counts')
+
+    def __init__(self):
+        self.segments = 0
+        self.bytes = 0
+        self.mode_counts = {}   # mode ('gesture', 'mouse', None) -> segments
+
+    def record(self, mode, size):
+        self.segments += 1
+        self.bytes += size
+        # mode comes from the client: anything but a known mode name counts as None
+        if not isinstance(mode, str) or mode not in MODE_CODES:
+            mode = None
+        self.mode_counts[mode] = self.mode_counts.get(mode, 0) + 1
+
+    @property
+    def used_gesture(self):
+        return 'gesture' in self.mode_counts
+
+    def to_dict(self):
+        return {
+            "segments": self.segments,
+            "bytes": self.bytes,
+            "modes": {str(mode): count for mode, count in self.mode_counts.items()},
+            "used_gesture": self.used_gesture,
+        }
+
+
+class Room:
+    __slots__ = (
+        'room_id', 'lock',
+        'version',          # bumped by touch() on every change visible in the room state
+        'changed',          # Condition on lock, notified by touch() (long-polls)
+        'cache',            # name -> (version, encoded) for the admin API; stale once version moves
+        'clients',          # [conn] that receive broadcasts
+        'players',          # name -> Player
+        'connections',      # conn or web key -> Player
+        'history',          # StrokeStore (columnar)
+        'snapshot',         # CanvasSnapshot of strokes below history.base, or None
+        'pending',          # (style, [points]) polyline not yet simplified into history, or None
+        'round_stats',      # RoundStats for the current round
+        'current_word',
+        'word_key',         # current_word normalized for guess matching
+        'guessed_players', 'round_active',
+        'drawer',           # drawer name
+        'drawer_conns',     # the drawer Player's conns set (O(1) is_drawer)
+        'drawer_queue',     # list of names
+        'round_start_time', 'round_duration', 'timer',
+        'chat_history',
+        'latest_video_frame', # framing.VideoFrame
+        'video_picture',    # video_tiles.TileDecoder: the drawer's picture rebuilt from tile deltas
+    )
+
+    def __init__(self, room_id, lock=None):
+        self.room_id = room_id
+        self.lock = lock if lock is not None else threading.RLock()
+        self.version = next(_versions)
+        self.changed = threading.Condition(self.lock)
+        self.cache = {}
+        self.clients = []
+        self.players = {}
+        self.connections = {}
+        self.history = StrokeStore()
+        self.snapshot = None
+        self.pending = None
+        self.round_stats = RoundStats()
+        self.current_word = None
+        self.word_key = None
+        self.guessed_players = set()
+        self.round_active = False
+        self.drawer = None
+        self.drawer_conns = frozenset()
+        self.drawer_queue = []
+        self.round_start_time = 0
+        self.round_duration = 60
+        self.timer = None
+        self.chat_history = []
+        self.latest_video_frame = None
+        self.video_picture = None
+
+    def touch(self):
+        """Call with the lock held after changing anything snapshot_room() reports."""
+        self.version = next(_versions)
+        self.changed.notify_all()
+
+    def attach(self, key, player_name):
+        """Bind a connection key to the player record for player_name, creating it if needed."""
+        player = self.players.get(player_name)
+        if player is None:
+            # Determine if host (first player is host)
+            player = Player(player_name, is_host=not self.players)
+            self.players[player_name] = player
+            if player_name == self.drawer:
+                # Drawer rejoined: track the new record's connections
+                self.drawer_conns = player.conns
+        player.conns.add(key)
+        self.connections[key] = player
+        return player
+
+    def set_word(self, word):
+        self.current_word = word
+        self.word_key = word.strip().lower() if word else None
+
+    def set_drawer(self, name):
+        self.drawer = name
+        player = self.players.get(name) if name else None
+        # Alias the live set so attach/detach keep it current for free
+        self.drawer_conns = player.conns if player is not None else frozenset()
+
+    def detach(self, key):
+        """Unbind a connection key; drops the player once it has no connections left."""
+        player = self.connections.pop(key, None)
+        if player is None:
+            return None
+        player.conns.discard(key)
+        if not player.conns:
+            self.players.pop(player.name, None)
+        return player
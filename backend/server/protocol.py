@@ -14,6 +14,10 @@ class Protocol:
     CLEAR_CANVAS = "clear_canvas"
     VIDEO_FRAME = "video_frame"
     READY = "ready"
+    CANVAS_SNAPSHOT = "canvas_snapshot" # base64 PNG of the canvas so far (late joiners)
+    SYNC = "sync" # web event stream: catch-up done, payload = stroke total
+    VIDEO_FEEDBACK = "video_feedback" # to the drawer: viewer backlog for its video (framed clients)
+    JOIN_ACK = "join_ack" # reply to a framed JOIN: payload = the record types this server accepts
     
     # Keys
     ACTION = "action"
@@ -21,3 +25,7 @@ class Protocol:
     PAYLOAD = "payload"
     SENDER = "sender"
     PLAYER_NAME = "player_name"
+    BINARY_VIDEO = "binary_video" # JOIN option: send/receive video as binary records (framing.py)
+    FRAMED = "framed" # JOIN option: every message as a length-prefixed record (implies binary_video)
+    COMPACT_STROKES = "compact_strokes" # JOIN option: receive compact stroke records (stroke_codec.py)
+    VIDEO_TILES = "video_tiles" # JOIN option (web stream: ?tiles=1): tile-delta video (video_tiles.py); also the web stream's message
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class TimerHandle:
+    """Returned by Scheduler.call_later/call_every. cancel() is O(1)."""
+    __slots__ = ('when', 'interval', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, interval, callback, args):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        # Lazy deletion: the heap entry is skipped when it comes due
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    One thread + one heap for every timer in the server (round expiry,
+    intermission restarts, periodic maintenance) instead of a
+    threading.Timer thread per timer.
+    Callbacks run on the scheduler thread and must not block.
+    """
+
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self.heap = []  # (when, seq, handle)
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.compact_at = 64
+        self.thread = None
+
+    def call_later(self, delay, callback, *args):
+        return self._push(TimerHandle(time.monotonic() + delay, None, callback, args))
+
+    def call_every(self, interval, callback, *args):
+        """Run callback every `interval` seconds until the handle is cancelled."""
+        return self._push(TimerHandle(time.monotonic() + interval, interval, callback, args))
+
+    def pending(self):
+        with self.cond:
+            return sum(1 for _, _, h in self.heap if not h.cancelled)
+
+    def _push(self, handle):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.heap, (handle.when, next(self.seq), handle))
+            # Only wake the thread if this is the new earliest deadline
+            if self.heap[0][2] is handle:
+                self.cond.notify()
+            self._maybe_compact()
+        return handle
+
+    def _maybe_compact(self):
+        # Drop cancelled entries (e.g. every round that ended early) once the
+        # heap doubles; amortized O(1) per push.
+        if len(self.heap) >= self.compact_at:
+            live = [entry for entry in self.heap if not entry[2].cancelled]
+            if len(live) != len(self.heap):
+                heapq.heapify(live)
+                self.heap = live
+            self.compact_at = max(64, 2 * len(live))
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    when, _, handle = self.heap[0]
+                    if handle.cancelled:
+                        heapq.heappop(self.heap)
+                        continue
+                    delay = when - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self.heap)
+                        break
+                    self.cond.wait(delay)
+
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                print(f"Scheduled task {getattr(handle.callback, '__name__', handle.callback)} failed: {e}")
+
+            if handle.interval is not None and not handle.cancelled:
+                handle.when += handle.interval
+                self._push(handle)
+
+
+# Shared instance used by the server modules
+default_scheduler = Scheduler()
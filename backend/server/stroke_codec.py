@@ -0,0 +1,192 @@
+# Compact stroke records (framing.STROKES payload): connected segments with
+# the same style become one polyline run, points after the first are
+# zigzag-varint deltas, and the style is only repeated when it changes.
+# Every record is self-contained, so the server can forward it untouched.
+#
+#   run    := flags (u8) [style] npoints (varint >= 2) x0 y0 (zigzag varint) {dx dy}*
+#   style  := color (varint, stroke_store packing) thickness (u8) mode (u8)
+from stroke_store import MODES, COLOR_HEX
+
+# flags bit 0: a new style follows (always set on a record's first run)
+RUN_STYLE = 0x01
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint too long")
+
+
+def _put_run(out, style, previous_style, points):
+    if style != previous_style:
+        out.append(RUN_STYLE)
+        color, thickness, mode = style
+        _put_varint(out, color)
+        out.append(thickness)
+        out.append(mode)
+    else:
+        out.append(0)
+    _put_varint(out, len(points))
+    px, py = points[0]
+    _put_varint(out, _zigzag(px))
+    _put_varint(out, _zigzag(py))
+    for x, y in points[1:]:
+        _put_varint(out, _zigzag(x - px))
+        _put_varint(out, _zigzag(y - py))
+        px, py = x, y
+
+
+def encode_segments(segments):
+    """Packed segments (stroke_store.pack_stroke tuples) -> record payload bytes."""
+    out = bytearray()
+    style = None        # style of the run being built
+    written = None      # last style written to out
+    points = []
+    for x1, y1, x2, y2, color, thickness, mode in segments:
+        seg_style = (color, thickness, mode)
+        if points and seg_style == style and points[-1] == (x1, y1):
+            points.append((x2, y2))
+            continue
+        if points:
+            _put_run(out, style, written, points)
+            written = style
+        style = seg_style
+        points = [(x1, y1), (x2, y2)]
+    if points:
+        _put_run(out, style, written, points)
+    return bytes(out)
+
+
+def _check_point(x, y):
+    if not (-32768 <= x <= 32767 and -32768 <= y <= 32767):
+        raise ValueError("point outside int16")
+
+
+def decode_segments(payload):
+    """
+    Record payload -> list of packed segments. Raises ValueError if
+    malformed or if a value doesn't fit the stroke_store columns, so
+    unpack_stroke and the store can take the result as is.
+    """
+    segments = []
+    style = None
+    pos = 0
+    end = len(payload)
+    try:
+        while pos < end:
+            flags = payload[pos]
+            pos += 1
+            if flags & RUN_STYLE:
+                color, pos = _get_varint(payload, pos)
+                thickness = payload[pos]
+                mode = payload[pos + 1]
+                pos += 2
+                # thickness is a u8, so it can't exceed 255
+                if color >= COLOR_HEX << 1:
+                    raise ValueError("color out of range")
+                if mode >= len(MODES):
+                    raise ValueError("unknown mode")
+                style = (color, thickness, mode)
+            elif style is None:
+                raise ValueError("run without a style")
+            color, thickness, mode = style
+
+            count, pos = _get_varint(payload, pos)
+            if count < 2:
+                raise ValueError("run with fewer than 2 points")
+            x, pos = _get_varint(payload, pos)
+            y, pos = _get_varint(payload, pos)
+            x, y = _unzigzag(x), _unzigzag(y)
+            _check_point(x, y)
+            for _ in range(count - 1):
+                dx, pos = _get_varint(payload, pos)
+                dy, pos = _get_varint(payload, pos)
+                nx, ny = x + _unzigzag(dx), y + _unzigzag(dy)
+                _check_point(nx, ny)
+                segments.append((x, y, nx, ny, color, thickness, mode))
+                x, y = nx, ny
+    except IndexError:
+        raise ValueError("truncated stroke record")
+    return segments
+
+
+def _off_line(px, py, x1, y1, x2, y2):
+    # Distance from (px, py) to the segment (x1, y1)-(x2, y2)
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return ((px - x1) ** 2 + (py - y1) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length2))
+    return ((px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2) ** 0.5
+
+
+def merge_collinear(segments, tolerance):
+    """
+    Join connected packed segments with the same style into one segment
+    while every point they pass through stays within tolerance px of it.
+    Lines drawn this thick can't show the difference at ~1 px.
+    """
+    out = []
+    inner = []      # points out[-1] passes through between its ends
+    for seg in segments:
+        if out:
+            last = out[-1]
+            if last[4:] == seg[4:] and last[2] == seg[0] and last[3] == seg[1]:
+                points = inner + [(seg[0], seg[1])]
+                x1, y1, x2, y2 = last[0], last[1], seg[2], seg[3]
+                if all(_off_line(px, py, x1, y1, x2, y2) <= tolerance for px, py in points):
+                    out[-1] = (x1, y1, x2, y2) + seg[4:]
+                    inner = points
+                    continue
+        out.append(seg)
+        inner = []
+    return out
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Ramer-Douglas-Peucker: the subset of points (ends always kept) such
+    that no dropped point is more than tolerance px off the result.
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        worst, index = -1.0, None
+        for i in range(first + 1, last):
+            d = _off_line(points[i][0], points[i][1], x1, y1, x2, y2)
+            if d > worst:
+                worst, index = d, i
+        if index is not None and worst > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
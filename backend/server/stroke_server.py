@@ -2,6 +2,7 @@ import socket
 import json
 import threading
 import sys
+import time
 import os
 
 # Ensure we can import local modules regardless of how the script is run
@@ -9,108 +10,186 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from game_state import GameState
+from connection import SocketConnection
 from protocol import Protocol
+from framing import StreamDecoder, FramingError, VideoFrame, VIDEO_JPEG, MSG_JSON, STROKES, VIDEO_TILES
+from framing import encode_record, lines_to_records
+import stroke_codec
 import word_manager
+import canvas_snapshot
+import video_tiles
 import admin
 
 HOST = 'localhost'
 PORT = 8080
+COMPACT_INTERVAL = 5.0 # seconds between history compaction passes
+VIDEO_FEEDBACK_INTERVAL = 0.5 # seconds between video_feedback messages to a drawer
 
 game_state = GameState()
 
-def handle_client(conn, addr):
+def parse_handshake(line):
+    """Return (room_id, player_name, handshake dict) for a valid JOIN line, else None."""
+    try:
+        handshake = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(handshake, dict) and handshake.get(Protocol.ACTION) == Protocol.JOIN and Protocol.ROOM_ID in handshake:
+        room_id = str(handshake[Protocol.ROOM_ID])
+        player_name = str(handshake.get(Protocol.PLAYER_NAME, "Unknown"))
+        return room_id, player_name, handshake
+    return None
+
+def join_room(room_id, conn, player_name, handshake=None):
+    """Register a connection and bring it up to date (history + round sync)."""
+    # 1.5 Capabilities (older clients send none and get JSON-only traffic)
+    if handshake:
+        conn.framed = bool(handshake.get(Protocol.FRAMED))
+        conn.binary_video = conn.framed or bool(handshake.get(Protocol.BINARY_VIDEO))
+        conn.compact_strokes = bool(handshake.get(Protocol.COMPACT_STROKES))
+        conn.video_tiles = bool(handshake.get(Protocol.VIDEO_TILES))
+
+    # 2. Join Room
+    game_state.add_client(room_id, conn, player_name)
+
+    # 2.5 Framed clients wait for this before sending anything but JSON lines
+    if conn.framed:
+        conn.send(encode_line(json.dumps({
+            Protocol.ACTION: Protocol.JOIN_ACK,
+            Protocol.PAYLOAD: {Protocol.FRAMED: True, Protocol.COMPACT_STROKES: True,
+                               Protocol.VIDEO_TILES: video_tiles.available()}
+        })))
+    
+    # 3. Send History
+    send_catch_up(room_id, conn)
+
+    # 3.5 Sync Late Joiner
+    if game_state.is_round_active(room_id):
+        remaining_time = game_state.get_time_remaining(room_id)
+        current_drawer = game_state.get_drawer_name(room_id)
+        
+        # Send GAME_START with remaining time
+        start_msg = json.dumps({
+            Protocol.ACTION: Protocol.GAME_START,
+            Protocol.PAYLOAD: remaining_time
+        })
+        conn.send(encode_line(start_msg))
+        
+        # Send DRAWER_ASSIGN
+        if current_drawer:
+            drawer_msg = json.dumps({
+                Protocol.ACTION: Protocol.DRAWER_ASSIGN,
+                Protocol.PLAYER_NAME: current_drawer
+            })
+            conn.send(encode_line(drawer_msg))
+
+def send_catch_up(room_id, conn, start=0):
+    """
+    Canvas snapshot (if the room has been compacted) plus the strokes since,
+    serialized from the columnar store in one buffer. Returns the stroke
+    index the connection is now caught up to.
+    """
+    snapshot, history = game_state.get_catch_up(room_id, start)
+    if snapshot is not None:
+        conn.send(encode_line(json.dumps({
+            Protocol.ACTION: Protocol.CANVAS_SNAPSHOT,
+            Protocol.PAYLOAD: snapshot.png_b64
+        })))
+    if len(history):
+        conn.send(history.to_json_lines(room_id))
+    return history.end
+
+def handle_line(room_id, message, conn):
+    """Dispatch one newline-delimited message from a joined connection."""
+    if not message.strip():
+        return
+    try:
+        data = json.loads(message)
+        if data.get(Protocol.ACTION) == Protocol.START_GAME:
+            handle_start_game(room_id, conn)
+        else:
+             process_message(room_id, message, conn)
+    except json.JSONDecodeError:
+        pass
+
+def handle_item(room_id, record_type, payload, conn):
+    """Dispatch one decoded item: a JSON line (record_type None) or a binary record."""
+    if record_type is None or record_type == MSG_JSON:
+        handle_line(room_id, payload.decode('utf-8', errors='replace'), conn)
+    elif record_type == VIDEO_JPEG:
+        handle_video_frame(room_id, VideoFrame(jpeg=payload), conn)
+    elif record_type == VIDEO_TILES:
+        handle_video_frame(room_id, VideoFrame(tiles=payload), conn)
+    elif record_type == STROKES:
+        handle_stroke_record(room_id, payload, conn)
+
+def handle_stroke_record(room_id, payload, sender_conn):
+    """Compact stroke record: store the segments, forward the record bytes as-is."""
+    # Validate Drawer for Drawing
+    if not game_state.is_drawer(room_id, sender_conn):
+        return
+    try:
+        segments = stroke_codec.decode_segments(payload)
+    except ValueError as e:
+        print(f"Bad stroke record in {room_id}: {e}")
+        return
+    if not segments:
+        return
+
+    # Save to history (columns, no dicts)
+    new_strokes = game_state.add_segments(room_id, segments, len(payload))
+
+    # Compact clients get the same record; everyone else the JSON lines
+    broadcast(room_id, new_strokes.to_json_lines(room_id), exclude_conn=sender_conn,
+              compact=encode_record(STROKES, payload))
+
+def handle_client(sock, addr):
     print(f"Connected by {addr}")
     room_id = None
+    # Outbound traffic goes through the connection's own queue + writer
+    conn = SocketConnection(sock, addr)
+    # JSON lines and binary records (video) from the same byte stream
+    decoder = StreamDecoder()
     
     try:
         # 1. Wait for Handshake
-        buffer = ""
-        handshake_done = False
-        
-        while not handshake_done:
-            data = conn.recv(1024)
+        items = []
+        while not items:
+            data = conn.recv(4096)
             if not data:
                 return 
-            
-            chunk = data.decode('utf-8')
-            buffer += chunk
-            
-            if "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                try:
-                    handshake = json.loads(line)
-                    if handshake.get(Protocol.ACTION) == Protocol.JOIN and Protocol.ROOM_ID in handshake:
-                        room_id = str(handshake[Protocol.ROOM_ID])
-                        player_name = str(handshake.get(Protocol.PLAYER_NAME, "Unknown"))
-                        handshake_done = True
-                        print(f"{addr} ({player_name}) joining room {room_id}")
-                    else:
-                        print(f"Invalid handshake from {addr}: {line}")
-                        return
-                except json.JSONDecodeError:
-                    print(f"Invalid JSON handshake from {addr}")
-                    return
-
-        # 2. Join Room
-        game_state.add_client(room_id, conn, player_name)
-        
-        # 3. Send History
-        history = game_state.get_history(room_id)
-        for old_stroke in history:
-            try:
-                conn.sendall((old_stroke + "\n").encode('utf-8'))
-            except:
-                break
+            items = decoder.feed(data)
 
-        # 3.5 Sync Late Joiner
-        if game_state.is_round_active(room_id):
-            remaining_time = game_state.get_time_remaining(room_id)
-            current_drawer = game_state.get_drawer_name(room_id)
-            
-            # Send GAME_START with remaining time
-            start_msg = json.dumps({
-                Protocol.ACTION: Protocol.GAME_START,
-                Protocol.PAYLOAD: remaining_time
-            })
-            conn.sendall((start_msg + "\n").encode('utf-8'))
-            
-            # Send DRAWER_ASSIGN
-            if current_drawer:
-                drawer_msg = json.dumps({
-                    Protocol.ACTION: Protocol.DRAWER_ASSIGN,
-                    Protocol.PLAYER_NAME: current_drawer
-                })
-                conn.sendall((drawer_msg + "\n").encode('utf-8'))
+        record_type, line = items.pop(0)
+        joined = parse_handshake(line) if record_type in (None, MSG_JSON) else None
+        if joined is None:
+            print(f"Invalid handshake from {addr}: {line[:80]!r}")
+            return
+        room_id, player_name, handshake = joined
+        print(f"{addr} ({player_name}) joining room {room_id}")
+
+        join_room(room_id, conn, player_name, handshake)
 
         # 4. Main Loop (Broadcast)
         while True:
-            while "\n" in buffer:
-                message, buffer = buffer.split("\n", 1)
-                if message.strip():
-                    try:
-                        data = json.loads(message)
-                        if data.get(Protocol.ACTION) == Protocol.START_GAME:
-                            handle_start_game(room_id, conn)
-                        else:
-                             process_message(room_id, message, conn)
-                    except json.JSONDecodeError:
-                        pass
-
-            data = conn.recv(1024)
+            for record_type, payload in items:
+                handle_item(room_id, record_type, payload, conn)
+
+            data = conn.recv(65536)
             if not data:
                 break
-            
-            chunk = data.decode('utf-8')
-            buffer += chunk
+            items = decoder.feed(data)
 
     except ConnectionResetError:
         pass
+    except FramingError as e:
+        print(f"Protocol error from {addr}: {e}")
     except Exception as e:
         print(f"Error handling client {addr}: {e}")
     finally:
         print(f"Disconnected {addr}")
         if room_id:
             game_state.remove_client(room_id, conn)
+        conn.close()
 
 def finish_round(room_id):
     print(f"DEBUG: finish_round called for {room_id}")
@@ -141,32 +220,20 @@ def finish_round(room_id):
     print("==========================\n")
     
     # 3. Broadcast Scores
-    score_msg = json.dumps({
-        Protocol.ACTION: Protocol.CHAT,
-        Protocol.PAYLOAD: msg_payload
-    })
-    broadcast(room_id, score_msg)
+    broadcast_chat(room_id, msg_payload)
     
     # 4. Broadcast ROUND_OVER to reset clients
     print("DEBUG: Broadcasting ROUND_OVER")
-    round_over_msg = json.dumps({
-        Protocol.ACTION: Protocol.ROUND_OVER
-    })
-    broadcast(room_id, round_over_msg)
+    broadcast(room_id, ROUND_OVER_LINE)
     
     # 5. Auto-Start Next Round in 5 seconds
     print(f"Scheduling next round for {room_id} in 5s...")
-    t = threading.Timer(5.0, handle_start_game, args=[room_id, None]) 
-    t.start()
+    game_state.scheduler.call_later(5.0, handle_start_game, room_id, None)
 
 def handle_time_expiry(room_id):
     print(f"Timer expired for {room_id}")
     # Broadcast "Time's Up!"
-    msg = json.dumps({
-        Protocol.ACTION: Protocol.CHAT,
-        Protocol.PAYLOAD: "SYSTEM: Time's Up! No one guessed the word."
-    })
-    broadcast(room_id, msg)
+    broadcast_chat(room_id, "SYSTEM: Time's Up! No one guessed the word.")
     finish_round(room_id)
 
 def process_message(room_id, message, sender_conn):
@@ -182,30 +249,18 @@ def process_message(room_id, message, sender_conn):
             
             if result == "correct":
                 # System Message
-                sys_msg = json.dumps({
-                    Protocol.ACTION: Protocol.CHAT,
-                    Protocol.PAYLOAD: f"SYSTEM: {player_name} guessed the word! (+10 pts)"
-                })
-                broadcast(room_id, sys_msg)
+                broadcast_chat(room_id, f"SYSTEM: {player_name} guessed the word! (+10 pts)")
             elif result == "round_over":
                  # 1. Announce last guess
-                sys_msg = json.dumps({
-                    Protocol.ACTION: Protocol.CHAT,
-                    Protocol.PAYLOAD: f"SYSTEM: {player_name} guessed the word! (+10 pts)"
-                })
-                broadcast(room_id, sys_msg)
+                broadcast_chat(room_id, f"SYSTEM: {player_name} guessed the word! (+10 pts)")
                 
                 # 2. Call centralized finish_round
                 finish_round(room_id)
 
             elif result == "chat":
                 # Regular Chat
-                chat_msg = json.dumps({
-                    Protocol.ACTION: Protocol.CHAT,
-                    Protocol.PAYLOAD: f"{player_name}: {payload}"
-                })
                 # Broadcast to EVERYONE (including sender) so they know it was sent/received
-                broadcast(room_id, chat_msg, exclude_conn=None)
+                broadcast_chat(room_id, f"{player_name}: {payload}")
             return
 
         if action == Protocol.READY:
@@ -214,24 +269,11 @@ def process_message(room_id, message, sender_conn):
             # Optional: Broadcast chat message?
             return
 
-        # VIDEO FRAME (Stateless, High Frequency)
+        # VIDEO FRAME (legacy base64-in-JSON senders)
         if action == Protocol.VIDEO_FRAME:
-             # Strict Enforcement: Video ONLY during active rounds
-             if not game_state.is_round_active(room_id):
-                 return
-
-             # Validate Drawer (Only drawer can stream)
-             if not game_state.is_drawer(room_id, sender_conn):
-                 return
-             
-             # Save to GameState for Web Client Polling
              payload = data.get(Protocol.PAYLOAD)
              if payload:
-                 game_state.update_video_frame(room_id, payload)
-                 # print(f"Video frame saved for {room_id}") # Debug
-
-             # Broadcast immediately (No history)
-             broadcast(room_id, message, exclude_conn=sender_conn)
+                 handle_video_frame(room_id, VideoFrame(b64=payload), sender_conn)
              return
 
         # STROKE or other (Implicitly STROKE for legacy/default)
@@ -240,7 +282,7 @@ def process_message(room_id, message, sender_conn):
             return
 
         # Save to history
-        game_state.add_stroke(room_id, message)
+        game_state.add_stroke(room_id, message, data)
         
         # Broadcast Stroke
         broadcast(room_id, message, exclude_conn=sender_conn)
@@ -248,27 +290,96 @@ def process_message(room_id, message, sender_conn):
     except json.JSONDecodeError:
         pass
 
-def broadcast(room_id, message, exclude_conn=None):
-    # Save to history if it's a chat message
-    try:
-        data = json.loads(message)
-        if data.get(Protocol.ACTION) == Protocol.CHAT:
-            payload = data.get(Protocol.PAYLOAD)
-            # We want to store the formatted payload, but we only have raw payload here usually.
-            # Actually, process_message constructs the full chat message (name + payload).
-            # So `message` here IS the final broadcast message.
-            game_state.append_chat(room_id, payload)
-    except:
-        pass
+def handle_video_frame(room_id, frame, sender_conn):
+    """VIDEO FRAME (Stateless, High Frequency), JSON or binary from the drawer."""
+    # Strict Enforcement: Video ONLY during active rounds
+    if not game_state.is_round_active(room_id):
+        return
+
+    # Validate Drawer (Only drawer can stream)
+    if not game_state.is_drawer(room_id, sender_conn):
+        return
+
+    # Tile deltas patch the room's picture first: viewers that don't take
+    # tiles (or missed one) get that picture instead
+    if frame.tiles is not None and not game_state.apply_video_tiles(room_id, frame):
+        return
+
+    # Save to GameState for Web Client Polling
+    game_state.update_video_frame(room_id, frame)
+
+    # Broadcast immediately (No history, droppable under backpressure).
+    # Each client gets the encoding it negotiated; each is built once.
+    viewers = 0
+    for client in game_state.get_clients(room_id):
+        if client is not sender_conn:
+            try:
+                data = frame.for_client(client)
+            except ValueError:
+                return # Undecodable base64 from a legacy sender
+            viewers += 1
+            sent = client.send(data, droppable=True)
+            # A dropped delta leaves the viewer's picture wrong: keyframe next time
+            client.video_synced = sent and frame.tiles is not None
+            if sent:
+                sender_conn.video_forwarded += 1
+            else:
+                sender_conn.video_dropped += 1
+            sender_conn.video_peak_depth = max(sender_conn.video_peak_depth, client.queue_depth)
+    send_video_feedback(sender_conn, viewers)
+
+def send_video_feedback(sender_conn, viewers):
+    """
+    Tell the drawer how its viewers keep up (queue depth, frames dropped
+    since the last report) so its VideoController can adapt. Only framed
+    clients get it; older drawers don't expect messages on that socket.
+    """
+    now = time.monotonic()
+    if not sender_conn.framed or now - sender_conn.video_feedback_at < VIDEO_FEEDBACK_INTERVAL:
+        return
+    sender_conn.video_feedback_at = now
+    sender_conn.send(encode_line(json.dumps({
+        Protocol.ACTION: Protocol.VIDEO_FEEDBACK,
+        Protocol.PAYLOAD: {"viewers": viewers, "max_depth": sender_conn.video_peak_depth,
+                           "forwarded": sender_conn.video_forwarded, "dropped": sender_conn.video_dropped}
+    })))
+    sender_conn.video_forwarded = sender_conn.video_dropped = sender_conn.video_peak_depth = 0
+
+def encode_line(message):
+    """Serialize a protocol line once; the same bytes go to every recipient."""
+    return (message + "\n").encode('utf-8')
+
+ROUND_OVER_LINE = encode_line(json.dumps({Protocol.ACTION: Protocol.ROUND_OVER}))
+
+def broadcast_chat(room_id, payload, exclude_conn=None):
+    """Record a chat line in the room history and fan it out."""
+    game_state.append_chat(room_id, payload)
+    chat_msg = json.dumps({
+        Protocol.ACTION: Protocol.CHAT,
+        Protocol.PAYLOAD: payload
+    })
+    broadcast(room_id, chat_msg, exclude_conn=exclude_conn)
+
+def broadcast(room_id, message, exclude_conn=None, droppable=False, compact=None):
+    # Encode once; callers that need chat history go through broadcast_chat.
+    # compact: alternative bytes (a stroke record) for compact_strokes clients
+    data = message if isinstance(message, bytes) else encode_line(message)
+
+    framed = None # record form, built on the first framed client
 
     clients = game_state.get_clients(room_id)
     # print(f"Broadcasting to {len(clients)} clients in {room_id}")
     for client in clients:
-        if client != exclude_conn:
-            try:
-                client.sendall((message + "\n").encode('utf-8'))
-            except Exception as e:
-                print(f"Broadcast error: {e}")
+        if client is not exclude_conn:
+            # Non-blocking: enqueue only, the client's writer does the I/O
+            if compact is not None and client.compact_strokes:
+                client.send(compact, droppable=droppable)
+            elif client.framed:
+                if framed is None:
+                    framed = lines_to_records(data)
+                client.send(framed, droppable=droppable)
+            else:
+                client.send(data, droppable=droppable)
 
 def handle_start_game(room_id, sender_conn=None):
     # Validation: Sender must be host OR system (None)
@@ -287,19 +398,14 @@ def handle_start_game(room_id, sender_conn=None):
             Protocol.ACTION: Protocol.CHAT,
             Protocol.PAYLOAD: "SYSTEM: Cannot start! Not all players are ready."
         })
-        try:
-            sender_conn.sendall((fail_msg + "\n").encode('utf-8'))
-        except:
-            pass
+        sender_conn.send(encode_line(fail_msg))
         return
         
     print(f"Starting game in {room_id}")
     game_state.set_round_active(room_id, True)
     
     # Clear stroke history for the new round
-    with game_state.lock:
-        if room_id in game_state.rooms:
-            game_state.rooms[room_id]['history'] = []
+    game_state.clear_history(room_id)
     
     # 1. Select Drawer
     drawer_name = game_state.select_drawer(room_id)
@@ -313,37 +419,30 @@ def handle_start_game(room_id, sender_conn=None):
     # 3. Start Timer (60s)
     game_state.start_timer(room_id, 60.0, handle_time_expiry)
 
-    # 4. Broadcast GAME_START
-    start_msg = json.dumps({
+    # 4. Broadcast GAME_START + 5. DRAWER_ASSIGN (one buffer for everyone)
+    round_lines = encode_line(json.dumps({
         Protocol.ACTION: Protocol.GAME_START,
         Protocol.PAYLOAD: 60
-    })
-    
-    # 5. Broadcast DRAWER_ASSIGN
-    drawer_msg = json.dumps({
+    })) + encode_line(json.dumps({
         Protocol.ACTION: Protocol.DRAWER_ASSIGN,
         Protocol.PLAYER_NAME: drawer_name
-    })
+    }))
 
     # 6. Send YOUR_WORD (Private to Drawer)
-    word_msg = json.dumps({
+    word_line = encode_line(json.dumps({
         Protocol.ACTION: Protocol.YOUR_WORD,
         Protocol.PAYLOAD: word
-    })
+    }))
 
     clients = game_state.get_clients(room_id)
     for client in clients:
-         try:
-            client.sendall((start_msg + "\n").encode('utf-8'))
-            client.sendall((drawer_msg + "\n").encode('utf-8'))
-            
-            # Check if this client is the drawer
-            if game_state.is_drawer(room_id, client):
-                client.sendall((word_msg + "\n").encode('utf-8'))
-         except:
-            pass
+        client.send(round_lines)
+        
+        # Check if this client is the drawer
+        if game_state.is_drawer(room_id, client):
+            client.send(word_line)
 
-def start_server():
+def start_server(use_asyncio=False):
     # Start Admin UI in background
     try:
         print("Starting Admin Admin UI on http://localhost:5001 ...")
@@ -353,6 +452,18 @@ def start_server():
     except Exception as e:
         print(f"Failed to start Admin UI: {e}")
 
+    # Fold long stroke histories into canvas snapshots (needs cv2 + numpy)
+    if canvas_snapshot.available():
+        game_state.scheduler.call_every(COMPACT_INTERVAL, game_state.start_compaction)
+    else:
+        print("cv2/numpy not found: stroke history will not be compacted, drawer video stays plain JPEG")
+
+    if use_asyncio:
+        # Single event loop instead of one thread per socket
+        import async_server
+        async_server.run(sys.modules[__name__], HOST, PORT)
+        return
+
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((HOST, PORT))
@@ -366,4 +477,10 @@ def start_server():
             thread.start()
     
 if __name__ == "__main__":
-    start_server()
+    # python stroke_server.py --async  -> asyncio engine
+    # python stroke_server.py --simplify 1.5  -> simplify stroke history within 1.5 px
+    args = sys.argv[1:]
+    if "--simplify" in args:
+        game_state.simplify_tolerance = float(args[args.index("--simplify") + 1])
+        print(f"Simplifying stroke history within {game_state.simplify_tolerance} px")
+    start_server(use_asyncio="--async" in args)
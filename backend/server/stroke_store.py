@@ -0,0 +1,243 @@
+import json
+import struct
+from array import array
+
+# Mode byte <-> stroke 'mode' value
+MODES = (None, 'gesture', 'mouse')
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+# Packed color: 24 bits of channel data + format flag.
+# TCP clients send cv2 triples ([b, g, r] lists), web clients send '#rrggbb';
+# the flag lets us hand each stroke back in the format it arrived in.
+COLOR_HEX = 1 << 24
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+INITIAL_CAPACITY = 1024
+
+# Keys a stroke may carry and still be stored in columns ('room_id' is
+# implied by the room and dropped)
+STROKE_KEYS = frozenset(('x1', 'y1', 'x2', 'y2', 'color', 'thickness', 'mode', 'room_id'))
+
+# Binary export header: magic, version, count
+BINARY_HEADER = struct.Struct('<4sBI')
+BINARY_MAGIC = b'STRK'
+
+
+def pack_color(color):
+    """Return the packed uint32 for a stroke color, or None if it doesn't fit."""
+    if isinstance(color, str):
+        # int(..., 16) alone would also take '-', '+', '_' and spaces
+        if len(color) == 7 and color[0] == '#' and all(c in _HEX_DIGITS for c in color[1:]):
+            return int(color[1:], 16) | COLOR_HEX
+        return None
+    if isinstance(color, (list, tuple)) and len(color) == 3:
+        c0, c1, c2 = color
+        if all(type(c) is int and 0 <= c <= 255 for c in (c0, c1, c2)):
+            return c0 | (c1 << 8) | (c2 << 16)
+    return None
+
+
+def unpack_color(packed):
+    if packed & COLOR_HEX:
+        return '#%06x' % (packed & 0xFFFFFF)
+    return [packed & 0xFF, (packed >> 8) & 0xFF, (packed >> 16) & 0xFF]
+
+
+def _color_json(packed):
+    if packed & COLOR_HEX:
+        return '"#%06x"' % (packed & 0xFFFFFF)
+    return '[%d, %d, %d]' % (packed & 0xFF, (packed >> 8) & 0xFF, (packed >> 16) & 0xFF)
+
+
+# Same output as json.dumps(stroke), without building a dict per segment
+_LINE = '{"x1": %d, "y1": %d, "x2": %d, "y2": %d, "color": %s, "thickness": %d%s%s}'
+_MODE_SUFFIX = tuple('' if mode is None else ', "mode": "%s"' % mode for mode in MODES)
+
+
+def _fits_int16(v):
+    return type(v) is int and -32768 <= v <= 32767
+
+
+def pack_stroke(stroke):
+    """
+    Stroke dict -> (x1, y1, x2, y2, packed color, thickness, mode code),
+    or None if it doesn't fit the columns (kept verbatim instead).
+    """
+    if not isinstance(stroke, dict) or not STROKE_KEYS.issuperset(stroke):
+        return None
+    x1, y1, x2, y2 = stroke.get('x1'), stroke.get('y1'), stroke.get('x2'), stroke.get('y2')
+    if not (_fits_int16(x1) and _fits_int16(y1) and _fits_int16(x2) and _fits_int16(y2)):
+        return None
+    color = pack_color(stroke.get('color'))
+    thickness = stroke.get('thickness')
+    mode = stroke.get('mode')
+    mode = MODE_CODES.get(mode, -1) if mode is None or isinstance(mode, str) else -1
+    if color is None or type(thickness) is not int or not 0 <= thickness <= 255 or mode < 0:
+        return None
+    return (x1, y1, x2, y2, color, thickness, mode)
+
+
+def unpack_stroke(packed):
+    """Inverse of pack_stroke: the stroke dict as clients send it (no room_id)."""
+    x1, y1, x2, y2, color, thickness, mode = packed
+    stroke = {"x1": x1, "y1": y1, "x2": x2, "y2": y2,
+              "color": unpack_color(color), "thickness": thickness}
+    if MODES[mode] is not None:
+        stroke["mode"] = MODES[mode]
+    return stroke
+
+
+class StrokeView:
+    """
+    Zero-copy window [start, end) over a StrokeStore's columns.
+    start/end are absolute stroke indices (see StrokeStore.base).
+    Slots below the store's length are never rewritten, so a view stays
+    valid after the lock is released even while new strokes arrive.
+    Serialization happens only when a client asks for it.
+    """
+
+    def __init__(self, store, start, end):
+        self.start = start
+        self.end = end
+        lo, hi = start - store.base, end - store.base
+        self.x1, self.y1, self.x2, self.y2, self.color, self.thickness, self.mode = (
+            memoryview(col)[lo:hi] for col in store.columns()
+        )
+        self.extra = {i: raw for i, raw in store.extra.items() if start <= i < end} if store.extra else {}
+
+    def __len__(self):
+        return self.end - self.start
+
+    def stroke(self, i):
+        """Stroke dict for the i-th entry of this view."""
+        index = self.start + i
+        if index in self.extra:
+            return json.loads(self.extra[index])
+        stroke = {
+            "x1": self.x1[i], "y1": self.y1[i], "x2": self.x2[i], "y2": self.y2[i],
+            "color": unpack_color(self.color[i]),
+            "thickness": self.thickness[i],
+        }
+        mode = MODES[self.mode[i]]
+        if mode is not None:
+            stroke["mode"] = mode
+        return stroke
+
+    def to_dicts(self):
+        return [self.stroke(i) for i in range(len(self))]
+
+    def to_json_lines(self, room_id=None):
+        """
+        Newline-delimited JSON, one line per stroke, as a single bytes buffer.
+        With room_id, lines carry it like drawer.py sends them (irregular
+        strokes are their original line either way).
+        """
+        if not len(self):
+            return b""
+        extra = self.extra
+        room = '' if room_id is None else ', "room_id": %s' % json.dumps(room_id)
+        lines = [
+            _LINE % (x1, y1, x2, y2, _color_json(color), thickness, room, _MODE_SUFFIX[mode])
+            for x1, y1, x2, y2, color, thickness, mode in zip(
+                self.x1, self.y1, self.x2, self.y2, self.color, self.thickness, self.mode)
+        ]
+        for index, raw in extra.items():
+            lines[index - self.start] = raw
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+    def to_binary(self):
+        """
+        Column dump: header + x1,y1,x2,y2 (int16) + color (uint32) +
+        thickness, mode (uint8), little-endian. Irregular strokes are zeroed.
+        """
+        parts = [BINARY_HEADER.pack(BINARY_MAGIC, 1, len(self))]
+        for col in (self.x1, self.y1, self.x2, self.y2, self.color, self.thickness, self.mode):
+            parts.append(col.tobytes())
+        return b"".join(parts)
+
+
+class StrokeStore:
+    """
+    Columnar, array-backed stroke history for one room: int16 coordinates,
+    packed uint32 color, uint8 thickness and mode. About 14 bytes per
+    segment instead of a ~120 byte JSON string plus object overhead.
+
+    Columns are preallocated and grown by doubling into *new* arrays, so
+    memoryviews handed out by view() are never invalidated by appends.
+    Strokes that don't fit the columns (unknown keys/formats) are kept
+    verbatim in `extra`, keyed by index, and replayed as-is.
+
+    Indices are absolute for the whole round: after compaction (tail()) the
+    store starts at `base` and strokes below it live in the canvas snapshot.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, base=0):
+        self.base = base    # absolute index of slot 0
+        self.length = 0     # used slots
+        self.capacity = capacity
+        self._alloc(capacity)
+        self.extra = {}
+
+    def _alloc(self, capacity, old=None):
+        cols = []
+        for typecode, name in (('h', 'x1'), ('h', 'y1'), ('h', 'x2'), ('h', 'y2'),
+                               ('I', 'color'), ('B', 'thickness'), ('B', 'mode')):
+            col = array(typecode, bytes(capacity * array(typecode).itemsize))
+            if old is not None:
+                col[:self.length] = getattr(self, name)[:self.length]
+            cols.append(col)
+        self.x1, self.y1, self.x2, self.y2, self.color, self.thickness, self.mode = cols
+        self.capacity = capacity
+
+    def columns(self):
+        return (self.x1, self.y1, self.x2, self.y2, self.color, self.thickness, self.mode)
+
+    def __len__(self):
+        # Total strokes this round, including compacted ones
+        return self.base + self.length
+
+    def append(self, stroke, raw=None):
+        """Store one stroke dict. raw is the original JSON line, kept only if the stroke is irregular."""
+        packed = pack_stroke(stroke)
+        if packed is None:
+            self.extra[len(self)] = raw if raw is not None else json.dumps(stroke)
+            packed = (0, 0, 0, 0, 0, 0, 0)
+        self._put(packed)
+
+    def append_packed(self, packed):
+        """Store one already-packed segment (compact stroke records), no dict round trip."""
+        x1, y1, x2, y2, color, thickness, mode = packed
+        if (-32768 <= x1 <= 32767 and -32768 <= y1 <= 32767 and -32768 <= x2 <= 32767
+                and -32768 <= y2 <= 32767 and 0 <= thickness <= 255 and 0 <= mode < len(MODES)
+                and 0 <= color < COLOR_HEX << 1):
+            self._put(packed)
+        else:
+            self.append(unpack_stroke(packed) if 0 <= mode < len(MODES) else {})
+
+    def _put(self, packed):
+        if self.length == self.capacity:
+            self._alloc(self.capacity * 2, old=True)
+        n = self.length
+        (self.x1[n], self.y1[n], self.x2[n], self.y2[n],
+         self.color[n], self.thickness[n], self.mode[n]) = packed
+        self.length = n + 1
+
+    def view(self, start=0, end=None):
+        end = len(self) if end is None else min(end, len(self))
+        start = min(max(start, self.base), end)
+        return StrokeView(self, start, end)
+
+    def tail(self, start):
+        """New store holding only strokes [start:], keeping absolute indices."""
+        start = min(max(start, self.base), len(self))
+        count = len(self) - start
+        store = StrokeStore(max(INITIAL_CAPACITY, count * 2), base=start)
+        lo = start - self.base
+        for name in ('x1', 'y1', 'x2', 'y2', 'color', 'thickness', 'mode'):
+            getattr(store, name)[:count] = getattr(self, name)[lo:lo + count]
+        store.length = count
+        store.extra = {i: raw for i, raw in self.extra.items() if i >= start}
+        return store
+
+    def nbytes(self):
+        return sum(col.itemsize * self.capacity for col in self.columns())
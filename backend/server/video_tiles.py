@@ -0,0 +1,190 @@
+import struct
+import time
+
+# Encoding and decoding need OpenCV + numpy. Without them the server still
+# runs, it just doesn't take VIDEO_TILES records (join_ack says so)
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+# Tile-delta drawer video (VIDEO_TILES records, clients that negotiate
+# "video_tiles"). A webcam frame is mostly still background, so between
+# keyframes only the tiles that changed are sent, packed into a single
+# JPEG (a column of tiles, one JPEG header per frame instead of per tile):
+#   flags (u8) | width (u16) | height (u16) | tile (u8) | count (u16)
+#   | count x (col u8, row u8) | JPEG
+# A keyframe (flags & KEYFRAME) has no tile list: its JPEG is the frame.
+# A delta with no tiles (and no JPEG) just says "still there".
+KEYFRAME = 0x01
+HEADER = struct.Struct('>BHHBH')
+TILE = 32                   # px; a multiple of 16 so JPEG blocks never mix two tiles
+BLOCK = 8                   # change detection works on BLOCK x BLOCK means (noise averages out)
+TILE_THRESHOLD = 6          # a tile is resent once a block mean moved more than this (0-255)
+KEYFRAME_SHARE = 0.6        # more changed tiles than this: send a keyframe instead
+KEYFRAME_INTERVAL = 5.0     # seconds between keyframes from the drawer
+
+
+def available():
+    return cv2 is not None
+
+
+def encode_jpeg(frame, quality):
+    """JPEG bytes of a BGR frame; ValueError if it can't be encoded."""
+    ok, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise ValueError("frame could not be encoded")
+    return jpeg.tobytes()
+
+
+def encode_payload(flags, width, height, tile, positions, jpeg):
+    out = bytearray(HEADER.pack(flags, width, height, tile, len(positions)))
+    for col, row in positions:
+        out += bytes((col, row))
+    out += jpeg
+    return bytes(out)
+
+
+def decode_payload(payload):
+    """payload -> (flags, width, height, tile, [(col, row)], jpeg bytes); ValueError if malformed."""
+    if len(payload) < HEADER.size:
+        raise ValueError("truncated tile header")
+    flags, width, height, tile, count = HEADER.unpack_from(payload)
+    start = HEADER.size + 2 * count
+    if tile == 0 or len(payload) < start or (count and len(payload) == start):
+        raise ValueError("truncated tile list")
+    cols, rows = -(-width // tile), -(-height // tile)
+    positions = [(payload[i], payload[i + 1]) for i in range(HEADER.size, start, 2)]
+    for col, row in positions:
+        if col >= cols or row >= rows:
+            raise ValueError(f"tile ({col}, {row}) outside {width}x{height}")
+    return flags, width, height, tile, positions, payload[start:]
+
+
+def keyframe_payload(jpeg, width, height, tile=TILE):
+    return encode_payload(KEYFRAME, width, height, tile, [], jpeg)
+
+
+class TileEncoder:
+    """
+    Drawer side: frame -> VIDEO_TILES payload. Each tile is compared with
+    what was last sent for it, so slow drift still adds up to a resend
+    and JPEG loss never compounds (tiles are always cut from the source).
+    """
+
+    def __init__(self, tile=TILE, threshold=TILE_THRESHOLD, keyframe_interval=KEYFRAME_INTERVAL):
+        self.tile = tile
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.size = None
+        self.sent_blocks = None     # block means of what viewers have, per channel
+        self.keyframe_at = None
+        self._undo = None           # state before the last payload (discard_last)
+        # Stats
+        self.keyframes = 0
+        self.deltas = 0
+        self.tiles_sent = 0
+
+    def request_keyframe(self):
+        self.keyframe_at = None
+
+    def discard_last(self):
+        """
+        The last payload never reached the server (dropped before it was
+        sent): go back to what viewers had, so the next delta carries its
+        tiles again (or the next frame is a keyframe again).
+        """
+        if self._undo is not None:
+            self.size, self.sent_blocks, self.keyframe_at = self._undo
+            self._undo = None
+
+    def encode(self, frame, quality, now=None):
+        now = time.monotonic() if now is None else now
+        self._undo = None
+        height, width = frame.shape[:2]
+        t = self.tile
+        cols, rows = -(-width // t), -(-height // t)
+        # Pad to whole tiles (edge pixels repeated) so tiles can be cut by reshaping
+        padded = cv2.copyMakeBorder(frame, 0, rows * t - height, 0, cols * t - width, cv2.BORDER_REPLICATE)
+        blocks = cv2.resize(padded, (cols * t // BLOCK, rows * t // BLOCK), interpolation=cv2.INTER_AREA)
+
+        if self.size != (width, height) or self.keyframe_at is None \
+                or now - self.keyframe_at >= self.keyframe_interval:
+            return self._keyframe(frame, blocks, quality, now)
+
+        # Per tile: largest block change on any channel
+        n = t // BLOCK
+        change = cv2.absdiff(blocks, self.sent_blocks).max(axis=2)
+        change = change.reshape(rows, n, cols, n).max(axis=(1, 3))
+        changed = change > self.threshold
+        count = int(changed.sum())
+        if count > KEYFRAME_SHARE * rows * cols:
+            return self._keyframe(frame, blocks, quality, now)
+
+        self.deltas += 1
+        if count == 0:
+            return encode_payload(0, width, height, t, [], b"")
+        row_idx, col_idx = np.nonzero(changed)
+        tiles = padded.reshape(rows, t, cols, t, 3).transpose(0, 2, 1, 3, 4)[row_idx, col_idx]
+        ok, atlas = cv2.imencode('.jpg', tiles.reshape(count * t, t, 3), [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ok:
+            return None
+        mask = np.repeat(np.repeat(changed, n, axis=0), n, axis=1)
+        # Copy on write (block means are tiny) so discard_last can restore them
+        self._undo = (self.size, self.sent_blocks, self.keyframe_at)
+        self.sent_blocks = self.sent_blocks.copy()
+        self.sent_blocks[mask] = blocks[mask]
+        self.tiles_sent += count
+        return encode_payload(0, width, height, t, list(zip(col_idx.tolist(), row_idx.tolist())), atlas.tobytes())
+
+    def _keyframe(self, frame, blocks, quality, now):
+        ok, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ok:
+            return None
+        self._undo = (self.size, self.sent_blocks, self.keyframe_at)
+        self.size = (frame.shape[1], frame.shape[0])
+        self.sent_blocks = blocks
+        self.keyframe_at = now
+        self.keyframes += 1
+        return keyframe_payload(jpeg.tobytes(), *self.size, self.tile)
+
+
+class TileDecoder:
+    """
+    Viewer side (and the server's copy of the room's picture): applies
+    payloads to self.frame in place. Deltas before the first keyframe,
+    or for a different frame size, can't be applied and are ignored.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.keyframe = False   # whether the last payload applied was a keyframe
+
+    def apply(self, payload):
+        """True if self.frame now shows this payload's frame. ValueError if malformed."""
+        flags, width, height, t, positions, jpeg = decode_payload(payload)
+        if flags & KEYFRAME:
+            image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("undecodable keyframe")
+            if image.shape[:2] != (height, width):
+                image = cv2.resize(image, (width, height))
+            self.frame = image
+            self.keyframe = True
+            return True
+
+        if self.frame is None or self.frame.shape[:2] != (height, width):
+            return False
+        self.keyframe = False
+        if not positions:
+            return True
+        atlas = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if atlas is None or atlas.shape[0] < len(positions) * t or atlas.shape[1] < t:
+            raise ValueError("undecodable tile atlas")
+        for i, (col, row) in enumerate(positions):
+            x, y = col * t, row * t
+            w, h = min(t, width - x), min(t, height - y)
+            self.frame[y:y + h, x:x + w] = atlas[i * t:i * t + h, :w]
+        return True
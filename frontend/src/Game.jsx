@@ -5,7 +5,8 @@ import DrawingCanvas from './components/DrawingCanvas';
 import Palette from './components/Palette';
 import GameChat from './components/GameChat';
 import PlayerList from './components/PlayerList';
-import { getState, sendChat, getVideoFrame, joinRoom, sendStroke, getStrokes } from './api';
+import { getRoomState, sendChat, getVideoFrame, joinRoom, sendStroke, getStrokes, openStream } from './api';
+import { createTileDecoder, tilesSupported } from './videoTiles';
 
 const Game = ({ playerName, roomId, isHost, onEndGame }) => {
     const [gameState, setGameState] = useState(null);
@@ -19,6 +20,12 @@ const Game = ({ playerName, roomId, isHost, onEndGame }) => {
     const joinedRef = useRef(false);
     const prevRoundActiveRef = useRef(false);
     const prevDrawerRef = useRef(null);
+    const isDrawerRef = useRef(false);
+    const roundActiveRef = useRef(false);
+    const stateVersionRef = useRef(0);
+    const streamingRef = useRef(false);
+    const pendingStrokesRef = useRef([]);
+    const flushScheduledRef = useRef(false);
 
     // Register web player on mount
     useEffect(() => {
@@ -30,53 +37,163 @@ const Game = ({ playerName, roomId, isHost, onEndGame }) => {
         }
     }, [roomId, playerName]);
 
-    // Poll game state
-    useEffect(() => {
-        const interval = setInterval(async () => {
-            const state = await getState();
-            if (state && state[roomId]) {
-                const roomData = state[roomId];
-                setGameState(roomData);
-
-                const currentlyDrawer = roomData.drawer === playerName;
-                setIsDrawer(currentlyDrawer);
-
-                // Poll video if NOT drawer and round active
-                if (!currentlyDrawer && roomData.round_active) {
-                    const frame = await getVideoFrame(roomId);
-                    if (frame) setVideoFrame(frame);
-                } else {
-                    setVideoFrame(null);
-                }
+    // Strokes for the canvas are queued and handed over once per animation
+    // frame, so a burst of streamed events is drawn in a single batch
+    const queueStrokes = useCallback((items) => {
+        pendingStrokesRef.current.push(...items);
+        if (flushScheduledRef.current) return;
+        flushScheduledRef.current = true;
+        requestAnimationFrame(() => {
+            flushScheduledRef.current = false;
+            const batch = pendingStrokesRef.current;
+            pendingStrokesRef.current = [];
+            setNewStrokes(batch);
+        });
+    }, []);
 
-                // Clear canvas on new round OR drawer change
-                const newRound = roomData.round_active && !prevRoundActiveRef.current;
-                const drawerChanged = roomData.drawer && roomData.drawer !== prevDrawerRef.current;
+    const applyState = useCallback((roomData) => {
+        // Never step back to an older version
+        if (roomData.version < stateVersionRef.current) return;
+        stateVersionRef.current = roomData.version;
+        setGameState(roomData);
 
-                if (newRound || drawerChanged) {
-                    strokeIndexRef.current = 0;
-                    setNewStrokes([{ action: 'clear' }]);
-                }
+        const currentlyDrawer = roomData.drawer === playerName;
+        setIsDrawer(currentlyDrawer);
+        isDrawerRef.current = currentlyDrawer;
+        roundActiveRef.current = roomData.round_active;
+
+        if (currentlyDrawer || !roomData.round_active) {
+            setVideoFrame(null);
+        }
+
+        // Clear canvas on new round OR drawer change
+        // (when streaming, the game_start event already did it in order)
+        const newRound = roomData.round_active && !prevRoundActiveRef.current;
+        const drawerChanged = roomData.drawer && roomData.drawer !== prevDrawerRef.current;
+
+        if ((newRound || drawerChanged) && !streamingRef.current) {
+            strokeIndexRef.current = 0;
+            queueStrokes([{ action: 'clear' }]);
+        }
 
-                prevRoundActiveRef.current = roomData.round_active;
-                prevDrawerRef.current = roomData.drawer;
+        prevRoundActiveRef.current = roomData.round_active;
+        prevDrawerRef.current = roomData.drawer;
+    }, [playerName, queueStrokes]);
+
+    // Long-poll game state (scores, players, chat): the server answers as soon
+    // as the room's version moves past the one we have, or 304 after 25s
+    useEffect(() => {
+        let active = true;
+        const loop = async () => {
+            while (active) {
+                const known = stateVersionRef.current || null;
+                const roomData = await getRoomState(roomId, known, known ? 25 : 0);
+                if (!active) break;
+                if (roomData) {
+                    applyState(roomData);
+                } else if (roomData === undefined) {
+                    await new Promise(r => setTimeout(r, 1000)); // Error (or no room yet): back off
+                }
             }
+        };
+        loop();
+        return () => { active = false; };
+    }, [roomId, applyState]);
+
+    // Poll video if NOT drawer and round active (the stream pushes it otherwise)
+    useEffect(() => {
+        const interval = setInterval(async () => {
+            if (streamingRef.current || isDrawerRef.current || !roundActiveRef.current) return;
+            const frame = await getVideoFrame(roomId);
+            if (frame) setVideoFrame(frame);
         }, 1000);
         return () => clearInterval(interval);
-    }, [roomId, playerName]);
+    }, [roomId]);
 
-    // Poll strokes (for guessers to see what's being drawn)
+    // Live event stream: strokes, chat, round events and video pushed by the server
+    useEffect(() => {
+        const tiles = tilesSupported();
+        const source = openStream(roomId, strokeIndexRef.current, tiles);
+        if (!source) return; // No EventSource: polling below does the work
+        const tileDecoder = tiles ? createTileDecoder() : null;
+        let tileFrames = 0;
+
+        source.onmessage = (e) => {
+            let msg;
+            try {
+                msg = JSON.parse(e.data);
+            } catch (err) {
+                return;
+            }
+            switch (msg.action) {
+                case 'sync':
+                    // Catch-up replayed; from here on every stroke event is live
+                    streamingRef.current = true;
+                    strokeIndexRef.current = msg.payload;
+                    break;
+                case 'video_frame':
+                    if (!isDrawerRef.current) setVideoFrame(msg.payload);
+                    break;
+                case 'video_tiles':
+                    // Patched into the decoder's canvas; DrawingCanvas copies it on each new frame
+                    tileDecoder.push(msg.payload).then((shown) => {
+                        tileFrames += 1;
+                        if (shown && !isDrawerRef.current) {
+                            setVideoFrame({ canvas: tileDecoder.canvas, frame: tileFrames });
+                        }
+                    });
+                    break;
+                case 'game_start':
+                case 'clear':
+                    strokeIndexRef.current = 0;
+                    queueStrokes([{ action: 'clear' }]);
+                    break;
+                case 'drawer_assign':
+                case 'round_over':
+                case 'chat':
+                    break; // Scores/chat/drawer arrive through the state long-poll
+                case 'canvas_snapshot':
+                    queueStrokes([{ action: 'snapshot', image: msg.payload }]);
+                    break;
+                default:
+                    // Stroke (anything else the server stores in history)
+                    strokeIndexRef.current += 1;
+                    if (!isDrawerRef.current) queueStrokes([msg]);
+            }
+        };
+        source.onerror = () => {
+            // Fall back to polling. Live strokes don't map 1:1 onto history
+            // indices when the server simplifies history, so replay from the start.
+            streamingRef.current = false;
+            source.close();
+            if (!isDrawerRef.current) {
+                strokeIndexRef.current = 0;
+                queueStrokes([{ action: 'clear' }]);
+            }
+        };
+
+        return () => {
+            streamingRef.current = false;
+            source.close();
+        };
+    }, [roomId, queueStrokes]);
+
+    // Poll strokes (for guessers to see what's being drawn) while not streaming
     useEffect(() => {
         const interval = setInterval(async () => {
-            if (isDrawer) return; // Drawer draws locally, no need to poll
+            if (isDrawer || streamingRef.current) return; // Drawer draws locally, no need to poll
             const result = await getStrokes(roomId, strokeIndexRef.current);
-            if (result.strokes && result.strokes.length > 0) {
-                setNewStrokes(result.strokes);
+            if (result.snapshot) {
+                // We were behind the server's compacted history: canvas image + strokes since
+                queueStrokes([{ action: 'snapshot', image: result.snapshot }, ...(result.strokes || [])]);
+                strokeIndexRef.current = result.total;
+            } else if (result.strokes && result.strokes.length > 0) {
+                queueStrokes(result.strokes);
                 strokeIndexRef.current = result.total;
             }
         }, 500); // 500ms polling for responsive drawing
         return () => clearInterval(interval);
-    }, [roomId, isDrawer]);
+    }, [roomId, isDrawer, queueStrokes]);
 
     const handleSendMessage = (msg) => {
         sendChat(roomId, msg, playerName);
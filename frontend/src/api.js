@@ -13,6 +13,23 @@ export const getState = async () => {
     }
 };
 
+// One room's state. With `version`, resolves to null when nothing changed
+// (304); `wait` seconds makes the server hold the request until it does.
+export const getRoomState = async (roomId, version = null, wait = 0) => {
+    try {
+        const params = new URLSearchParams();
+        if (version !== null) params.set('version', version);
+        if (wait > 0) params.set('wait', wait);
+        const res = await fetch(`${API_URL}/state/${roomId}?${params}`);
+        if (res.status === 304) return null;
+        if (!res.ok) throw new Error('Network response was not ok');
+        return await res.json();
+    } catch (e) {
+        console.error("Fetch room state error:", e);
+        return undefined; // Distinguish errors from "unchanged"
+    }
+};
+
 export const sendChat = async (roomId, message, sender) => {
     try {
         await fetch(`${API_URL}/action`, {
@@ -134,6 +151,13 @@ export const getStrokes = async (roomId, since = 0) => {
     }
 };
 
+// Server-Sent Events stream of the room's broadcasts (null if unsupported).
+// tiles: receive drawer video as tile deltas (videoTiles.js)
+export const openStream = (roomId, since = 0, tiles = false) => {
+    if (typeof EventSource === 'undefined') return null;
+    return new EventSource(`${API_URL}/stream/${roomId}?since=${since}${tiles ? '&tiles=1' : ''}`);
+};
+
 export const clearCanvas = async (roomId) => {
     try {
         await fetch(`${API_URL}/clear_canvas`, {
@@ -2,6 +2,7 @@ import React, { useRef, useEffect, useState, useCallback } from 'react';
 
 const DrawingCanvas = ({ isDrawer, color, tool, brushSize, videoFrame, roomId, playerName, onSendStroke, strokesFromServer }) => {
     const canvasRef = useRef(null);
+    const videoCanvasRef = useRef(null);
     const isDrawing = useRef(false);
     const lastPoint = useRef(null);
 
@@ -19,11 +20,15 @@ const DrawingCanvas = ({ isDrawer, color, tool, brushSize, videoFrame, roomId, p
         const canvas = canvasRef.current;
         const ctx = canvas.getContext('2d');
 
-        for (const stroke of strokesFromServer) {
+        // Scale from backend canvas (1280x720) to our canvas (800x600)
+        const scaleX = canvas.width / 1280;
+        const scaleY = canvas.height / 720;
+
+        const drawStroke = (stroke) => {
             if (stroke.action === 'clear') {
                 ctx.fillStyle = "white";
                 ctx.fillRect(0, 0, canvas.width, canvas.height);
-                continue;
+                return;
             }
 
             // Stroke format from backend: {x1, y1, x2, y2, color, thickness, mode}
@@ -32,10 +37,6 @@ const DrawingCanvas = ({ isDrawer, color, tool, brushSize, videoFrame, roomId, p
                 const strokeColor = stroke.color || '#333333';
                 const strokeWidth = stroke.thickness || 5;
 
-                // Scale from backend canvas (1280x720) to our canvas (800x600)
-                const scaleX = canvas.width / 1280;
-                const scaleY = canvas.height / 720;
-
                 ctx.strokeStyle = strokeColor;
                 ctx.lineWidth = strokeWidth * Math.min(scaleX, scaleY);
                 ctx.lineCap = 'round';
@@ -45,9 +46,38 @@ const DrawingCanvas = ({ isDrawer, color, tool, brushSize, videoFrame, roomId, p
                 ctx.lineTo(stroke.x2 * scaleX, stroke.y2 * scaleY);
                 ctx.stroke();
             }
+        };
+
+        for (let i = 0; i < strokesFromServer.length; i++) {
+            const stroke = strokesFromServer[i];
+            if (stroke.action === 'snapshot') {
+                // Server's raster of the compacted history; the strokes after it
+                // must wait until the image has loaded or it would paint over them
+                const rest = strokesFromServer.slice(i + 1);
+                const img = new Image();
+                img.onload = () => {
+                    ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+                    rest.forEach(drawStroke);
+                };
+                img.src = `data:image/png;base64,${stroke.image}`;
+                return;
+            }
+            drawStroke(stroke);
         }
     }, [strokesFromServer]);
 
+    // Tile-delta video arrives as { canvas, frame }: copy each new frame over
+    useEffect(() => {
+        const target = videoCanvasRef.current;
+        if (!target || !videoFrame || typeof videoFrame === 'string') return;
+        const source = videoFrame.canvas;
+        if (target.width !== source.width || target.height !== source.height) {
+            target.width = source.width;
+            target.height = source.height;
+        }
+        target.getContext('2d').drawImage(source, 0, 0);
+    }, [videoFrame]);
+
     // Get canvas coordinates from mouse event
     const getCanvasPoint = useCallback((e) => {
         const canvas = canvasRef.current;
@@ -166,14 +196,24 @@ const DrawingCanvas = ({ isDrawer, color, tool, brushSize, videoFrame, roomId, p
                     zIndex: 20,
                     pointerEvents: 'none'
                 }}>
-                    <img
-                        src={`data:image/jpeg;base64,${videoFrame}`}
-                        alt="Drawer Feed"
-                        style={{
-                            width: '100%',
-                            display: 'block'
-                        }}
-                    />
+                    {typeof videoFrame === 'string' ? (
+                        <img
+                            src={`data:image/jpeg;base64,${videoFrame}`}
+                            alt="Drawer Feed"
+                            style={{
+                                width: '100%',
+                                display: 'block'
+                            }}
+                        />
+                    ) : (
+                        <canvas
+                            ref={videoCanvasRef}
+                            style={{
+                                width: '100%',
+                                display: 'block'
+                            }}
+                        />
+                    )}
                     <div style={{
                         position: 'absolute',
                         bottom: '0',
@@ -0,0 +1,68 @@
+// Tile-delta drawer video (backend/server/video_tiles.py). A keyframe is a
+// whole JPEG; in between the server sends only the tiles that changed,
+// packed into one JPEG (a column of tiles), which get patched into the
+// last frame:
+//   flags (u8) | width (u16) | height (u16) | tile (u8) | count (u16)
+//   | count x (col u8, row u8) | JPEG
+const KEYFRAME = 0x01;
+const HEADER_SIZE = 8;
+
+export const tilesSupported = () => typeof createImageBitmap !== 'undefined';
+
+const decodeBase64 = (b64) => Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+
+const loadJpeg = (bytes) => createImageBitmap(new Blob([bytes], { type: 'image/jpeg' }));
+
+export const createTileDecoder = () => {
+    const canvas = document.createElement('canvas');
+    const ctx = canvas.getContext('2d');
+    let synced = false;
+    let chain = Promise.resolve(false);
+
+    const apply = async (bytes) => {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const flags = view.getUint8(0);
+        const width = view.getUint16(1);
+        const height = view.getUint16(3);
+        const tile = view.getUint8(5);
+        const count = view.getUint16(6);
+        const jpeg = bytes.subarray(HEADER_SIZE + 2 * count);
+
+        if (flags & KEYFRAME) {
+            const image = await loadJpeg(jpeg);
+            canvas.width = width;
+            canvas.height = height;
+            ctx.drawImage(image, 0, 0, width, height);
+            image.close();
+            synced = true;
+            return true;
+        }
+        // Deltas before the first keyframe (or for another size) can't be applied
+        if (!synced || canvas.width !== width || canvas.height !== height) return false;
+        if (count === 0) return true;
+
+        const atlas = await loadJpeg(jpeg);
+        for (let i = 0; i < count; i++) {
+            const x = bytes[HEADER_SIZE + 2 * i] * tile;
+            const y = bytes[HEADER_SIZE + 2 * i + 1] * tile;
+            const w = Math.min(tile, width - x);
+            const h = Math.min(tile, height - y);
+            ctx.drawImage(atlas, 0, i * tile, w, h, x, y, w, h);
+        }
+        atlas.close();
+        return true;
+    };
+
+    return {
+        canvas,
+        // Resolves true once canvas shows the payload's frame. Images decode
+        // asynchronously, so payloads are chained to apply in order.
+        push: (b64) => {
+            chain = chain.then(() => apply(decodeBase64(b64))).catch(() => {
+                synced = false; // wait for the next keyframe
+                return false;
+            });
+            return chain;
+        },
+    };
+};